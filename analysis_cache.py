@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from workloads import owning_workload
+
+# Configuration
+CACHE_FILE = "analysis_cache.json"
+CACHE_TTL = 6 * 60 * 60    # seconds a diagnosis stays valid
+CACHE_MAX_ENTRIES = 1000
+LOG_SIGNATURE_LINES = 50   # tail lines that make up the log signature
+
+# Volatile tokens that differ between otherwise identical failures
+_NORMALIZERS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.I), "<uuid>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\b0x[0-9a-f]+\b|\b[0-9a-f]{7,}\b", re.I), "<hex>"),
+    (re.compile(r"\d+"), "<n>"),
+]
+
+
+def normalize_log(logs, max_lines=LOG_SIGNATURE_LINES):
+    """Strip timestamps, ids and numbers from the tail of a log"""
+    lines = []
+    for line in (logs or "").splitlines()[-max_lines:]:
+        line = line.strip()
+        if not line:
+            continue
+        for pattern, replacement in _NORMALIZERS:
+            line = pattern.sub(replacement, line)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def container_signature(pod):
+    """Sorted (container, reason, exit code) tuples for every container state"""
+    status = pod.get("status", {})
+    signature = []
+    for key in ("initContainerStatuses", "containerStatuses"):
+        for cs in status.get(key) or []:
+            for state_key in ("state", "lastState"):
+                state = cs.get(state_key) or {}
+                waiting = state.get("waiting")
+                terminated = state.get("terminated")
+                if waiting:
+                    signature.append((cs.get("name", ""), waiting.get("reason", ""), ""))
+                if terminated:
+                    signature.append((cs.get("name", ""), terminated.get("reason", ""), str(terminated.get("exitCode", ""))))
+    if not signature:
+        signature.append(("", status.get("reason") or status.get("phase", ""), ""))
+    return sorted(signature)
+
+
+def fingerprint(pod, logs):
+    """Hash of namespace, owning workload, container reasons and log signature"""
+    metadata = pod.get("metadata", {})
+    kind, name = owning_workload(pod)
+    parts = [
+        metadata.get("namespace", "default"),
+        f"{kind}/{name}",
+        json.dumps(container_signature(pod)),
+        normalize_log(logs),
+    ]
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """LRU + TTL cache of LLM diagnoses, persisted to a local JSON file"""
+
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable analysis cache {self.path}: {e}")
+            return
+        now = time.time()
+        for key, entry in data.get("entries", []):
+            if now - entry["created"] < self.ttl:
+                self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        logging.info(f"Loaded {len(self.entries)} cached analyses from {self.path}")
+
+    def save(self):
+        """Write the cache to disk if it changed since the last save"""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            data = {"entries": list(self.entries.items())}
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.error(f"Failed to save analysis cache: {e}")
+
+    def get(self, key):
+        """Return {"analysis", "created", "cached": True} or None"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry["created"] >= self.ttl:
+                del self.entries[key]
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry, cached=True)
+
+    def put(self, key, analysis):
+        with self._lock:
+            self.entries[key] = {"analysis": analysis, "created": time.time()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._dirty = True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def format_cached(entry):
+    """Render a cache hit with a marker saying how old the diagnosis is"""
+    age = int(time.time() - entry["created"])
+    return f"[cached analysis, {age // 60}m old]\n{entry['analysis']}"
@@ -0,0 +1,371 @@
+"""SQLite store for pod incidents, their logs and the LLM analysis.
+
+One row per (pod, failure fingerprint): a pod that keeps failing the same way
+bumps last_seen and occurrences instead of adding files every scan. Log
+bodies are zlib-compressed and stored once per distinct content. Old and
+excess incidents are pruned by age and total size.
+
+    python analysis_store.py latest --namespace payments
+    python analysis_store.py since 2025-05-21T08:00 --workload Deployment/api
+    python analysis_store.py show 42 --logs
+    python analysis_store.py import-dir pod_logs
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from workloads import owning_workload
+
+# Configuration
+STORE_FILE = "analysis_store.db"
+MAX_AGE_DAYS = 30            # incidents not seen for this long are dropped
+MAX_BYTES = 200 * 1024**2    # compressed logs + analyses kept before pruning oldest
+PRUNE_INTERVAL = 3600        # seconds between automatic prune passes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    body BLOB NOT NULL,
+    raw_size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    pod TEXT NOT NULL,
+    workload_kind TEXT,
+    workload_name TEXT,
+    fingerprint TEXT NOT NULL,
+    status TEXT,
+    analysis TEXT,
+    log_id INTEGER REFERENCES logs(id),
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    occurrences INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (namespace, pod, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS incidents_last_seen ON incidents (last_seen);
+CREATE INDEX IF NOT EXISTS incidents_namespace ON incidents (namespace, last_seen);
+CREATE INDEX IF NOT EXISTS incidents_workload ON incidents (workload_kind, workload_name, last_seen);
+CREATE INDEX IF NOT EXISTS incidents_fingerprint ON incidents (fingerprint);
+"""
+
+INCIDENT_COLUMNS = (
+    "id", "namespace", "pod", "workload_kind", "workload_name", "fingerprint",
+    "status", "analysis", "log_id", "first_seen", "last_seen", "occurrences",
+)
+
+
+class AnalysisStore:
+    """Incidents keyed by pod, workload, fingerprint and time"""
+
+    def __init__(self, path=STORE_FILE, max_age_days=MAX_AGE_DAYS, max_bytes=MAX_BYTES,
+                 prune_interval=PRUNE_INTERVAL):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._last_prune = 0
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def _store_logs(self, logs):
+        data = (logs or "").encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        row = self.db.execute("SELECT id FROM logs WHERE digest = ?", (digest,)).fetchone()
+        if row:
+            return row["id"]
+        cursor = self.db.execute(
+            "INSERT INTO logs (digest, body, raw_size) VALUES (?, ?, ?)",
+            (digest, zlib.compress(data, 6), len(data))
+        )
+        return cursor.lastrowid
+
+    def record(self, pod, logs, analysis, status, fingerprint, seen_at=None):
+        """Insert or refresh the incident for this pod and fingerprint; return its id"""
+        metadata = pod.get("metadata", {})
+        namespace = metadata.get("namespace", "default")
+        name = metadata.get("name", "unknown")
+        kind, workload = owning_workload(pod)
+        seen_at = seen_at or time.time()
+
+        with self._lock, self.db:
+            log_id = self._store_logs(logs)
+            self.db.execute(
+                """INSERT INTO incidents (namespace, pod, workload_kind, workload_name, fingerprint,
+                                          status, analysis, log_id, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (namespace, pod, fingerprint) DO UPDATE SET
+                       status = excluded.status,
+                       analysis = excluded.analysis,
+                       log_id = excluded.log_id,
+                       last_seen = max(last_seen, excluded.last_seen),
+                       occurrences = occurrences + 1""",
+                (namespace, name, kind, workload, fingerprint, status, analysis, log_id, seen_at, seen_at)
+            )
+            row = self.db.execute(
+                "SELECT id FROM incidents WHERE namespace = ? AND pod = ? AND fingerprint = ?",
+                (namespace, name, fingerprint)
+            ).fetchone()
+
+        if time.time() - self._last_prune > self.prune_interval:
+            self.prune()
+        return row["id"]
+
+    def query(self, namespace=None, pod=None, workload=None, fingerprint=None, since=None, limit=20):
+        """Incidents matching every given filter, most recently seen first.
+
+        workload is "Kind/name" or just a name. since is a unix timestamp.
+        """
+        clauses, params = [], []
+        if namespace:
+            clauses.append("namespace = ?")
+            params.append(namespace)
+        if pod:
+            clauses.append("pod = ?")
+            params.append(pod)
+        if workload:
+            kind, _, name = workload.rpartition("/")
+            if kind:
+                clauses.append("workload_kind = ?")
+                params.append(kind)
+            clauses.append("workload_name = ?")
+            params.append(name)
+        if fingerprint:
+            clauses.append("fingerprint LIKE ?")
+            params.append(fingerprint + "%")
+        if since is not None:
+            clauses.append("last_seen >= ?")
+            params.append(since)
+        sql = f"SELECT {', '.join(INCIDENT_COLUMNS)} FROM incidents"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY last_seen DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(row) for row in self.db.execute(sql, params)]
+
+    def get(self, incident_id):
+        with self._lock:
+            row = self.db.execute(
+                f"SELECT {', '.join(INCIDENT_COLUMNS)} FROM incidents WHERE id = ?", (incident_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def logs(self, log_id):
+        with self._lock:
+            row = self.db.execute("SELECT body FROM logs WHERE id = ?", (log_id,)).fetchone()
+        return zlib.decompress(row["body"]).decode("utf-8") if row else None
+
+    def size(self):
+        """Bytes held by compressed logs and analyses"""
+        row = self.db.execute(
+            "SELECT (SELECT COALESCE(SUM(LENGTH(body)), 0) FROM logs)"
+            " + (SELECT COALESCE(SUM(LENGTH(analysis)), 0) FROM incidents) AS size"
+        ).fetchone()
+        return row["size"]
+
+    def _drop_orphan_logs(self):
+        self.db.execute("DELETE FROM logs WHERE id NOT IN (SELECT log_id FROM incidents WHERE log_id IS NOT NULL)")
+
+    def prune(self, now=None):
+        """Drop incidents past max_age_days, then the oldest until under max_bytes"""
+        now = now or time.time()
+        with self._lock, self.db:
+            expired = self.db.execute(
+                "DELETE FROM incidents WHERE last_seen < ?", (now - self.max_age_days * 86400,)
+            ).rowcount
+            self._drop_orphan_logs()
+            evicted = 0
+            excess = self.size() - self.max_bytes
+            while excess > 0:
+                # Oldest incidents first, until their bytes cover the excess. Shared
+                # log bodies are counted for each incident, so re-check afterwards.
+                ids, reclaimed = [], 0
+                for row in self.db.execute(
+                    "SELECT i.id, COALESCE(LENGTH(i.analysis), 0) + COALESCE(LENGTH(l.body), 0) AS size"
+                    " FROM incidents i LEFT JOIN logs l ON l.id = i.log_id ORDER BY i.last_seen"
+                ):
+                    ids.append(row["id"])
+                    reclaimed += row["size"]
+                    if reclaimed >= excess:
+                        break
+                if not ids:
+                    break
+                self.db.execute(f"DELETE FROM incidents WHERE id IN ({','.join('?' * len(ids))})", ids)
+                self._drop_orphan_logs()
+                evicted += len(ids)
+                excess = self.size() - self.max_bytes
+        self._last_prune = time.time()
+        if expired or evicted:
+            logging.info(f"Analysis store pruned {expired} expired and {evicted} excess incidents")
+        return expired + evicted
+
+    def compact(self):
+        """Prune, then give freed pages back to the filesystem"""
+        self.prune()
+        with self._lock:
+            self.db.execute("VACUUM")
+
+    def stats(self):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT COUNT(*) AS incidents, COALESCE(SUM(occurrences), 0) AS occurrences,"
+                " MIN(first_seen) AS oldest, MAX(last_seen) AS newest FROM incidents"
+            ).fetchone()
+            logs = self.db.execute(
+                "SELECT COUNT(*) AS count, COALESCE(SUM(raw_size), 0) AS raw,"
+                " COALESCE(SUM(LENGTH(body)), 0) AS compressed FROM logs"
+            ).fetchone()
+            size = self.size()
+        return {
+            "incidents": row["incidents"],
+            "occurrences": row["occurrences"],
+            "oldest": row["oldest"],
+            "newest": row["newest"],
+            "log_bodies": logs["count"],
+            "log_bytes_raw": logs["raw"],
+            "log_bytes_compressed": logs["compressed"],
+            "stored_bytes": size,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+# pod_logs/<namespace>_<pod>_<YYYYmmdd>_<HHMMSS>_logs.txt as written by the old save_analysis.
+# Kubernetes names cannot contain underscores, so the split is unambiguous.
+LEGACY_FILE = re.compile(r"^(?P<ns>[^_]+)_(?P<pod>[^_]+)_(?P<ts>\d{8}_\d{6})_logs\.txt$")
+
+
+def import_legacy_dir(store, directory):
+    """Load the per-scan text files of the old save_analysis into the store"""
+    from analysis_cache import normalize_log
+
+    imported = 0
+    for filename in sorted(os.listdir(directory)):
+        match = LEGACY_FILE.match(filename)
+        if not match:
+            continue
+        logs_path = os.path.join(directory, filename)
+        analysis_path = logs_path[:-len("_logs.txt")] + "_analysis.txt"
+        with open(logs_path, "r", encoding="utf-8", errors="replace") as f:
+            logs = f.read()
+        status, analysis = None, ""
+        if os.path.exists(analysis_path):
+            with open(analysis_path, "r", encoding="utf-8", errors="replace") as f:
+                header, _, analysis = f.read().partition("ANALYSIS:\n")
+            status = next((line[len("Status: "):] for line in header.splitlines() if line.startswith("Status: ")), None)
+
+        pod = {"metadata": {"namespace": match["ns"], "name": match["pod"]}}
+        seen_at = datetime.strptime(match["ts"], "%Y%m%d_%H%M%S").timestamp()
+        # The pod objects are gone, so fingerprint on pod + normalized logs only
+        key = hashlib.sha256(f"{match['ns']}/{match['pod']}\x00{normalize_log(logs)}".encode("utf-8")).hexdigest()
+        store.record(pod, logs, analysis, status, key, seen_at)
+        imported += 1
+    return imported
+
+
+def parse_time(text):
+    """Accept a unix timestamp, an ISO date/time or a relative age like 2h or 3d"""
+    match = re.fullmatch(r"(\d+)([smhd])", text)
+    if match:
+        seconds = int(match[1]) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match[2]]
+        return time.time() - seconds
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+def _format_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else "-"
+
+
+def print_incidents(incidents):
+    if not incidents:
+        print("No incidents found.")
+        return
+    for incident in incidents:
+        print(
+            f"#{incident['id']:<6} {_format_time(incident['last_seen'])}  "
+            f"{incident['namespace']}/{incident['pod']}  "
+            f"({incident['workload_kind']}/{incident['workload_name']}, seen {incident['occurrences']}x "
+            f"since {_format_time(incident['first_seen'])})"
+        )
+        if incident["status"]:
+            print(f"         Status: {incident['status']}")
+        summary = (incident["analysis"] or "").strip().splitlines()
+        if summary:
+            print(f"         {summary[0][:120]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the pod incident store")
+    parser.add_argument("--db", default=STORE_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(command):
+        command.add_argument("--namespace", "-n")
+        command.add_argument("--pod")
+        command.add_argument("--workload", help="Kind/name or name")
+        command.add_argument("--fingerprint", help="full fingerprint or a prefix")
+        command.add_argument("--limit", type=int, default=20)
+
+    latest = commands.add_parser("latest", help="most recently seen incidents")
+    add_filters(latest)
+    since = commands.add_parser("since", help="incidents seen since a time (ISO, unix, or 2h/3d ago)")
+    since.add_argument("time", type=parse_time)
+    add_filters(since)
+    show = commands.add_parser("show", help="full analysis of one incident")
+    show.add_argument("id", type=int)
+    show.add_argument("--logs", action="store_true", help="also print the stored logs")
+    commands.add_parser("stats", help="store size and counts")
+    commands.add_parser("compact", help="apply retention and vacuum the database")
+    legacy = commands.add_parser("import-dir", help="import an old pod_logs/ directory")
+    legacy.add_argument("directory")
+    args = parser.parse_args()
+
+    store = AnalysisStore(args.db)
+    try:
+        if args.command in ("latest", "since"):
+            print_incidents(store.query(
+                args.namespace, args.pod, args.workload, args.fingerprint,
+                since=getattr(args, "time", None), limit=args.limit
+            ))
+        elif args.command == "show":
+            incident = store.get(args.id)
+            if incident is None:
+                print(f"No incident #{args.id}")
+                return
+            print_incidents([incident])
+            print(f"\nFingerprint: {incident['fingerprint']}\n\nANALYSIS:\n{incident['analysis']}")
+            if args.logs:
+                print(f"\nLOGS:\n{store.logs(incident['log_id'])}")
+        elif args.command == "stats":
+            for key, value in store.stats().items():
+                print(f"{key:>22}: {_format_time(value) if key in ('oldest', 'newest') else value}")
+        elif args.command == "compact":
+            store.compact()
+            print(f"Store is now {store.stats()['file_bytes']} bytes")
+        elif args.command == "import-dir":
+            print(f"Imported {import_legacy_dir(store, args.directory)} incidents from {args.directory}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
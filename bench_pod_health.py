@@ -0,0 +1,81 @@
+"""Golden-corpus check and micro-benchmark for pod_health.classify.
+
+    python bench_pod_health.py [--pods 50000] [--rounds 5]
+
+First every case in golden_pods.json (built from crashloop.yaml,
+no_image.yaml, fail_command.yaml and a few common cluster states) is
+classified and compared with its expected verdict; any mismatch exits
+non-zero. Then a synthetic pod list is classified repeatedly and the best
+round is reported.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+from pod_health import classify
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_pods.json")
+TIME_BUDGET = 1.0  # seconds allowed for one pass over 50k pods
+
+
+def check_golden(path=GOLDEN_FILE):
+    with open(path, "r", encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    failures = 0
+    for case in cases:
+        verdict = classify(case["pod"])
+        got = {"severity": verdict.severity, "reason": verdict.reason, "container": verdict.container}
+        if got != case["expected"]:
+            failures += 1
+            print(f"FAIL {case['description']}: expected {case['expected']}, got {got}")
+    print(f"Golden corpus: {len(cases) - failures}/{len(cases)} cases match")
+    return cases, failures
+
+
+def synthetic_pods(cases, count, unhealthy_ratio=0.05):
+    """Mostly healthy pods with a sprinkling of the golden failure cases"""
+    healthy = [c["pod"] for c in cases if c["expected"]["severity"] == "ok" and c["pod"].get("status")]
+    failing = [c["pod"] for c in cases if c["expected"]["severity"] != "ok"]
+    every = max(1, int(1 / unhealthy_ratio)) if unhealthy_ratio else 0
+    pods = []
+    for i in range(count):
+        source = failing[i % len(failing)] if every and i % every == 0 else healthy[i % len(healthy)]
+        pod = copy.deepcopy(source)
+        pod["metadata"]["name"] = f"{pod['metadata']['name']}-{i}"
+        pods.append(pod)
+    return pods
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pod health classifier")
+    parser.add_argument("--pods", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    cases, failures = check_golden()
+    if failures:
+        sys.exit(1)
+
+    pods = synthetic_pods(cases, args.pods)
+    best = None
+    unhealthy = 0
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        unhealthy = sum(1 for pod in pods if classify(pod).severity != "ok")
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    per_pod_us = best / len(pods) * 1e6
+    print(f"Classified {len(pods)} pods ({unhealthy} unhealthy) in {best * 1000:.1f} ms "
+          f"best of {args.rounds} ({per_pod_us:.2f} us/pod)")
+    budget = TIME_BUDGET * len(pods) / 50000
+    if best > budget:
+        print(f"SLOW: exceeded budget of {budget * 1000:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Compare the full-JSON pod scan with the projected snapshot scan.
+
+    python bench_pod_scan.py [--pods 50000]
+
+A synthetic pod list is written twice to a temporary directory: as the
+`kubectl get pods -A -o json` document the old scan parses, and as the
+jsonpath projection pod_snapshot.scan_pods asks kubectl for. Each scan then
+runs in its own subprocess so peak RSS is measured independently.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from pod_health import classify, classify_status, OK
+from pod_snapshot import PROJECTION_FIELDS, parse_projected
+
+
+def synthetic_pod(i):
+    """A realistically sized pod object; every 20th one is crash-looping"""
+    deploy = f"app-{i // 10}"
+    pod_hash = f"{i // 10:08x}"
+    name = f"{deploy}-{pod_hash}-{i:05x}"
+    failing = i % 20 == 0
+    state = (
+        {"waiting": {"reason": "CrashLoopBackOff", "message": f"back-off 5m0s restarting failed container=app pod={name}"}}
+        if failing else {"running": {"startedAt": "2025-05-21T07:40:00Z"}}
+    )
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {
+            "name": name,
+            "namespace": f"team-{i % 50}",
+            "uid": f"00000000-0000-0000-0000-{i:012d}",
+            "resourceVersion": str(100000 + i),
+            "creationTimestamp": "2025-05-21T07:39:00Z",
+            "labels": {"app": deploy, "pod-template-hash": pod_hash},
+            "annotations": {"kubectl.kubernetes.io/restartedAt": "2025-05-21T07:38:00Z"},
+            "ownerReferences": [{"apiVersion": "apps/v1", "kind": "ReplicaSet", "name": f"{deploy}-{pod_hash}",
+                                 "uid": f"11111111-0000-0000-0000-{i // 10:012d}", "controller": True,
+                                 "blockOwnerDeletion": True}],
+            "managedFields": [{"manager": "kube-controller-manager", "operation": "Update", "apiVersion": "v1",
+                               "time": "2025-05-21T07:39:00Z", "fieldsType": "FieldsV1",
+                               "fieldsV1": {"f:metadata": {"f:labels": {".": {}, "f:app": {}}}}}],
+        },
+        "spec": {
+            "containers": [{
+                "name": "app",
+                "image": f"registry.example.com/{deploy}:1.0.{i % 7}",
+                "command": ["sh", "-c", "exec /app/server --port=8080"],
+                "env": [{"name": f"VAR_{k}", "value": f"value-{k}"} for k in range(8)],
+                "resources": {"limits": {"cpu": "500m", "memory": "256Mi"}, "requests": {"cpu": "100m", "memory": "128Mi"}},
+                "volumeMounts": [{"name": "kube-api-access", "mountPath": "/var/run/secrets/kubernetes.io/serviceaccount", "readOnly": True}],
+            }],
+            "nodeName": f"node-{i % 30}",
+            "serviceAccountName": "default",
+            "tolerations": [{"key": "node.kubernetes.io/not-ready", "operator": "Exists", "effect": "NoExecute", "tolerationSeconds": 300}],
+            "volumes": [{"name": "kube-api-access", "projected": {"sources": [{"serviceAccountToken": {"path": "token", "expirationSeconds": 3607}}]}}],
+        },
+        "status": {
+            "phase": "Running",
+            "conditions": [{"type": t, "status": "False" if failing and t in ("Ready", "ContainersReady") else "True",
+                            "lastTransitionTime": "2025-05-21T07:39:10Z"} for t in ("Initialized", "Ready", "ContainersReady", "PodScheduled")],
+            "hostIP": f"10.0.{i % 30}.1",
+            "podIP": f"10.244.{(i // 250) % 250}.{i % 250}",
+            "podIPs": [{"ip": f"10.244.{(i // 250) % 250}.{i % 250}"}],
+            "startTime": "2025-05-21T07:39:00Z",
+            "containerStatuses": [{
+                "name": "app",
+                "ready": not failing,
+                "started": not failing,
+                "restartCount": 12 if failing else 0,
+                "image": f"registry.example.com/{deploy}:1.0.{i % 7}",
+                "imageID": f"registry.example.com/{deploy}@sha256:{i:064x}",
+                "containerID": f"containerd://{i:064x}",
+                "state": state,
+                "lastState": {"terminated": {"reason": "Error", "exitCode": 1}} if failing else {},
+            }],
+        },
+    }
+
+
+def project(pod):
+    """Render a pod the way kubectl renders PROJECTION_TEMPLATE"""
+    values = []
+    for field in PROJECTION_FIELDS:
+        value = pod
+        for key in field.strip(".").split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            values.append("")
+        elif isinstance(value, (dict, list)):
+            values.append(json.dumps(value, separators=(",", ":")))
+        else:
+            values.append(str(value))
+    return "\t".join(values) + "\n"
+
+
+def run_full(path):
+    with open(path, "r", encoding="utf-8") as f:
+        pods = json.loads(f.read())["items"]
+    return sum(1 for pod in pods if classify(pod).severity != OK), len(pods)
+
+
+def run_projected(path):
+    # Like scan_unhealthy, only unhealthy snapshots are kept
+    total = 0
+    unhealthy = []
+    with open(path, "r", encoding="utf-8") as f:
+        for snapshot in parse_projected(f):
+            total += 1
+            if classify_status(snapshot.status).severity != OK:
+                unhealthy.append(snapshot)
+    return len(unhealthy), total
+
+
+def child(mode, path):
+    start = time.perf_counter()
+    unhealthy, total = run_full(path) if mode == "full" else run_projected(path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "pods": total, "unhealthy": unhealthy, "seconds": elapsed, "peak_rss_mib": peak_kib / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs projected pod scans")
+    parser.add_argument("--pods", type=int, default=50000)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path = os.path.join(tmp, "pods.json")
+        projected_path = os.path.join(tmp, "pods.tsv")
+        with open(full_path, "w", encoding="utf-8") as full, open(projected_path, "w", encoding="utf-8") as projected:
+            full.write('{"apiVersion":"v1","kind":"List","metadata":{"resourceVersion":""},"items":[')
+            for i in range(args.pods):
+                pod = synthetic_pod(i)
+                full.write(("," if i else "") + json.dumps(pod))
+                # The field selector drops Succeeded pods server-side; this list has none
+                projected.write(project(pod))
+            full.write("]}")
+
+        print(f"{'scan':<10} {'pods':>7} {'unhealthy':>9} {'input MiB':>9} {'seconds':>8} {'peak RSS MiB':>12}")
+        for mode, path in (("full", full_path), ("projected", projected_path)):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, path],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output)
+            size = os.path.getsize(path) / (1024 * 1024)
+            print(f"{mode:<10} {result['pods']:>7} {result['unhealthy']:>9} {size:>9.1f} "
+                  f"{result['seconds']:>8.2f} {result['peak_rss_mib']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
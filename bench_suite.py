@@ -0,0 +1,214 @@
+"""End-to-end benchmark of the monitors against a synthetic cluster.
+
+    python bench_suite.py --sizes 100,1000,10000 --targets main,claude_code,trial_1
+
+A `kubectl` shim for fake_kubectl.py is put first on the PATH (or, with
+--backend api, fake_kubectl serves the cluster over HTTP to ApiBackend) and a
+fake Ollama server (fake_ollama.py) is started in this process. Each target then
+runs one full scan-and-diagnose pass in its own subprocess, from a scratch
+directory so caches and logs start cold, and reports:
+
+- scan_seconds: listing and parsing pods (podmon_pod_list_seconds)
+- diagnosis_seconds_per_pod: pass time after the scan / unhealthy pods
+- llm_calls / llm_seconds_mean: Ollama requests actually made
+- peak_rss_mib: peak resident memory of the target process
+
+Results are written as JSON to bench_results/<commit>.json (or --output) so
+runs from different commits can be compared.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from fake_kubectl import DEFAULT_MIX, make_api_server, make_spec, parse_mix, write_kubeconfig
+from fake_ollama import make_server
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TARGETS = ("main", "claude_code", "trial_1")
+
+
+def run_target(target):
+    """One scan-and-diagnose pass of target, the way its main loop does it"""
+    if target == "main":
+        import main
+        main.main()
+    elif target == "claude_code":
+        import claude_code
+        claude_code.init_ollama()
+        claude_code.scan_once()
+    elif target == "trial_1":
+        import trial_1
+        trial_1.check_ollama_connection()
+        trial_1.scan_once()
+    else:
+        raise ValueError(f"Unknown target {target!r}")
+
+
+def child(target, result_path):
+    # Keep the target's own output out of the harness report
+    sys.stdout = open(os.devnull, "w")
+
+    import metrics
+    start = time.monotonic()
+    run_target(target)
+    elapsed = time.monotonic() - start
+
+    scan_count, scan_seconds = metrics.POD_LIST_SECONDS.totals()
+    llm_calls, llm_seconds = metrics.LLM_REQUEST_SECONDS.totals()
+    unhealthy = metrics.UNHEALTHY_PODS.total()
+    collected = metrics.POD_COLLECT_SECONDS.totals()[0]
+
+    result = {
+        "pass_seconds": elapsed,
+        "scan_seconds": scan_seconds,
+        "scans": scan_count,
+        "unhealthy": unhealthy,
+        "evidence_fetches": collected,
+        "llm_calls": llm_calls,
+        "llm_seconds_mean": llm_seconds / llm_calls if llm_calls else None,
+        "diagnosis_seconds_per_pod": (elapsed - scan_seconds) / unhealthy if unhealthy else None,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+def install_fake_kubectl(directory):
+    path = os.path.join(directory, "kubectl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(HERE, "fake_kubectl.py")}" "$@"\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench(target, size, args, workdir, env):
+    scratch = tempfile.mkdtemp(prefix=f"{target}-{size}-", dir=workdir)
+    spec = make_spec(size, args.mix, args.seed)
+    spec_path = os.path.join(scratch, "cluster.json")
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    result_path = os.path.join(scratch, "result.json")
+
+    child_env = dict(env, FAKE_KUBECTL_SPEC=spec_path)
+    api_server = None
+    if args.backend == "api":
+        api_server = make_api_server(spec, latency=args.kubectl_latency)
+        threading.Thread(target=api_server.serve_forever, daemon=True).start()
+        kubeconfig = os.path.join(scratch, "kubeconfig")
+        write_kubeconfig(kubeconfig, f"http://127.0.0.1:{api_server.server_port}")
+        child_env.update(K8S_BACKEND="api", KUBECONFIG=kubeconfig)
+    started = time.monotonic()
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.join(HERE, "bench_suite.py"), "--child", target, result_path],
+            cwd=scratch, env=child_env, capture_output=True, text=True, timeout=args.timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {args.timeout}s"}
+    finally:
+        if api_server is not None:
+            api_server.shutdown()
+            api_server.server_close()
+    if completed.returncode != 0 or not os.path.exists(result_path):
+        return {"error": completed.stderr.strip().splitlines()[-1:] or f"exit code {completed.returncode}"}
+
+    with open(result_path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    result["wall_seconds"] = time.monotonic() - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the monitors against fake kubectl and fake Ollama")
+    parser.add_argument("--sizes", default="100,1000", help="comma-separated cluster sizes (pods)")
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="failure mix, e.g. crashloop=0.05,oom=0.01")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--backend", choices=("kubectl", "api"), default="kubectl",
+                        help="serve the cluster through the kubectl shim or a fake API server")
+    parser.add_argument("--kubectl-latency", type=float, default=0.05, help="seconds per logs/describe call")
+    parser.add_argument("--ollama-latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="seconds between tokens")
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds allowed per run")
+    parser.add_argument("--output", help="result file (default bench_results/<commit>.json)")
+    parser.add_argument("--child", nargs=2, metavar=("TARGET", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    targets = [t for t in args.targets.split(",") if t]
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    commit = current_commit()
+    output = args.output or os.path.join(HERE, "bench_results", f"{commit}.json")
+
+    server = make_server("127.0.0.1", 0, args.ollama_latency, args.token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp(prefix="podmon-bench-")
+    bin_dir = os.path.join(workdir, "bin")
+    os.mkdir(bin_dir)
+    install_fake_kubectl(bin_dir)
+    env = dict(
+        os.environ,
+        PATH=bin_dir + os.pathsep + os.environ.get("PATH", ""),
+        PYTHONPATH=HERE + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        K8S_BACKEND="kubectl",
+        OLLAMA_HOST=f"http://127.0.0.1:{server.server_port}",
+        FAKE_KUBECTL_LATENCY=str(args.kubectl_latency),
+        METRICS_PORT="0",
+    )
+
+    runs = []
+    print(f"{'target':<12} {'pods':>6} {'unhealthy':>9} {'scan s':>8} {'diag s/pod':>10} "
+          f"{'llm calls':>9} {'pass s':>8} {'peak MiB':>9}")
+    try:
+        for size in sizes:
+            for target in targets:
+                result = bench(target, size, args, workdir, env)
+                runs.append(dict(result, target=target, pods=size))
+                if "error" in result:
+                    print(f"{target:<12} {size:>6}  failed: {result['error']}")
+                    continue
+                diag = result["diagnosis_seconds_per_pod"]
+                print(f"{target:<12} {size:>6} {result['unhealthy']:>9} {result['scan_seconds']:>8.2f} "
+                      f"{diag if diag is not None else float('nan'):>10.3f} {result['llm_calls']:>9} "
+                      f"{result['pass_seconds']:>8.2f} {result['peak_rss_mib']:>9.1f}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "settings": {
+                "mix": args.mix, "seed": args.seed, "backend": args.backend, "kubectl_latency": args.kubectl_latency,
+                "ollama_latency": args.ollama_latency, "token_delay": args.token_delay,
+            },
+            "runs": runs,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
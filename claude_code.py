@@ -1,10 +1,24 @@
-import subprocess
-import json
+import os
 import time
 import requests
 import logging
 import sys
 from datetime import datetime
+from pod_watch import PodWatcher, pod_key
+from analysis_cache import AnalysisCache, fingerprint, format_cached
+from incident_index import IncidentIndex, format_similar, incident_text
+from collector import collect_scan_evidence
+from ollama_health import OllamaHealthMonitor
+from ollama_client import OllamaClient, OllamaError
+from pod_health import is_pod_unhealthy
+from pod_snapshot import scan_unhealthy
+from k8s_backend import KubeError, get_backend
+from metrics import start_http_server
+from workloads import describe_group, group_failures
+from scheduler import ScanScheduler, recheck
+from log_excerpt import excerpt, fetch_pod_logs
+from prompt_builder import PromptTemplate
+from log_tail import LogTailManager
 
 # Logging setup
 logging.basicConfig(
@@ -14,219 +28,298 @@ logging.basicConfig(
 )
 
 # Configuration
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
 OLLAMA_TIMEOUT = 60
+OLLAMA_PROBE_INTERVAL = 30
 MODEL_NAME = "gemma:2b"
-SCAN_INTERVAL = 60
-OFFLINE_MODE = False
+SCAN_INTERVAL = 60  # starting point; the scheduler adapts it between 10s and 5 min
+KUBECTL_TIMEOUT = 30
+PROJECTED_SCAN = True
+OFFLINE_MODE = "--offline" in sys.argv
+
+ANALYSIS_CACHE = AnalysisCache()
+INCIDENT_INDEX = IncidentIndex()
+LOG_TAILS = LogTailManager()
+OLLAMA = OllamaClient(OLLAMA_BASE_URL, read_timeout=OLLAMA_TIMEOUT)
+OLLAMA_HEALTH = OllamaHealthMonitor(MODEL_NAME, OLLAMA, OLLAMA_PROBE_INTERVAL)
+# An Ollama embedder is not called while the circuit is open
+INCIDENT_INDEX.paused = OLLAMA_HEALTH.circuit_open
+
+# Same instructions for every pod, so Ollama reuses their cached prefix
+ANALYSIS_PROMPT = PromptTemplate("analysis", """
+You are analyzing a Kubernetes pod that is experiencing an error.
+
+Your task is to:
+1. Explain what steps occurred **before the error**.
+2. Identify **what the error is**.
+3. Determine **what caused the error**, based on logs and pod description.
+4. Suggest practical steps to resolve the issue.
+""", MODEL_NAME)
 
-def run_kubectl_command(command):
+def run_kube_call(method, *args, **kwargs):
     try:
-        result = subprocess.run(
-            f"kubectl {command}",
-            shell=True,
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            logging.error(f"Command failed: {result.stderr}")
-            return None
-        return result.stdout
-    except Exception as e:
-        logging.error(f"Error executing kubectl command: {e}")
+        return getattr(get_backend(), method)(*args, timeout=KUBECTL_TIMEOUT, **kwargs)
+    except KubeError as e:
+        logging.error(f"Command failed: {e}")
         return None
 
 def get_pods():
-    output = run_kubectl_command("get pods --all-namespaces -o json")
-    if not output:
-        return []
-    try:
-        pods_data = json.loads(output)
-        return pods_data.get("items", [])
-    except json.JSONDecodeError:
-        logging.error("Failed to parse pod JSON data")
-        return []
+    return run_kube_call("list_pods") or []
 
-def is_pod_unhealthy(pod):
-    status = pod.get("status", {})
-    phase = status.get("phase", "")
-
-    if phase in ["Failed", "Unknown"]:
-        return True
-
-    if phase == "Pending" and "conditions" in status:
-        for condition in status["conditions"]:
-            if condition.get("type") == "PodScheduled" and condition.get("status") == "False":
-                return True
-
-    if phase == "Running":
-        for container in status.get("containerStatuses", []):
-            if not container.get("ready", True):
-                state = container.get("state", {})
-                if "waiting" in state or "terminated" in state:
-                    return True
-    return False
-
-def get_pod_logs(namespace, pod_name, container=None):
-    command = f"logs -n {namespace} {pod_name}"
-    if container:
-        command += f" -c {container}"
-    return run_kubectl_command(command)
+def get_unhealthy_pods():
+    if not PROJECTED_SCAN:
+        return [pod for pod in get_pods() if is_pod_unhealthy(pod)]
+    # Errors propagate so the main loop can back off
+    return [snapshot.to_pod() for snapshot, _ in scan_unhealthy()]
+
+def get_pod(namespace, pod_name):
+    # KubeError propagates: a re-check tells a deleted pod from a failed call
+    return get_backend().get_pod(namespace, pod_name, timeout=KUBECTL_TIMEOUT)
+
+def get_pod_logs(namespace, pod_name, pod=None):
+    # Bounded tails, plus the crashed instance's log for restarted containers
+    try:
+        return fetch_pod_logs(get_backend(), namespace, pod_name, pod, timeout=KUBECTL_TIMEOUT, tails=LOG_TAILS)
+    except KubeError as e:
+        logging.error(f"Command failed: {e}")
+        return None
 
 def get_pod_description(namespace, pod_name):
-    return run_kubectl_command(f"describe pod -n {namespace} {pod_name}")
+    return run_kube_call("describe_pod", namespace, pod_name)
 
 def check_ollama_status():
-    global OFFLINE_MODE
     if OFFLINE_MODE:
         return False
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code != 200:
-            return False
-        models = response.json().get("models", [])
-        if not any(m.get("name") == MODEL_NAME for m in models):
-            logging.warning(f"Model {MODEL_NAME} not loaded. Run 'ollama run {MODEL_NAME}'")
-            return False
-        test = requests.post(
-            OLLAMA_API_URL,
-            json={"model": MODEL_NAME, "prompt": "hello", "stream": False},
-            timeout=10
-        )
-        return test.status_code == 200
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Ollama connection issue: {e}")
-        return False
+    return OLLAMA_HEALTH.available()
 
-def analyze_with_ollama(logs, pod_description, pod_info):
+def analyze_with_ollama(logs, pod_description, pod_info, cache_key=None):
     if OFFLINE_MODE:
         return "AI analysis disabled (offline mode). Please review logs and pod description manually."
 
-    try:
-        logging.info(f"Analyzing pod {pod_info['namespace']}/{pod_info['name']} with Ollama")
-
-        pod_desc_excerpt = pod_description[:2000] if pod_description else "No description available"
-        logs_excerpt = logs[:2000] if logs else "No logs available"
+    # The same failure seen in another workload or namespace; checked before
+    # the circuit breaker so a half-open trial is only taken for a real request
+    text = incident_text(pod_info["status"], logs)
+    similar = INCIDENT_INDEX.lookup(text)
+    if similar:
+        logging.info(f"Reusing diagnosis of a similar incident ({similar['similarity']:.0%} match)")
+        return format_similar(similar)
 
-        prompt = f"""
-You are analyzing a Kubernetes pod that is experiencing an error.
-
-Your task is to:
-1. Explain what steps occurred **before the error**.
-2. Identify **what the error is**.
-3. Determine **what caused the error**, based on logs and pod description.
-4. Suggest practical steps to resolve the issue.
-
---- Pod Name ---
-{pod_info['name']}
-
---- Namespace ---
-{pod_info['namespace']}
-
---- Pod Status ---
-{pod_info['status']}
-
---- Logs ---
-{logs_excerpt}
-
---- Pod Description ---
-{pod_desc_excerpt}
-"""
+    if not check_ollama_status():
+        return "AI analysis not available (Ollama unhealthy, retrying automatically). Manual review required."
 
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={"model": MODEL_NAME, "prompt": prompt, "stream": False},
-            timeout=OLLAMA_TIMEOUT
-        )
+    in_flight = False
+    try:
+        logging.info(f"Analyzing pod {pod_info['namespace']}/{pod_info['name']} with Ollama")
 
-        if response.status_code == 200:
-            return response.json().get("response", "No analysis provided")
-        else:
-            return f"Ollama error: {response.status_code} - {response.text}"
+        prompt = ANALYSIS_PROMPT.render([
+            ("Pod Name", pod_info['name']),
+            ("Namespace", pod_info['namespace']),
+            ("Pod Status", pod_info['status']),
+            ("Logs", logs or "No logs available", 2000, excerpt),
+            ("Pod Description", pod_description or "No description available", 2000),
+        ])
+
+        in_flight = True
+        result = OLLAMA.generate(prompt, MODEL_NAME, **ANALYSIS_PROMPT.options())
+        in_flight = False
+        OLLAMA_HEALTH.record_success()
+        analysis = result.get("response", "No analysis provided")
+        if cache_key:
+            ANALYSIS_CACHE.put(cache_key, analysis)
+        INCIDENT_INDEX.add(text, analysis, cache_key)
+        return analysis
+
+    except OllamaError as e:
+        OLLAMA_HEALTH.record_failure()
+        return f"Ollama error: {e}"
 
     except requests.exceptions.Timeout:
+        OLLAMA_HEALTH.record_failure()
         return "Ollama analysis timed out."
     except requests.exceptions.ConnectionError:
+        OLLAMA_HEALTH.record_failure()
         return "Could not connect to Ollama API."
     except Exception as e:
+        # A request that failed counts against Ollama; anything else just gives the trial back
+        if in_flight:
+            OLLAMA_HEALTH.record_failure()
+        else:
+            OLLAMA_HEALTH.release()
         return f"Unexpected error during analysis: {e}"
 
-def main_loop():
-    global OFFLINE_MODE
+def init_ollama():
     logging.info("Starting pod monitor with AI integration (Ollama)")
     logging.info(f"Model: {MODEL_NAME}")
 
-    if not check_ollama_status():
-        if input("Ollama not ready. Type 'offline' to continue without AI: ").lower() == "offline":
-            OFFLINE_MODE = True
-            logging.info("Running in OFFLINE mode.")
+    if OFFLINE_MODE:
+        logging.info("Running in OFFLINE mode.")
+        return
+
+    # Probes run in the background; scans fall back to offline analysis
+    # while the circuit is open instead of waiting for Ollama.
+    OLLAMA_HEALTH.start()
+
+def collect_evidence(pods):
+    evidence = collect_scan_evidence(pods, tails=LOG_TAILS)
+    return [
+        (e["logs"][1] if e["logs"][0] else None, e["description"][1] if e["description"][0] else None)
+        for e in evidence
+    ]
+
+def handle_unhealthy_pod(pod, evidence=None, members=(), cluster=None):
+    metadata = pod.get("metadata", {})
+    status = pod.get("status", {})
+    pod_name = metadata.get("name", "unknown")
+    namespace = metadata.get("namespace", "default")
+
+    # Pods from several clusters share this output; tag them with their context
+    where = f"[{cluster}] {namespace}/{pod_name}" if cluster else f"{namespace}/{pod_name}"
+    logging.info(f"Found unhealthy pod: {where}")
+
+    if evidence is None:
+        evidence = (get_pod_logs(namespace, pod_name, pod), get_pod_description(namespace, pod_name))
+    logs = evidence[0] or "No logs available"
+    pod_description = evidence[1] or "No description available"
+
+    container_statuses = status.get("containerStatuses", [])
+    status_details = "Unknown"
+    for container in container_statuses:
+        state = container.get("state", {})
+        if "waiting" in state:
+            reason = state["waiting"].get("reason", "")
+            message = state["waiting"].get("message", "")
+            status_details = f"Waiting: {reason} - {message}"
+        elif "terminated" in state:
+            reason = state["terminated"].get("reason", "")
+            exit_code = state["terminated"].get("exitCode", "")
+            status_details = f"Terminated: {reason} (Exit code: {exit_code})"
+
+    pod_info = {
+        "name": pod_name,
+        "namespace": namespace,
+        "status": status_details
+    }
+
+    cache_key = fingerprint(pod, logs)
+    cached = ANALYSIS_CACHE.get(cache_key)
+    if cached:
+        analysis = format_cached(cached)
+    elif OFFLINE_MODE:
+        analysis = "AI analysis not available. Manual review required."
+    else:
+        analysis = analyze_with_ollama(logs, pod_description, pod_info, cache_key)
+
+    report = ["\n" + "="*80, f"ISSUE DETECTED: Pod {where}", f"Status: {status_details}"]
+    if members:
+        names = ", ".join(m.get("metadata", {}).get("name", "unknown") for m in members)
+        report.append(f"Also affected ({len(members)} more pods of the same workload): {names}")
+    report += [
+        "-"*80,
+        "POD LOGS:",
+        excerpt(logs, 500),
+        "-"*80,
+        "AI ANALYSIS:",
+        analysis,
+        "="*80 + "\n",
+    ]
+    # One write per report so concurrent analyses do not interleave
+    print("\n".join(report))
+
+def log_cache_stats():
+    stats = ANALYSIS_CACHE.stats()
+    logging.info(
+        f"Analysis cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} of LLM calls saved), {stats['entries']} entries"
+    )
+    stats = INCIDENT_INDEX.stats()
+    logging.info(
+        f"Incident index: {stats['hits']} similar-incident reuses, {stats['misses']} misses, "
+        f"{stats['incidents']} incidents"
+    )
+    stats = LOG_TAILS.stats()
+    logging.info(
+        f"Log tails: {stats['lines']} lines buffered for {stats['containers']} containers, "
+        f"{stats['fetched_bytes']} bytes fetched"
+    )
+
+def scan_once():
+    logging.info("Scanning for unhealthy pods...")
+    unhealthy = get_unhealthy_pods()
+
+    # Replicas of one workload failing the same way share one analysis
+    groups = group_failures(unhealthy)
+    representatives = [members[0] for _, members in groups]
+    for (key, members), evidence in zip(groups, collect_evidence(representatives)):
+        if len(members) > 1:
+            logging.info(f"Grouped {describe_group(key, members)}")
+        handle_unhealthy_pod(members[0], evidence, members[1:])
+
+    if len(unhealthy) > len(groups):
+        logging.info(
+            f"{len(unhealthy)} unhealthy pods in {len(groups)} groups, "
+            f"{len(unhealthy) - len(groups)} analyses avoided"
+        )
+
+    if not unhealthy:
+        logging.info("No unhealthy pods found.")
+
+    # Pods that recovered or were deleted take their log buffers with them
+    LOG_TAILS.retain(unhealthy)
+    ANALYSIS_CACHE.save()
+    log_cache_stats()
+    return unhealthy
+
+def main_loop():
+    init_ollama()
+    start_http_server()
+    scheduler = ScanScheduler(SCAN_INTERVAL)
 
     while True:
         try:
-            logging.info("Scanning for unhealthy pods...")
-            pods = get_pods()
-            unhealthy_found = False
+            for pod in scheduler.due_rechecks():
+                recheck(scheduler, pod, get_pod, is_pod_unhealthy, handle_unhealthy_pod)
 
-            for pod in pods:
-                metadata = pod.get("metadata", {})
-                status = pod.get("status", {})
-                pod_name = metadata.get("name", "unknown")
-                namespace = metadata.get("namespace", "default")
+            if scheduler.scan_due():
+                new = scheduler.scan_finished(scan_once())
+                if new:
+                    logging.info(f"{len(new)} newly unhealthy pods, scanning more often")
+                logging.info(f"Scan interval {scheduler.interval:.0f}s: {scheduler.describe()}")
 
-                if is_pod_unhealthy(pod):
-                    unhealthy_found = True
-                    logging.info(f"Found unhealthy pod: {namespace}/{pod_name}")
-
-                    logs = get_pod_logs(namespace, pod_name) or "No logs available"
-                    pod_description = get_pod_description(namespace, pod_name) or "No description available"
-
-                    container_statuses = status.get("containerStatuses", [])
-                    status_details = "Unknown"
-                    for container in container_statuses:
-                        state = container.get("state", {})
-                        if "waiting" in state:
-                            reason = state["waiting"].get("reason", "")
-                            message = state["waiting"].get("message", "")
-                            status_details = f"Waiting: {reason} - {message}"
-                        elif "terminated" in state:
-                            reason = state["terminated"].get("reason", "")
-                            exit_code = state["terminated"].get("exitCode", "")
-                            status_details = f"Terminated: {reason} (Exit code: {exit_code})"
-
-                    pod_info = {
-                        "name": pod_name,
-                        "namespace": namespace,
-                        "status": status_details
-                    }
-
-                    if not OFFLINE_MODE and check_ollama_status():
-                        analysis = analyze_with_ollama(logs, pod_description, pod_info)
-                    else:
-                        analysis = "AI analysis not available. Manual review required."
-
-                    print("\n" + "="*80)
-                    print(f"ISSUE DETECTED: Pod {namespace}/{pod_name}")
-                    print(f"Status: {status_details}")
-                    print("-"*80)
-                    print("POD LOGS:")
-                    print(logs[:500] + "..." if len(logs) > 500 else logs)
-                    print("-"*80)
-                    print("AI ANALYSIS:")
-                    print(analysis)
-                    print("="*80 + "\n")
-
-            if not unhealthy_found:
-                logging.info("No unhealthy pods found.")
-
-            logging.info(f"Sleeping for {SCAN_INTERVAL} seconds...")
-            time.sleep(SCAN_INTERVAL)
+            time.sleep(scheduler.wait())
 
         except KeyboardInterrupt:
             logging.info("Monitoring stopped by user.")
             break
         except Exception as e:
+            delay = scheduler.scan_failed()
             logging.error(f"Main loop error: {e}")
-            time.sleep(60)
+            logging.info(f"Retrying in {delay:.0f} seconds...")
+            time.sleep(delay)
+
+def watch_loop():
+    init_ollama()
+    start_http_server()
+    logging.info("Watching pods for changes...")
+    # Deleted pods take their log buffers with them
+    watcher = PodWatcher(on_delete=LOG_TAILS.forget)
+
+    try:
+        for pod in watcher.stream():
+            try:
+                if is_pod_unhealthy(pod):
+                    handle_unhealthy_pod(pod)
+                    ANALYSIS_CACHE.save()
+                else:
+                    # So do pods that recovered
+                    LOG_TAILS.forget(pod)
+            except Exception as e:
+                logging.error(f"Error handling pod {pod_key(pod)}: {e}")
+    except KeyboardInterrupt:
+        logging.info("Monitoring stopped by user.")
+    log_cache_stats()
 
 if __name__ == "__main__":
-    main_loop()
+    if "--watch" in sys.argv:
+        watch_loop()
+    else:
+        main_loop()
@@ -0,0 +1,114 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from event_index import load_event_index
+from k8s_backend import KubeError, get_backend
+from log_excerpt import fetch_pod_logs
+from metrics import POD_COLLECT_SECONDS
+
+# Configuration
+MAX_WORKERS = 16        # concurrent Kubernetes calls
+KUBECTL_TIMEOUT = 30    # seconds per call
+
+
+def _call(fn, *args, **kwargs):
+    """Return (ok, output or error text) for a backend call"""
+    try:
+        return True, fn(*args, **kwargs)
+    except KubeError as e:
+        return False, str(e)
+
+
+def fetch_logs(namespace, pod_name, timeout=KUBECTL_TIMEOUT, backend=None, pod=None, tails=None):
+    """Bounded log tails; with the pod object, crashed containers' previous logs too"""
+    backend = backend or get_backend()
+    with POD_COLLECT_SECONDS.time(kind="logs"):
+        return _call(fetch_pod_logs, backend, namespace, pod_name, pod, timeout, tails=tails)
+
+
+def fetch_description(namespace, pod_name, timeout=KUBECTL_TIMEOUT, backend=None):
+    backend = backend or get_backend()
+    with POD_COLLECT_SECONDS.time(kind="description"):
+        return _call(backend.describe_pod, namespace, pod_name, timeout=timeout)
+
+
+def collect(items, fetch, max_workers=MAX_WORKERS):
+    """Call fetch(item) for every item on a bounded thread pool.
+
+    Results come back in the same order as items. A fetch that raises yields
+    None for its item instead of aborting the whole batch.
+    """
+    if not items:
+        return []
+
+    def guarded(item):
+        try:
+            return fetch(item)
+        except Exception as e:
+            logging.error(f"Evidence collection failed for {item}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(guarded, items))
+
+
+def collect_pod_evidence(pods, describe=True, max_workers=MAX_WORKERS, timeout=KUBECTL_TIMEOUT, backend=None):
+    """Fetch logs (and descriptions) for (namespace, name) pairs in parallel.
+
+    Returns one {"logs": (ok, text), "description": (ok, text) or None} dict
+    per pod, in input order.
+    """
+    tasks = [(ns, name, "logs") for ns, name in pods]
+    if describe:
+        tasks += [(ns, name, "description") for ns, name in pods]
+
+    backend = backend or get_backend()
+
+    def fetch(task):
+        ns, name, kind = task
+        if kind == "logs":
+            return fetch_logs(ns, name, timeout, backend)
+        return fetch_description(ns, name, timeout, backend)
+
+    results = collect(tasks, fetch, max_workers)
+    failed = (False, "Evidence collection failed")
+    evidence = []
+    for i in range(len(pods)):
+        evidence.append({
+            "logs": results[i] or failed,
+            "description": (results[len(pods) + i] or failed) if describe else None,
+        })
+    return evidence
+
+
+def collect_scan_evidence(pods, max_workers=MAX_WORKERS, timeout=KUBECTL_TIMEOUT, backend=None, tails=None):
+    """Like collect_pod_evidence, for pod objects a scan already holds.
+
+    Logs are still fetched per pod (incrementally through tails, a
+    log_tail.LogTailManager, if given), but descriptions are built from the
+    pod object and one cluster-wide event list instead of a describe per pod.
+    """
+    backend = backend or get_backend()
+    if not pods:
+        return []
+    index = load_event_index(backend)
+
+    def fetch(task):
+        pod, kind = task
+        ns, name = pod["metadata"]["namespace"], pod["metadata"]["name"]
+        if kind == "logs":
+            return fetch_logs(ns, name, timeout, backend, pod, tails)
+        return fetch_description(ns, name, timeout, backend)
+
+    tasks = [(pod, "logs") for pod in pods]
+    if index is None:
+        tasks += [(pod, "description") for pod in pods]
+    results = collect(tasks, fetch, max_workers)
+    failed = (False, "Evidence collection failed")
+    evidence = []
+    for i, pod in enumerate(pods):
+        evidence.append({
+            "logs": results[i] or failed,
+            "description": (True, index.describe(pod)) if index else (results[len(pods) + i] or failed),
+        })
+    return evidence
@@ -0,0 +1,96 @@
+import json
+import logging
+
+from metrics import LLM_DECISIONS
+from ollama_client import JsonObjectScanner, NoJsonError
+from triage import VALID_ACTIONS
+
+# Configuration
+MAX_CAUSE_CHARS = 500        # longer causes are cut
+MAX_DETAILS_CHARS = 2000     # and details
+MAX_REJECTED_CHARS = 1000    # of a rejected answer quoted back in the repair prompt
+
+# Passed as Ollama's `format`, which constrains generation to this schema
+DECISION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "cause": {"type": "string"},
+        "action": {"type": "string", "enum": list(VALID_ACTIONS)},
+        "details": {"type": "string"},
+    },
+    "required": ["cause", "action"],
+}
+
+
+class DecisionError(ValueError):
+    """The model's answer is not a usable remediation decision"""
+
+    def __init__(self, message, answer=""):
+        super().__init__(message)
+        self.answer = answer
+
+
+def validate_decision(obj, answer=""):
+    """Return obj as a decision dict with a supported action, or raise DecisionError"""
+    if not isinstance(obj, dict):
+        raise DecisionError(f"expected a JSON object, got {type(obj).__name__}", answer)
+    action = obj.get("action")
+    if isinstance(action, str):
+        action = action.strip().lower()
+    if action not in VALID_ACTIONS:
+        raise DecisionError(f"action {action!r} is not one of {', '.join(VALID_ACTIONS)}", answer)
+    cause = obj.get("cause")
+    if not isinstance(cause, str) or not cause.strip():
+        raise DecisionError("cause is missing", answer)
+    details = obj.get("details") or ""
+    return {
+        "cause": cause.strip()[:MAX_CAUSE_CHARS],
+        "action": action,
+        "details": str(details).strip()[:MAX_DETAILS_CHARS],
+    }
+
+
+def parse_decision(text):
+    """Validate the first complete JSON object in text"""
+    obj = JsonObjectScanner().feed(text or "")
+    if obj is None:
+        raise DecisionError("no JSON object in the answer", text)
+    return validate_decision(obj, text)
+
+
+def request_decision(client, prompt, model, stream=False, **options):
+    """Generate a decision in JSON-schema mode, with at most one repair attempt.
+
+    Returns (decision, timings); timings is only set for streamed answers.
+    A rejected answer is sent back after the original prompt, which Ollama
+    still has cached, together with why it was rejected. Raises
+    DecisionError if the repaired answer is unusable too.
+    """
+    options = dict(options, format=DECISION_SCHEMA)
+    timings = None
+    try:
+        if stream:
+            try:
+                obj, timings = client.generate_json_stream(prompt, model, **options)
+            except NoJsonError as e:
+                raise DecisionError("no JSON object in the answer", e.text)
+            decision = validate_decision(obj, json.dumps(obj))
+        else:
+            decision = parse_decision(client.generate(prompt, model, **options).get("response", ""))
+        LLM_DECISIONS.inc(outcome="valid")
+        return decision, timings
+    except DecisionError as e:
+        logging.warning(f"Unusable decision from {model} ({e}), asking for a corrected one")
+        rejected = e
+
+    repair_prompt = (
+        f"{prompt}\n--- Rejected answer ---\n{rejected.answer[:MAX_REJECTED_CHARS]}\n\n"
+        f"That answer was rejected: {rejected}. Reply with only the corrected JSON object.\n"
+    )
+    try:
+        decision = parse_decision(client.generate(repair_prompt, model, **options).get("response", ""))
+    except DecisionError:
+        LLM_DECISIONS.inc(outcome="invalid")
+        raise
+    LLM_DECISIONS.inc(outcome="repaired")
+    return decision, timings
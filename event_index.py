@@ -0,0 +1,56 @@
+import logging
+from collections import defaultdict
+
+from k8s_backend import KubeError, get_backend, render_description
+from metrics import POD_COLLECT_SECONDS
+
+# Configuration
+EVENT_SELECTOR = "involvedObject.kind=Pod"   # only pod events are ever looked up
+KUBECTL_TIMEOUT = 30
+
+
+class EventIndex:
+    """Pod events from one cluster-wide list, indexed by involvedObject.uid.
+
+    A scan loads this once and describes every unhealthy pod from the pod
+    object it already holds plus its events, instead of one `kubectl
+    describe` per pod.
+    """
+
+    def __init__(self, events=()):
+        self.by_uid = defaultdict(list)
+        self.by_name = defaultdict(list)
+        for event in events:
+            involved = event.get("involvedObject") or {}
+            if involved.get("uid"):
+                self.by_uid[involved["uid"]].append(event)
+            self.by_name[(involved.get("namespace"), involved.get("name"))].append(event)
+        self.count = len(events)
+
+    @classmethod
+    def load(cls, backend=None, namespace=None, timeout=KUBECTL_TIMEOUT):
+        backend = backend or get_backend()
+        with POD_COLLECT_SECONDS.time(kind="events"):
+            events = backend.list_events(namespace, EVENT_SELECTOR, timeout)
+        return cls(events)
+
+    def for_pod(self, pod):
+        metadata = pod.get("metadata", {})
+        if metadata.get("uid") in self.by_uid:
+            return self.by_uid[metadata["uid"]]
+        # Events recorded before the pod had a uid, or snapshots without one
+        return self.by_name.get((metadata.get("namespace"), metadata.get("name")), [])
+
+    def describe(self, pod):
+        return render_description(pod, self.for_pod(pod))
+
+
+def load_event_index(backend=None, namespace=None):
+    """EventIndex.load, or None (after logging why) if events cannot be listed"""
+    try:
+        index = EventIndex.load(backend, namespace)
+    except KubeError as e:
+        logging.warning(f"Could not list events, describing pods one by one: {e}")
+        return None
+    logging.info(f"Indexed {index.count} pod events")
+    return index
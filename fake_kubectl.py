@@ -0,0 +1,621 @@
+"""Minimal stand-in for kubectl backed by a synthetic cluster.
+
+The cluster is described by a small JSON spec rather than stored pod by pod:
+pod i's failure kind is derived from the seed and the failure mix, so every
+invocation sees the same cluster without loading a multi-megabyte file:
+
+    python fake_kubectl.py --make-spec cluster.json --pods 10000 --mix crashloop=0.05,oom=0.01
+    FAKE_KUBECTL_SPEC=cluster.json python fake_kubectl.py get pods -A -o json
+
+bench_suite.py installs a `kubectl` shim for this script on the PATH. Only the
+subcommands the monitors and KubectlBackend use are understood.
+
+The same cluster can be served over HTTP for ApiBackend, with a kubeconfig
+pointing at it:
+
+    FAKE_KUBECTL_SPEC=cluster.json python fake_kubectl.py --serve 8001 --kubeconfig fake.kubeconfig
+    KUBECONFIG=fake.kubeconfig K8S_BACKEND=api python main.py
+"""
+import io
+import json
+import os
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Configuration
+SPEC_PATH = os.environ.get("FAKE_KUBECTL_SPEC", "fake_cluster.json")
+LATENCY = float(os.environ.get("FAKE_KUBECTL_LATENCY", "0"))  # seconds added to logs/describe
+
+# Failure kinds a synthetic pod can have; the rest of the mix is healthy
+FAILURE_KINDS = ("crashloop", "imagepull", "oom", "config", "pending", "completed")
+DEFAULT_MIX = {"crashloop": 0.03, "imagepull": 0.01, "oom": 0.01, "pending": 0.005, "completed": 0.02}
+
+LOG_LINES = {
+    "crashloop": [
+        "Starting server on :8080",
+        "Loading configuration from /etc/app/config.yaml",
+        "Connecting to postgres at db.internal:5432",
+        "ERROR failed to connect to database: connection refused",
+        "panic: unable to initialise storage",
+    ],
+    "oom": [
+        "Starting worker pool with 64 threads",
+        "Warming cache (2.1GiB)",
+    ],
+    "healthy": ["Starting server on :8080", "Ready"],
+}
+NOISE_LINES = 400   # request log lines a crashed instance wrote before failing
+
+
+def parse_mix(text):
+    """Parse "crashloop=0.05,oom=0.01" into a dict"""
+    mix = {}
+    for part in filter(None, text.split(",")):
+        kind, _, fraction = part.partition("=")
+        if kind not in FAILURE_KINDS:
+            raise ValueError(f"Unknown failure kind {kind!r}, expected one of {FAILURE_KINDS}")
+        mix[kind] = float(fraction)
+    if sum(mix.values()) > 1:
+        raise ValueError("Failure fractions add up to more than 1")
+    return mix
+
+
+def make_spec(pods, mix=None, seed=1):
+    return {"pods": pods, "mix": dict(DEFAULT_MIX if mix is None else mix), "seed": seed}
+
+
+def pod_kind(spec, i):
+    roll = random.Random(spec["seed"] * 1000003 + i).random()
+    for kind in FAILURE_KINDS:
+        roll -= spec["mix"].get(kind, 0)
+        if roll < 0:
+            return kind
+    return "healthy"
+
+
+def pod_name(i):
+    deploy = f"app-{i // 10}"
+    return f"{deploy}-{i // 10:08x}-{i:05x}"
+
+
+def pod_index(name):
+    try:
+        return int(name.rsplit("-", 1)[1], 16)
+    except (IndexError, ValueError):
+        return None
+
+
+def synthetic_pod(spec, i):
+    """A realistically sized pod object of the kind pod_kind picks for i"""
+    kind = pod_kind(spec, i)
+    deploy = f"app-{i // 10}"
+    pod_hash = f"{i // 10:08x}"
+    name = pod_name(i)
+    image = f"registry.example.com/{deploy}:1.0.{i % 7}"
+
+    phase = "Running"
+    ready = kind == "healthy"
+    conditions = [{"type": t, "status": "True" if ready or t in ("Initialized", "PodScheduled") else "False",
+                   "lastTransitionTime": "2025-05-21T07:39:10Z"}
+                  for t in ("Initialized", "Ready", "ContainersReady", "PodScheduled")]
+    state = {"running": {"startedAt": "2025-05-21T07:40:00Z"}}
+    last_state = {}
+    restarts = 0
+    if kind == "crashloop":
+        state = {"waiting": {"reason": "CrashLoopBackOff", "message": f"back-off 5m0s restarting failed container=app pod={name}"}}
+        last_state = {"terminated": {"reason": "Error", "exitCode": 1}}
+        restarts = 12
+    elif kind == "oom":
+        state = {"waiting": {"reason": "CrashLoopBackOff", "message": f"back-off 5m0s restarting failed container=app pod={name}"}}
+        last_state = {"terminated": {"reason": "OOMKilled", "exitCode": 137}}
+        restarts = 5
+    elif kind == "imagepull":
+        image = f"registry.example.com/{deploy}:does-not-exist"
+        state = {"waiting": {"reason": "ImagePullBackOff", "message": f'Back-off pulling image "{image}"'}}
+    elif kind == "config":
+        state = {"waiting": {"reason": "CreateContainerConfigError", "message": 'secret "app-secrets" not found'}}
+    elif kind == "completed":
+        phase = "Succeeded"
+        state = {"terminated": {"reason": "Completed", "exitCode": 0}}
+        conditions = [dict(c, status="False") if c["type"] in ("Ready", "ContainersReady") else c for c in conditions]
+
+    status = {
+        "phase": phase,
+        "conditions": conditions,
+        "hostIP": f"10.0.{i % 30}.1",
+        "podIP": f"10.244.{(i // 250) % 250}.{i % 250}",
+        "startTime": "2025-05-21T07:39:00Z",
+        "containerStatuses": [{
+            "name": "app",
+            "ready": ready,
+            "started": ready,
+            "restartCount": restarts,
+            "image": image,
+            "imageID": f"registry.example.com/{deploy}@sha256:{i:064x}",
+            "containerID": f"containerd://{i:064x}",
+            "state": state,
+            "lastState": last_state,
+        }],
+    }
+    if kind == "pending":
+        status = {
+            "phase": "Pending",
+            "conditions": [{"type": "PodScheduled", "status": "False", "reason": "Unschedulable",
+                            "message": "0/30 nodes are available: 30 Insufficient memory."}],
+        }
+
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {
+            "name": name,
+            "namespace": f"team-{(i // 10) % 50}",
+            "uid": f"00000000-0000-0000-0000-{i:012d}",
+            "resourceVersion": str(100000 + i),
+            "creationTimestamp": "2025-05-21T07:39:00Z",
+            "labels": {"app": deploy, "pod-template-hash": pod_hash},
+            "ownerReferences": [{"apiVersion": "apps/v1", "kind": "ReplicaSet", "name": f"{deploy}-{pod_hash}",
+                                 "uid": f"11111111-0000-0000-0000-{i // 10:012d}", "controller": True,
+                                 "blockOwnerDeletion": True}],
+            "managedFields": [{"manager": "kube-controller-manager", "operation": "Update", "apiVersion": "v1",
+                               "time": "2025-05-21T07:39:00Z", "fieldsType": "FieldsV1",
+                               "fieldsV1": {"f:metadata": {"f:labels": {".": {}, "f:app": {}}}}}],
+        },
+        "spec": {
+            "containers": [{
+                "name": "app",
+                "image": image,
+                "command": ["sh", "-c", "exec /app/server --port=8080"],
+                "env": [{"name": f"VAR_{k}", "value": f"value-{k}"} for k in range(8)],
+                "resources": {"limits": {"cpu": "500m", "memory": "256Mi"}, "requests": {"cpu": "100m", "memory": "128Mi"}},
+            }],
+            "nodeName": f"node-{i % 30}",
+            "serviceAccountName": "default",
+        },
+        "status": status,
+    }
+
+
+# (type, reason, message, count) per failure kind, as kubelet and the scheduler report them
+EVENTS = {
+    "crashloop": [("Normal", "Pulled", 'Container image "{image}" already present on machine', 12),
+                  ("Warning", "BackOff", "Back-off restarting failed container app in pod {name}", 240)],
+    "oom": [("Normal", "Pulled", 'Container image "{image}" already present on machine', 5),
+            ("Warning", "BackOff", "Back-off restarting failed container app in pod {name}", 60)],
+    "imagepull": [("Warning", "Failed", 'Failed to pull image "{image}": manifest unknown', 8),
+                  ("Warning", "BackOff", 'Back-off pulling image "{image}"', 120)],
+    "config": [("Warning", "Failed", 'Error: secret "app-secrets" not found', 30)],
+    "pending": [("Warning", "FailedScheduling", "0/30 nodes are available: 30 Insufficient memory.", 20)],
+}
+
+
+def pod_events(spec, i):
+    """The events a failing pod has accumulated; healthy pods have none left"""
+    pod = synthetic_pod(spec, i)
+    metadata = pod["metadata"]
+    image = pod["spec"]["containers"][0]["image"]
+    events = []
+    for n, (event_type, reason, message, count) in enumerate(EVENTS.get(pod_kind(spec, i), ())):
+        events.append({
+            "metadata": {"name": f"{metadata['name']}.{i:08x}{n:04x}", "namespace": metadata["namespace"]},
+            "involvedObject": {"kind": "Pod", "namespace": metadata["namespace"], "name": metadata["name"],
+                               "uid": metadata["uid"], "apiVersion": "v1"},
+            "type": event_type,
+            "reason": reason,
+            "message": message.format(image=image, name=metadata["name"]),
+            "count": count,
+            "firstTimestamp": "2025-05-21T07:39:10Z",
+            "lastTimestamp": f"2025-05-21T07:4{n}:00Z",
+            "source": {"component": "default-scheduler" if reason == "FailedScheduling" else "kubelet"},
+        })
+    return events
+
+
+def _field(obj, path):
+    for key in path.split("."):
+        obj = obj.get(key) if isinstance(obj, dict) else None
+    return "" if obj is None else str(obj)
+
+
+def _matches(pod, field_selector):
+    """Understands the phase selectors the monitors send"""
+    for clause in filter(None, (field_selector or "").split(",")):
+        if clause.startswith("status.phase!="):
+            if pod["status"].get("phase") == clause.split("=", 1)[1]:
+                return False
+        elif clause.startswith("status.phase="):
+            if pod["status"].get("phase") != clause.split("=", 1)[1]:
+                return False
+    return True
+
+
+def iter_pods(spec, field_selector=None, start=0, namespace=None):
+    for i in range(start, spec["pods"]):
+        if namespace and f"team-{(i // 10) % 50}" != namespace:
+            continue
+        pod = synthetic_pod(spec, i)
+        if _matches(pod, field_selector):
+            yield i, pod
+
+
+def find_pod(spec, namespace, name):
+    i = pod_index(name)
+    if i is None or i >= spec["pods"] or pod_name(i) != name or f"team-{(i // 10) % 50}" != namespace:
+        return None
+    return synthetic_pod(spec, i)
+
+
+def project(pod, fields):
+    """Render a pod the way kubectl renders a tab-separated jsonpath template"""
+    values = []
+    for field in fields:
+        value = pod
+        for key in field.strip(".").split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            values.append("")
+        elif isinstance(value, (dict, list)):
+            values.append(json.dumps(value, separators=(",", ":")))
+        else:
+            values.append(str(value))
+    return "\t".join(values) + "\n"
+
+
+def pod_logs(pod, previous=False, tail=None, timestamps=False, since=None):
+    """The crashed instance's log with --previous; a restarting container's current log only has startup lines"""
+    kind = "healthy"
+    cs = (pod["status"].get("containerStatuses") or [{}])[0]
+    if cs.get("lastState", {}).get("terminated", {}).get("reason") == "OOMKilled":
+        kind = "oom"
+    elif cs.get("lastState", {}).get("terminated"):
+        kind = "crashloop"
+    if previous and kind == "healthy":
+        _fail(f'previous terminated container "app" in pod "{pod["metadata"]["name"]}" not found', 400)
+    lines = LOG_LINES[kind]
+    if kind != "healthy":
+        if previous:
+            noise = [f"INFO GET /api/items/{n} 200 {n % 17}ms" for n in range(NOISE_LINES)]
+            lines = lines[:2] + noise + lines[2:]
+        else:
+            lines = lines[:1]
+    stamped = []
+    for n, line in enumerate(lines):
+        stamp = f"2025-05-21T07:{40 + n // 3600 % 20:02d}:{n // 60 % 60:02d}"
+        if since and stamp + "Z" < since[:19] + "Z":
+            continue
+        text = f"{stamp}.{n % 60:02d}Z {line}"
+        stamped.append(f"{stamp}.{n % 60:02d}0000000Z {text}" if timestamps else text)
+    if tail is not None and tail >= 0:
+        stamped = stamped[-tail:] if tail else []
+    return "".join(line + "\n" for line in stamped)
+
+
+def describe(pod):
+    metadata, status = pod["metadata"], pod["status"]
+    lines = [
+        f"Name:         {metadata['name']}",
+        f"Namespace:    {metadata['namespace']}",
+        f"Status:       {status.get('phase')}",
+        f"Controlled By:  ReplicaSet/{metadata['ownerReferences'][0]['name']}",
+        "Containers:",
+    ]
+    for cs in status.get("containerStatuses", []):
+        lines.append(f"  {cs['name']}:")
+        lines.append(f"    Image:          {cs['image']}")
+        for label, state in (("State", cs["state"]), ("Last State", cs["lastState"])):
+            for name, detail in state.items():
+                lines.append(f"    {label}:  {name.capitalize()}")
+                for key in ("reason", "exitCode", "message"):
+                    if key in detail:
+                        lines.append(f"      {key}:  {detail[key]}")
+        lines.append(f"    Restart Count:  {cs['restartCount']}")
+    lines.append("Events:       <none>")
+    return "\n".join(lines) + "\n"
+
+
+class FakeKubectlError(Exception):
+    """An error the API server would answer with; kubectl prints it and exits 1"""
+
+    def __init__(self, message, code=404):
+        super().__init__(message)
+        self.code = code
+
+
+def _fail(message, code=404):
+    raise FakeKubectlError(message, code)
+
+
+def _option(args, *flags):
+    """Remove the first of flags (as `--flag value` or `--flag=value`) and return its value"""
+    for n, arg in enumerate(args):
+        for flag in flags:
+            if arg == flag and n + 1 < len(args):
+                value = args[n + 1]
+                del args[n:n + 2]
+                return value
+            if arg.startswith(flag + "="):
+                del args[n]
+                return arg.split("=", 1)[1]
+    return None
+
+
+def raw_get(spec, path, out=None):
+    out = out or sys.stdout
+    url = urlparse(path)
+    query = {key: values[0] for key, values in parse_qs(url.query).items()}
+    parts = [unquote(part) for part in url.path.strip("/").split("/")]
+
+    namespaced = len(parts) == 5 and parts[:3] == ["api", "v1", "namespaces"] and parts[4] == "pods"
+    if parts == ["api", "v1", "pods"] or namespaced:
+        if query.get("watch"):
+            return  # an empty watch that closes immediately
+        limit = int(query.get("limit", 0)) or spec["pods"]
+        start = int(query.get("continue") or 0)
+        items = []
+        next_start = None
+        for i, pod in iter_pods(spec, query.get("fieldSelector"), start, parts[3] if namespaced else None):
+            if len(items) == limit:
+                next_start = i
+                break
+            items.append(pod)
+        metadata = {"resourceVersion": str(100000 + spec["pods"])}
+        if next_start is not None:
+            metadata["continue"] = str(next_start)
+        json.dump({"apiVersion": "v1", "kind": "PodList", "metadata": metadata, "items": items}, out)
+    elif parts == ["api", "v1", "namespaces"]:
+        names = sorted({f"team-{(i // 10) % 50}" for i in range(0, spec["pods"], 10)})
+        items = [{"metadata": {"name": name}} for name in names + ["default", "kube-system"]]
+        json.dump({"apiVersion": "v1", "kind": "NamespaceList", "metadata": {}, "items": items}, out)
+    elif parts == ["apis", "apps", "v1", "replicasets"]:
+        # One ReplicaSet per group of ten pods, owned by its Deployment
+        items = []
+        for group in range(0, spec["pods"], 10):
+            deploy = f"app-{group // 10}"
+            items.append({
+                "metadata": {
+                    "name": f"{deploy}-{group // 10:08x}",
+                    "namespace": f"team-{(group // 10) % 50}",
+                    "ownerReferences": [{"apiVersion": "apps/v1", "kind": "Deployment", "name": deploy, "controller": True}],
+                },
+            })
+        json.dump({"apiVersion": "apps/v1", "kind": "ReplicaSetList", "metadata": {}, "items": items}, out)
+    elif len(parts) == 6 and parts[:3] == ["api", "v1", "namespaces"] and parts[4] == "pods":
+        pod = find_pod(spec, parts[3], parts[5])
+        if pod is None:
+            _fail(f'pods "{parts[5]}" not found')
+        json.dump(pod, out)
+    elif parts[-1] == "events":
+        namespace = parts[3] if len(parts) == 5 else None
+        clauses = [clause.split("=", 1) for clause in filter(None, (query.get("fieldSelector") or "").split(","))]
+        limit = int(query.get("limit", 0)) or None
+        start = int(query.get("continue") or 0)
+        items = []
+        next_start = None
+        for i in range(start, spec["pods"]):
+            if namespace and f"team-{(i // 10) % 50}" != namespace:
+                continue
+            if limit and len(items) >= limit:
+                next_start = i
+                break
+            items += [e for e in pod_events(spec, i) if all(_field(e, key) == value for key, value in clauses)]
+        metadata = {"continue": str(next_start)} if next_start is not None else {}
+        json.dump({"apiVersion": "v1", "kind": "EventList", "metadata": metadata, "items": items}, out)
+    else:
+        _fail(f"the server could not find the requested resource ({path})")
+
+
+def get_pods(spec, args):
+    namespace = _option(args, "-n", "--namespace")
+    field_selector = _option(args, "--field-selector")
+    output = _option(args, "-o", "--output") or ""
+    if output == "json":
+        sys.stdout.write('{"apiVersion":"v1","kind":"List","metadata":{"resourceVersion":""},"items":[')
+        for n, (_, pod) in enumerate(iter_pods(spec, field_selector, namespace=namespace)):
+            sys.stdout.write(("," if n else "") + json.dumps(pod))
+        sys.stdout.write("]}\n")
+    elif output.startswith("jsonpath="):
+        from pod_snapshot import PROJECTION_FIELDS
+        for _, pod in iter_pods(spec, field_selector, namespace=namespace):
+            sys.stdout.write(project(pod, PROJECTION_FIELDS))
+    else:
+        _fail(f"fake kubectl does not support output {output!r}")
+
+
+def run(argv):
+    args = list(argv)
+    _option(args, "--context")
+    _option(args, "--request-timeout")
+    if not args:
+        _fail("no command given")
+
+    with open(SPEC_PATH, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    command = args.pop(0)
+
+    if command == "get" and args[:1] == ["--raw"]:
+        raw_get(spec, args[1])
+    elif command == "get" and args[:1] == ["pods"]:
+        args.pop(0)
+        for flag in ("-A", "--all-namespaces"):
+            if flag in args:
+                args.remove(flag)
+        get_pods(spec, args)
+    elif command in ("logs", "describe"):
+        if command == "describe":
+            args.remove("pod")
+        namespace = _option(args, "-n", "--namespace") or "default"
+        _option(args, "-c", "--container")
+        tail = _option(args, "--tail")
+        since = _option(args, "--since-time")
+        previous = "--previous" in args or "-p" in args
+        timestamps = "--timestamps" in args
+        name = next(arg for arg in args if not arg.startswith("-"))
+        pod = find_pod(spec, namespace, name)
+        if pod is None:
+            _fail(f'pods "{name}" not found')
+        time.sleep(LATENCY)
+        if command == "logs":
+            sys.stdout.write(pod_logs(pod, previous, int(tail) if tail else None, timestamps, since))
+        else:
+            sys.stdout.write(describe(pod))
+    elif command in ("rollout", "delete", "create", "replace"):
+        if "-f" in args:
+            sys.stdin.read()
+        print(" ".join([command] + args) + " (fake)")
+    else:
+        _fail(f"fake kubectl does not support {command!r}")
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """The API server paths ApiBackend uses, answered from the synthetic cluster"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeKubeApi/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, text, content_type="application/json"):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, error):
+        self._send(error.code, json.dumps({
+            "kind": "Status", "apiVersion": "v1", "status": "Failure", "message": str(error), "code": error.code,
+        }))
+
+    def _parts(self):
+        return [unquote(part) for part in urlparse(self.path).path.strip("/").split("/")]
+
+    def _pod(self, parts):
+        pod = find_pod(self.server.spec, parts[3], parts[5])
+        if pod is None:
+            _fail(f'pods "{parts[5]}" not found')
+        return pod
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path, None))
+        parts = self._parts()
+        try:
+            if len(parts) == 7 and parts[:3] == ["api", "v1", "namespaces"] and parts[4] == "pods" and parts[6] == "log":
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                pod = self._pod(parts)
+                time.sleep(self.server.latency)
+                tail = query.get("tailLines")
+                text = pod_logs(pod, query.get("previous") == "true", int(tail) if tail else None,
+                                query.get("timestamps") == "true", query.get("sinceTime"))
+                self._send(200, text, "text/plain")
+                return
+            out = io.StringIO()
+            raw_get(self.server.spec, self.path, out)
+            self._send(200, out.getvalue())
+        except FakeKubectlError as e:
+            self._send_error(e)
+
+    def _write(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"null")
+        self.server.requests.append((method, self.path, body))
+        parts = self._parts()
+        try:
+            if method == "DELETE" and len(parts) == 6 and parts[:3] == ["api", "v1", "namespaces"] and parts[4] == "pods":
+                self._send(200, json.dumps(self._pod(parts)))
+            elif method == "PATCH" and len(parts) == 7 and parts[:4] == ["apis", "apps", "v1", "namespaces"]:
+                kind = {"deployments": "Deployment", "statefulsets": "StatefulSet", "daemonsets": "DaemonSet"}.get(parts[5])
+                if kind is None or not parts[6].startswith("app-"):
+                    _fail(f'{parts[5]} "{parts[6]}" not found')
+                self._send(200, json.dumps({"apiVersion": "apps/v1", "kind": kind,
+                                            "metadata": {"name": parts[6], "namespace": parts[3]}}))
+            else:
+                _fail(f"the server could not find the requested resource ({self.path})")
+        except FakeKubectlError as e:
+            self._send_error(e)
+
+    def do_PATCH(self):
+        self._write("PATCH")
+
+    def do_DELETE(self):
+        self._write("DELETE")
+
+    def do_POST(self):
+        self._write("POST")
+
+    def do_PUT(self):
+        self._write("PUT")
+
+
+def make_api_server(spec, host="127.0.0.1", port=0, latency=LATENCY):
+    """Create (but do not start) a fake API server for spec; requests are recorded in .requests"""
+    server = ThreadingHTTPServer((host, port), FakeApiHandler)
+    server.daemon_threads = True
+    server.spec = spec
+    server.latency = latency
+    server.requests = []
+    return server
+
+
+def write_kubeconfig(path, server_url):
+    """A kubeconfig whose current context points at server_url"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "apiVersion": "v1",
+            "kind": "Config",
+            "clusters": [{"name": "fake", "cluster": {"server": server_url}}],
+            "users": [{"name": "fake", "user": {"token": "fake-token"}}],
+            "contexts": [{"name": "fake", "context": {"cluster": "fake", "user": "fake"}}],
+            "current-context": "fake",
+        }, f)
+
+
+def serve(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the synthetic cluster as a Kubernetes API server")
+    parser.add_argument("--serve", type=int, required=True, metavar="PORT")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--kubeconfig", help="write a kubeconfig pointing at the server here")
+    args = parser.parse_args(argv)
+    with open(SPEC_PATH, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    server = make_api_server(spec, args.host, args.serve)
+    url = f"http://{args.host}:{server.server_port}"
+    if args.kubeconfig:
+        write_kubeconfig(args.kubeconfig, url)
+    print(f"Fake Kubernetes API for {spec['pods']} pods listening on {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    if sys.argv[1:2] == ["--serve"]:
+        serve(sys.argv[1:])
+        return
+    if sys.argv[1:2] == ["--make-spec"]:
+        import argparse
+        parser = argparse.ArgumentParser(description="Write a synthetic cluster spec for fake kubectl")
+        parser.add_argument("--make-spec", required=True, metavar="PATH")
+        parser.add_argument("--pods", type=int, default=1000)
+        parser.add_argument("--mix", type=parse_mix, default=None, help="e.g. crashloop=0.05,oom=0.01")
+        parser.add_argument("--seed", type=int, default=1)
+        args = parser.parse_args()
+        with open(args.make_spec, "w", encoding="utf-8") as f:
+            json.dump(make_spec(args.pods, args.mix, args.seed), f)
+        return
+    try:
+        run(sys.argv[1:])
+    except FakeKubectlError as e:
+        reason = {400: "BadRequest", 404: "NotFound"}.get(e.code, "InternalError")
+        sys.stderr.write(f"Error from server ({reason}): {e}\n")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
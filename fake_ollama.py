@@ -0,0 +1,129 @@
+"""Minimal stand-in for the Ollama HTTP API.
+
+Serves /api/tags and /api/generate (streaming and non-streaming) with a
+canned answer and configurable latency, so the monitors and OllamaClient can
+be exercised without a GPU or a pulled model:
+
+    python fake_ollama.py --port 11434 --latency 0.5 --token-delay 0.02
+"""
+import argparse
+import json
+import logging
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned diagnosis followed by prose, like gemma:2b tends to produce
+DEFAULT_ANSWER = (
+    '{"cause": "Container exits with a non-zero code", "action": "restart", '
+    '"pod": "unknown", "namespace": "default", "details": "Fake Ollama answer"}'
+    "\n\nThe pod keeps crashing because its command fails. Restarting it may help."
+)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOllama/1.0"
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": name} for name in self.server.models]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        self.server.requests_served += 1
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        request = self._read_json()
+        if request.get("model") not in self.server.models:
+            self._send_json(404, {"error": f"model '{request.get('model')}' not found"})
+            return
+
+        time.sleep(self.server.latency)
+        answer = self.server.answer
+        if request.get("format") and "{" in answer:
+            # Structured output is the JSON object alone, without the prose after it
+            obj, _ = json.JSONDecoder().raw_decode(answer[answer.index("{"):])
+            answer = json.dumps(obj)
+        tokens = answer.split(" ")
+        tokens = [t + " " for t in tokens[:-1]] + tokens[-1:]
+        stats = {
+            "prompt_eval_count": len(request.get("prompt", "")) // 4,
+            "prompt_eval_duration": int(self.server.latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) * self.server.token_delay * 1e9),
+        }
+
+        if not request.get("stream", True):
+            time.sleep(len(tokens) * self.server.token_delay)
+            self._send_json(200, dict({"model": request["model"], "response": answer, "done": True}, **stats))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                self._write_chunk({"model": request["model"], "response": token, "done": False})
+                time.sleep(self.server.token_delay)
+            self._write_chunk(dict({"model": request["model"], "response": "", "done": True}, **stats))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early, as a real client would once it has its answer
+            self.close_connection = True
+
+    def _write_chunk(self, body):
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+def make_server(host="127.0.0.1", port=11434, latency=0.0, token_delay=0.0, models=("gemma:2b",), answer=DEFAULT_ANSWER):
+    """Create (but do not start) a fake Ollama server"""
+    server = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_delay = token_delay
+    server.models = list(models)
+    server.answer = answer
+    server.requests_served = 0
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between tokens")
+    parser.add_argument("--model", action="append", default=None, help="model name to advertise (repeatable)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.token_delay, args.model or ["gemma:2b"])
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Nearest-neighbour memory of past diagnoses.
+
+The exact-match AnalysisCache misses failures that are the same problem in
+a different workload or namespace. This index embeds the normalized status
+and log excerpt of every diagnosed incident and, before asking the model,
+looks for a past incident whose embedding is close enough to reuse its
+diagnosis.
+
+Vectors are stored as raw float32 rows in <path>.f32, memory-mapped and
+searched with one matrix product when NumPy is installed (about 100k
+incidents in a few milliseconds). Without NumPy the rows are scanned in
+pure Python at roughly 12 microseconds each, which would put over a second
+in front of every LLM call at 100k incidents; the index is then capped at
+MAX_INCIDENTS_WITHOUT_NUMPY (tens of milliseconds per lookup) and keeps
+only the newest incidents. Diagnoses live next to the vectors in
+<path>.jsonl, one line per row, after a header naming the embedder.
+
+Embeddings come from a local hashing vectorizer by default, or from
+Ollama's embeddings endpoint with INCIDENT_EMBEDDER=ollama:<model>. A
+failed embedding counts as a miss, and a remote embedder is not called at
+all while paused() (typically the Ollama circuit being open) says so.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+
+import requests
+
+from analysis_cache import normalize_log
+from ollama_client import OllamaError, get_client
+
+try:
+    import numpy as np
+except ImportError:  # searches fall back to a pure-Python scan
+    np = None
+
+# Configuration
+INDEX_PATH = "incident_index"           # <path>.f32 and <path>.jsonl
+EMBEDDER = os.environ.get("INCIDENT_EMBEDDER", "hashing")   # "hashing" or "ollama:<model>"
+DIMENSIONS = 256                        # hashing vectorizer width
+SIMILARITY_THRESHOLD = 0.9              # cosine similarity needed to reuse a diagnosis
+MAX_INCIDENTS = 100_000                 # oldest half is dropped when exceeded
+MAX_INCIDENTS_WITHOUT_NUMPY = 2_000     # cap for the pure-Python scan
+MAX_AGE = 30 * 24 * 60 * 60             # seconds a past diagnosis stays reusable
+EXCERPT_LINES = 50                      # log tail lines that are embedded
+
+_TOKEN = re.compile(r"<\w+>|[a-z][a-z0-9_.:/-]*")
+
+
+def incident_text(status, logs, max_lines=EXCERPT_LINES):
+    """What is embedded for an incident: its status and normalized log tail"""
+    return f"{status}\n{normalize_log(logs, max_lines)}"
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and word pairs, L2-normalized"""
+
+    remote = False
+
+    def __init__(self, dimensions=DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, text):
+        words = _TOKEN.findall(text.lower())
+        features = Counter(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        vector = [0.0] * self.dimensions
+        for feature, count in features.items():
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if h & 1 else -1.0
+            vector[(h >> 1) % self.dimensions] += sign * (1.0 + math.log(count))
+        return _normalized(vector)
+
+
+class OllamaEmbedder:
+    """Embeddings from Ollama's /api/embeddings"""
+
+    remote = True
+
+    def __init__(self, model, client=None):
+        self.model = model
+        self.client = client or get_client()
+        self.name = f"ollama-{model}"
+
+    def embed(self, text):
+        return _normalized(self.client.embeddings(text, self.model))
+
+
+def make_embedder(spec=EMBEDDER):
+    kind, _, model = spec.partition(":")
+    if kind == "ollama":
+        return OllamaEmbedder(model or "nomic-embed-text")
+    if kind == "hashing":
+        return HashingEmbedder(int(model) if model else DIMENSIONS)
+    raise ValueError(f"Unknown embedder {spec!r} (expected hashing or ollama:<model>)")
+
+
+def _normalized(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+class IncidentIndex:
+    """Append-only store of (embedding, diagnosis) with cosine top-k search"""
+
+    def __init__(self, path=INDEX_PATH, embedder=None, threshold=SIMILARITY_THRESHOLD,
+                 max_incidents=MAX_INCIDENTS, max_age=MAX_AGE, paused=None):
+        self.vectors_path = f"{path}.f32"
+        self.meta_path = f"{path}.jsonl"
+        self.embedder = embedder or make_embedder()
+        self.threshold = threshold
+        self.max_incidents = max_incidents if np is not None else min(max_incidents, MAX_INCIDENTS_WITHOUT_NUMPY)
+        self.max_age = max_age
+        self.paused = paused
+        self.dimensions = None
+        self.entries = []
+        self.hits = 0
+        self.misses = 0
+        self._rows = array("f")     # only used without NumPy
+        self._matrix = None         # memory map of the rows written so far
+        self._last = (None, None)   # (text, vector) of the last lookup, reused by add()
+        self._lock = threading.Lock()
+        self.load()
+
+    def _header(self):
+        return {"embedder": self.embedder.name, "dimensions": self.dimensions}
+
+    def load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                entries = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable incident index {self.meta_path}: {e}")
+            return
+        if header.get("embedder") != self.embedder.name:
+            logging.info(f"Incident index was built with {header.get('embedder')}, starting a new one")
+            return
+
+        self.dimensions = header["dimensions"]
+        row_bytes = 4 * self.dimensions
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        rows = size // row_bytes
+        self.entries = entries[:rows]
+        if len(entries) != len(self.entries) or size != len(self.entries) * row_bytes:
+            # A crash between the two appends left one file ahead; cut both back
+            # to the rows they share, or every later add would be paired with
+            # the wrong vector
+            vectors = array("f")
+            if self.entries:
+                with open(self.vectors_path, "rb") as f:
+                    vectors.fromfile(f, len(self.entries) * self.dimensions)
+            self._rewrite(self.entries, vectors)
+            logging.warning(f"Repaired incident index {self.meta_path}: kept {len(self.entries)} complete incidents")
+        if len(self.entries) > self.max_incidents:
+            # Built with NumPy, or with a larger cap
+            self._compact()
+        elif np is None and not self._rows:
+            with open(self.vectors_path, "rb") as f:
+                self._rows.fromfile(f, len(self.entries) * self.dimensions)
+        logging.info(f"Loaded {len(self.entries)} past incidents from {self.meta_path}")
+
+    def _embed(self, text):
+        """The embedding of text, or None if the embedder is paused or failed"""
+        last_text, last_vector = self._last
+        if last_text == text:
+            return last_vector
+        if self.embedder.remote and self.paused is not None and self.paused():
+            return None
+        try:
+            vector = self.embedder.embed(text)
+        except (OllamaError, requests.exceptions.RequestException, ValueError) as e:
+            logging.warning(f"Could not embed incident with {self.embedder.name}: {e}")
+            return None
+        self._last = (text, vector)
+        return vector
+
+    def _similarities(self, vector):
+        n = len(self.entries)
+        if np is not None:
+            if self._matrix is None or len(self._matrix) != n:
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dimensions))
+            return self._matrix @ np.asarray(vector, dtype=np.float32)
+        d = self.dimensions
+        rows = self._rows
+        return [sum(a * b for a, b in zip(rows[i * d:(i + 1) * d], vector)) for i in range(n)]
+
+    def search(self, text, k=5):
+        """Return up to k (similarity, entry) pairs, most similar first"""
+        vector = self._embed(text)
+        with self._lock:
+            if vector is None or not self.entries or len(vector) != self.dimensions:
+                return []
+            similarities = self._similarities(vector)
+            k = min(k, len(self.entries))
+            if np is not None:
+                top = np.argpartition(-similarities, k - 1)[:k]
+                ranked = sorted(((float(similarities[i]), int(i)) for i in top), reverse=True)
+            else:
+                ranked = sorted(((s, i) for i, s in enumerate(similarities)), reverse=True)[:k]
+            return [(similarity, self.entries[i]) for similarity, i in ranked]
+
+    def lookup(self, text):
+        """The closest recent past incident above the threshold, with its similarity, or None"""
+        cutoff = time.time() - self.max_age
+        for similarity, entry in self.search(text):
+            if similarity < self.threshold:
+                break
+            if entry["created"] >= cutoff:
+                self.hits += 1
+                return dict(entry, similarity=similarity)
+        self.misses += 1
+        return None
+
+    def add(self, text, analysis, key=None):
+        """Remember a new diagnosis for text"""
+        vector = self._embed(text)
+        if vector is None:
+            return
+        entry = {"analysis": analysis, "key": key, "created": time.time()}
+        with self._lock:
+            if self.dimensions is None or (not self.entries and len(vector) != self.dimensions):
+                self.dimensions = len(vector)
+                self._rewrite([], [])
+            if len(vector) != self.dimensions:
+                logging.warning(f"Embedding has {len(vector)} dimensions, index expects {self.dimensions}")
+                return
+            row = array("f", vector)
+            with open(self.vectors_path, "ab") as f:
+                row.tofile(f)
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self.entries.append(entry)
+            if np is None:
+                self._rows.extend(row)
+            if len(self.entries) > self.max_incidents:
+                self._compact()
+
+    def _compact(self):
+        """Keep the newest max_incidents // 2 incidents"""
+        keep = min(len(self.entries), self.max_incidents // 2)
+        rows = array("f")
+        with open(self.vectors_path, "rb") as f:
+            f.seek((len(self.entries) - keep) * self.dimensions * rows.itemsize)
+            rows.fromfile(f, keep * self.dimensions)
+        self._rewrite(self.entries[-keep:], rows)
+        logging.info(f"Compacted incident index to {keep} incidents")
+
+    def _rewrite(self, entries, rows):
+        self._matrix = None
+        for path, write in (
+            (self.vectors_path, lambda f: array("f", rows).tofile(f)),
+            (self.meta_path, lambda f: f.write(
+                "".join(json.dumps(e) + "\n" for e in [self._header()] + list(entries)).encode("utf-8"))),
+        ):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        self.entries = list(entries)
+        self._rows = array("f", rows) if np is None else array("f")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "incidents": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def format_similar(entry):
+    """Render a reused diagnosis with how similar and how old its incident was"""
+    age = int(time.time() - entry["created"])
+    return f"[similar past incident, {entry['similarity']:.0%} match, {age // 60}m old]\n{entry['analysis']}"
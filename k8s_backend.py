@@ -0,0 +1,528 @@
+import atexit
+import base64
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import POD_LIST_SECONDS
+
+# Configuration
+K8S_BACKEND = os.environ.get("K8S_BACKEND", "api")   # "api" or "kubectl"
+REQUEST_TIMEOUT = 30      # seconds per API call / kubectl invocation
+POOL_SIZE = 32            # pooled HTTPS connections to the API server
+LIST_CHUNK_SIZE = 500     # pods per page when listing
+MAX_DESCRIBED_EVENTS = 10 # most recent events kept in a pod description
+
+SERVICE_ACCOUNT_DIR = "/var/run/secrets/kubernetes.io/serviceaccount"
+
+
+class KubeError(Exception):
+    """A Kubernetes call failed"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class KubeConfigError(KubeError):
+    """The kubeconfig cannot be used by the API backend"""
+
+
+def _query(params):
+    params = {k: v for k, v in params.items() if v not in (None, "", False)}
+    params = {k: ("true" if v is True else v) for k, v in params.items()}
+    return f"?{urlencode(params)}" if params else ""
+
+
+def pod_path(namespace, name=None, sub=None):
+    path = f"/api/v1/namespaces/{quote(namespace)}/pods"
+    if name:
+        path += f"/{quote(name)}"
+    if sub:
+        path += f"/{sub}"
+    return path
+
+
+def log_params(container=None, tail_lines=None, limit_bytes=None, previous=False, since_time=None, timestamps=False):
+    return {
+        "container": container,
+        "tailLines": tail_lines,
+        "limitBytes": limit_bytes,
+        "previous": previous,
+        "sinceTime": since_time,
+        "timestamps": timestamps,
+    }
+
+
+def restart_patch():
+    """The patch `kubectl rollout restart` applies to a workload"""
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {"spec": {"template": {"metadata": {"annotations": {"kubectl.kubernetes.io/restartedAt": now}}}}}
+
+
+class KubeBackend:
+    """Operations the monitors need from the cluster.
+
+    Implementations only have to provide raw_get, raw_stream, request and
+    pod_logs; the rest is built on the REST paths, so both backends return
+    the same API objects.
+    """
+
+    name = "base"
+    context = None
+
+    def raw_get(self, path, timeout=None):
+        raise NotImplementedError
+
+    def raw_stream(self, path, timeout=None):
+        """Yield the lines of a streaming GET (watches, followed logs)"""
+        raise NotImplementedError
+
+    def request(self, method, path, body=None, content_type="application/json", timeout=None):
+        raise NotImplementedError
+
+    def pod_logs(self, namespace, name, timeout=None, **options):
+        raise NotImplementedError
+
+    def iter_pods(self, field_selector=None, chunk_size=LIST_CHUNK_SIZE, timeout=None, namespace=None):
+        """Yield every pod (of one namespace if given), one page at a time"""
+        continue_token = None
+        # Only the page requests are timed, not the caller's work between pages
+        elapsed = 0.0
+        while True:
+            start = time.monotonic()
+            page = self.raw_get((pod_path(namespace) if namespace else "/api/v1/pods") + _query({
+                "limit": chunk_size, "continue": continue_token, "fieldSelector": field_selector
+            }), timeout)
+            elapsed += time.monotonic() - start
+            yield from page.get("items", [])
+            continue_token = page.get("metadata", {}).get("continue")
+            if not continue_token:
+                POD_LIST_SECONDS.observe(elapsed, backend=self.name)
+                return
+
+    def list_pods(self, field_selector=None, timeout=None):
+        return list(self.iter_pods(field_selector, timeout=timeout))
+
+    def list_namespaces(self, timeout=None):
+        """Names of every namespace in the cluster"""
+        page = self.raw_get("/api/v1/namespaces", timeout)
+        return [ns["metadata"]["name"] for ns in page.get("items", [])]
+
+    def list_replicasets(self, chunk_size=LIST_CHUNK_SIZE, timeout=None):
+        """Every ReplicaSet in the cluster, fetched page by page"""
+        items = []
+        continue_token = None
+        while True:
+            page = self.raw_get("/apis/apps/v1/replicasets" + _query({
+                "limit": chunk_size, "continue": continue_token
+            }), timeout)
+            items.extend(page.get("items", []))
+            continue_token = page.get("metadata", {}).get("continue")
+            if not continue_token:
+                return items
+
+    def get_pod(self, namespace, name, timeout=None):
+        return self.raw_get(pod_path(namespace, name), timeout)
+
+    def list_events(self, namespace=None, field_selector=None, timeout=None, chunk_size=LIST_CHUNK_SIZE):
+        """Events of one namespace or the whole cluster, fetched page by page"""
+        path = f"/api/v1/namespaces/{quote(namespace)}/events" if namespace else "/api/v1/events"
+        items = []
+        continue_token = None
+        while True:
+            page = self.raw_get(path + _query({
+                "limit": chunk_size, "continue": continue_token, "fieldSelector": field_selector
+            }), timeout)
+            items.extend(page.get("items", []))
+            continue_token = page.get("metadata", {}).get("continue")
+            if not continue_token:
+                return items
+
+    def pod_events(self, pod, timeout=None):
+        """Events about one pod we already hold"""
+        metadata = pod.get("metadata", {})
+        if metadata.get("uid"):
+            selector = f"involvedObject.uid={metadata['uid']}"
+        else:
+            selector = f"involvedObject.kind=Pod,involvedObject.name={metadata.get('name')}"
+        return self.list_events(metadata.get("namespace"), selector, timeout)
+
+    def describe_pod(self, namespace, name, timeout=None):
+        """A compact description from the pod object and its events.
+
+        Two GETs instead of `kubectl describe`, which makes several
+        requests and prints far more than the analysis needs.
+        """
+        pod = self.get_pod(namespace, name, timeout)
+        return render_description(pod, self.pod_events(pod, timeout))
+
+    def rollout_restart(self, namespace, kind, name, timeout=None):
+        group = {"Deployment": "deployments", "StatefulSet": "statefulsets", "DaemonSet": "daemonsets"}[kind]
+        self.request(
+            "PATCH",
+            f"/apis/apps/v1/namespaces/{quote(namespace)}/{group}/{quote(name)}",
+            restart_patch(),
+            "application/strategic-merge-patch+json",
+            timeout
+        )
+
+    def delete_pod(self, namespace, name, timeout=None):
+        self.request("DELETE", pod_path(namespace, name), timeout=timeout)
+
+
+class KubectlBackend(KubeBackend):
+    """Fallback that forks kubectl for every call (argument lists, never a shell)"""
+
+    name = "kubectl"
+
+    def __init__(self, context=None, timeout=REQUEST_TIMEOUT):
+        self.context = context
+        self.timeout = timeout
+
+    def command(self, *args):
+        command = ["kubectl"]
+        if self.context:
+            command += ["--context", self.context]
+        return command + list(args)
+
+    def run(self, *args, timeout=None, stdin=None):
+        timeout = timeout or self.timeout
+        try:
+            result = subprocess.run(self.command(*args), input=stdin, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise KubeError(f"kubectl {args[0]} timed out after {timeout}s")
+        except OSError as e:
+            raise KubeError(f"Error executing kubectl: {e}")
+        if result.returncode != 0:
+            stderr = result.stderr.strip()
+            raise KubeError(stderr, 404 if "(NotFound)" in stderr else None)
+        return result.stdout
+
+    def raw_get(self, path, timeout=None):
+        output = self.run("get", "--raw", path, timeout=timeout)
+        try:
+            return json.loads(output)
+        except json.JSONDecodeError as e:
+            raise KubeError(f"Invalid JSON from kubectl get --raw {path}: {e}")
+
+    def raw_stream(self, path, timeout=None):
+        process = subprocess.Popen(
+            self.command("get", "--raw", path), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        try:
+            for line in process.stdout:
+                yield line
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            stderr = process.stderr.read().strip()
+            process.stdout.close()
+            process.stderr.close()
+        if process.returncode not in (0, -9) and stderr:
+            raise KubeError(stderr)
+
+    def request(self, method, path, body=None, content_type="application/json", timeout=None):
+        verbs = {"POST": "create", "PUT": "replace", "DELETE": "delete"}
+        if method not in verbs:
+            raise KubeError(f"kubectl backend cannot {method} {path}")
+        args = [verbs[method], "--raw", path]
+        stdin = None
+        if body is not None:
+            args += ["-f", "-"]
+            stdin = json.dumps(body)
+        output = self.run(*args, timeout=timeout, stdin=stdin)
+        try:
+            return json.loads(output) if output.strip() else None
+        except json.JSONDecodeError:
+            return None
+
+    def pod_logs(self, namespace, name, timeout=None, **options):
+        params = log_params(**options)
+        args = ["logs", "-n", namespace, name]
+        if params["container"]:
+            args += ["-c", params["container"]]
+        if params["tailLines"] is not None:
+            args.append(f"--tail={params['tailLines']}")
+        if params["limitBytes"]:
+            args.append(f"--limit-bytes={params['limitBytes']}")
+        if params["previous"]:
+            args.append("--previous")
+        if params["sinceTime"]:
+            args.append(f"--since-time={params['sinceTime']}")
+        if params["timestamps"]:
+            args.append("--timestamps")
+        return self.run(*args, timeout=timeout)
+
+    def rollout_restart(self, namespace, kind, name, timeout=None):
+        self.run("rollout", "restart", kind.lower(), name, "-n", namespace, timeout=timeout)
+
+    def delete_pod(self, namespace, name, timeout=None):
+        self.run("delete", "pod", name, "-n", namespace, timeout=timeout)
+
+
+def _load_yaml_or_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        import yaml
+    except ImportError:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            raise KubeConfigError(f"PyYAML is required to read {path}")
+    return yaml.safe_load(text) or {}
+
+
+def load_kubeconfig(paths=None):
+    """Merge kubeconfig files the way kubectl does (first file wins)"""
+    if paths is None:
+        env = os.environ.get("KUBECONFIG")
+        paths = env.split(os.pathsep) if env else [os.path.expanduser("~/.kube/config")]
+    merged = {"clusters": {}, "users": {}, "contexts": {}, "current-context": None}
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        config = _load_yaml_or_json(path)
+        base = os.path.dirname(os.path.abspath(path))
+        for section, key in (("clusters", "cluster"), ("users", "user"), ("contexts", "context")):
+            for entry in config.get(section) or []:
+                value = dict(entry.get(key) or {})
+                value["_base"] = base
+                merged[section].setdefault(entry["name"], value)
+        if not merged["current-context"]:
+            merged["current-context"] = config.get("current-context")
+    return merged
+
+
+_temp_files = []
+
+
+def _materialize(data, suffix):
+    """Write base64 data to a private temp file and return its path"""
+    handle = tempfile.NamedTemporaryFile(prefix="k8s-monitor-", suffix=suffix, delete=False)
+    with handle:
+        handle.write(base64.b64decode(data))
+    os.chmod(handle.name, 0o600)
+    _temp_files.append(handle.name)
+    return handle.name
+
+
+@atexit.register
+def _cleanup_temp_files():
+    for path in _temp_files:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+class ApiBackend(KubeBackend):
+    """Talks to the API server over one pooled, persistent HTTPS session"""
+
+    name = "api"
+
+    def __init__(self, context=None, kubeconfig=None, timeout=REQUEST_TIMEOUT, pool_size=POOL_SIZE):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/json"
+
+        if context is None and kubeconfig is None and os.environ.get("KUBERNETES_SERVICE_HOST"):
+            self._configure_in_cluster()
+        else:
+            self._configure_kubeconfig(context, kubeconfig)
+
+    def _configure_in_cluster(self):
+        host = os.environ["KUBERNETES_SERVICE_HOST"]
+        port = os.environ.get("KUBERNETES_SERVICE_PORT", "443")
+        self.server = f"https://{host}:{port}"
+        self.context = None
+        with open(os.path.join(SERVICE_ACCOUNT_DIR, "token"), "r", encoding="utf-8") as f:
+            self.session.headers["Authorization"] = f"Bearer {f.read().strip()}"
+        self.session.verify = os.path.join(SERVICE_ACCOUNT_DIR, "ca.crt")
+
+    def _configure_kubeconfig(self, context, kubeconfig):
+        config = load_kubeconfig([kubeconfig] if kubeconfig else None)
+        context = context or config["current-context"]
+        if not context or context not in config["contexts"]:
+            raise KubeConfigError(f"Context {context!r} not found in kubeconfig")
+        ctx = config["contexts"][context]
+        cluster = config["clusters"].get(ctx.get("cluster"))
+        user = config["users"].get(ctx.get("user"), {})
+        if not cluster or not cluster.get("server"):
+            raise KubeConfigError(f"Cluster for context {context!r} has no server")
+        if "exec" in user or "auth-provider" in user:
+            raise KubeConfigError(f"Context {context!r} uses an exec/auth-provider plugin")
+
+        self.context = context
+        self.server = cluster["server"].rstrip("/")
+
+        def path_of(entry, key):
+            return os.path.join(entry["_base"], os.path.expanduser(entry[key]))
+
+        if cluster.get("insecure-skip-tls-verify"):
+            self.session.verify = False
+        elif cluster.get("certificate-authority-data"):
+            self.session.verify = _materialize(cluster["certificate-authority-data"], ".crt")
+        elif cluster.get("certificate-authority"):
+            self.session.verify = path_of(cluster, "certificate-authority")
+
+        cert = key = None
+        if user.get("client-certificate-data"):
+            cert = _materialize(user["client-certificate-data"], ".crt")
+        elif user.get("client-certificate"):
+            cert = path_of(user, "client-certificate")
+        if user.get("client-key-data"):
+            key = _materialize(user["client-key-data"], ".key")
+        elif user.get("client-key"):
+            key = path_of(user, "client-key")
+        if cert and key:
+            self.session.cert = (cert, key)
+
+        token = user.get("token")
+        if not token and user.get("tokenFile"):
+            with open(path_of(user, "tokenFile"), "r", encoding="utf-8") as f:
+                token = f.read().strip()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        elif user.get("username"):
+            self.session.auth = (user["username"], user.get("password", ""))
+
+    def _send(self, method, path, timeout=None, **kwargs):
+        try:
+            response = self.session.request(method, self.server + path, timeout=timeout or self.timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise KubeError(f"{method} {path} failed: {e}")
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            response.close()
+            raise KubeError(f"{method} {path}: {response.status_code} {message}", response.status_code)
+        return response
+
+    def raw_get(self, path, timeout=None):
+        response = self._send("GET", path, timeout)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise KubeError(f"Invalid JSON from GET {path}: {e}")
+
+    def raw_stream(self, path, timeout=None):
+        # The read timeout only bounds the gap between lines, not the whole stream
+        response = self._send("GET", path, timeout, stream=True)
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                yield line
+        except requests.exceptions.RequestException as e:
+            raise KubeError(f"GET {path} stream failed: {e}")
+        finally:
+            response.close()
+
+    def request(self, method, path, body=None, content_type="application/json", timeout=None):
+        data = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": content_type} if body is not None else {}
+        response = self._send(method, path, timeout, data=data, headers=headers)
+        return response.json() if response.content else None
+
+    def pod_logs(self, namespace, name, timeout=None, **options):
+        response = self._send("GET", pod_path(namespace, name, "log") + _query(log_params(**options)), timeout)
+        return response.text
+
+
+def render_description(pod, events):
+    """A compact, kubectl-describe-like text summary of a pod and its events"""
+    metadata = pod.get("metadata", {})
+    spec = pod.get("spec", {})
+    status = pod.get("status", {})
+    lines = [
+        f"Name:         {metadata.get('name')}",
+        f"Namespace:    {metadata.get('namespace')}",
+    ]
+    # Pods from a projected scan carry no spec
+    if spec.get("nodeName"):
+        lines.append(f"Node:         {spec['nodeName']}")
+    lines.append(f"Status:       {status.get('phase')}")
+    if status.get("reason"):
+        lines.append(f"Reason:       {status['reason']}")
+    if status.get("message"):
+        lines.append(f"Message:      {status['message']}")
+    owners = metadata.get("ownerReferences") or []
+    if owners:
+        lines.append(f"Controlled By: {owners[0].get('kind')}/{owners[0].get('name')}")
+
+    specs = {c.get("name"): c for c in (spec.get("initContainers") or []) + (spec.get("containers") or [])}
+    statuses = (status.get("initContainerStatuses") or []) + (status.get("containerStatuses") or [])
+    if statuses or specs:
+        lines.append("Containers:")
+    for cs in statuses or [{"name": name} for name in specs]:
+        container = specs.get(cs.get("name"), {})
+        lines.append(f"  {cs.get('name')}:")
+        if container.get("image") or cs.get("image"):
+            lines.append(f"    Image:         {container.get('image') or cs.get('image')}")
+        if container.get("command"):
+            lines.append(f"    Command:       {' '.join(container['command'] + container.get('args', []))}")
+        for label, key in (("State", "state"), ("Last State", "lastState")):
+            state = cs.get(key) or {}
+            for name, detail in state.items():
+                extra = ", ".join(f"{k}={v}" for k, v in detail.items() if k in ("reason", "exitCode", "message"))
+                lines.append(f"    {label + ':':<14} {name.capitalize()} {extra}".rstrip())
+        if "ready" in cs:
+            lines.append(f"    Ready:         {cs['ready']}")
+            lines.append(f"    Restart Count: {cs.get('restartCount', 0)}")
+        resources = container.get("resources")
+        if resources:
+            lines.append(f"    Resources:     {json.dumps(resources, separators=(',', ':'))}")
+
+    conditions = status.get("conditions") or []
+    if conditions:
+        lines.append("Conditions:")
+        for c in conditions:
+            lines.append(f"  {c.get('type')}: {c.get('status')} {c.get('reason', '')}".rstrip())
+
+    lines.append("Events:" if events else "Events:       <none>")
+    events = sorted(events, key=lambda e: e.get("lastTimestamp") or e.get("eventTime") or "")
+    for event in events[-MAX_DESCRIBED_EVENTS:]:
+        count = event.get("count", 1)
+        lines.append(
+            f"  {event.get('type')}  {event.get('reason')}  (x{count})  {event.get('message', '').strip()}"
+        )
+    return "\n".join(lines)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(context=None, kind=None):
+    """Return a shared backend for a kubeconfig context.
+
+    The API backend is preferred; when the kubeconfig cannot be used
+    natively (exec plugins, missing PyYAML, ...) kubectl is used instead.
+    """
+    kind = kind or K8S_BACKEND
+    with _backends_lock:
+        key = (kind, context)
+        if key not in _backends:
+            backend = None
+            if kind == "api":
+                try:
+                    backend = ApiBackend(context)
+                except (KubeError, OSError) as e:
+                    logging.warning(f"Native Kubernetes API unavailable ({e}), falling back to kubectl")
+            _backends[key] = backend or KubectlBackend(context)
+        return _backends[key]
@@ -0,0 +1,147 @@
+import re
+
+from k8s_backend import KubeError
+
+# Configuration
+TAIL_LINES = 500             # lines fetched per container log
+LIMIT_BYTES = 256 * 1024     # hard cap on bytes fetched per container log
+EXCERPT_BYTES = 2000         # default budget for the excerpt put in a prompt
+LINES_BEFORE = 5             # context kept before an error line
+LINES_AFTER = 10             # and after it
+MAX_CONTAINERS = 3           # containers whose logs are fetched per pod
+
+ERROR_PATTERN = re.compile(
+    r"\b(error|exception|panic|fatal|traceback|failed|failure|oomkilled|killed|segfault|"
+    r"refused|timeout|timed out|denied|not found|cannot|unable)\b",
+    re.I,
+)
+SECTION_PATTERN = re.compile(r"^--- .* ---$|^--- .*: no output ---$")   # headers fetch_pod_logs writes
+
+
+def log_targets(pod):
+    """(container, previous) log fetches worth making for a pod.
+
+    Containers that are not ready come first. A container that has
+    restarted also gets its previous instance's log, which is where a
+    crash-looping container's error is; the current instance is usually
+    empty or just starting up.
+    """
+    status = pod.get("status") or {}
+    statuses = (status.get("initContainerStatuses") or []) + (status.get("containerStatuses") or [])
+    if not statuses:
+        return [(None, False)]
+    failing = [cs for cs in statuses if not cs.get("ready", False)] or statuses
+    single = len(statuses) == 1
+    targets = []
+    for cs in failing[:MAX_CONTAINERS]:
+        container = None if single else cs.get("name")
+        if cs.get("restartCount", 0) > 0 or (cs.get("lastState") or {}).get("terminated"):
+            targets.append((container, True))
+        targets.append((container, False))
+    return targets
+
+
+def fetch_pod_logs(backend, namespace, name, pod=None, timeout=None,
+                   tail_lines=TAIL_LINES, limit_bytes=LIMIT_BYTES, tails=None):
+    """Bounded tails of the pod's failing containers, previous instances included.
+
+    Without the pod object only the current default container is fetched.
+    With a log_tail.LogTailManager only lines written since the last fetch
+    are transferred. Raises KubeError only if every fetch failed.
+    """
+    targets = log_targets(pod) if pod else [(None, False)]
+    sections = []
+    errors = []
+    for container, previous in targets:
+        try:
+            if tails is not None:
+                text = tails.logs(backend, namespace, name, pod, container, previous, timeout)
+            else:
+                text = backend.pod_logs(namespace, name, timeout=timeout, container=container,
+                                        tail_lines=tail_lines, limit_bytes=limit_bytes, previous=previous)
+        except KubeError as e:
+            errors.append(str(e))
+            continue
+        if len(targets) == 1:
+            return text
+        label = f"{'previous' if previous else 'current'} container{f' {container}' if container else ''}"
+        sections.append(f"--- {label} ---\n{text.rstrip()}" if text.strip() else f"--- {label}: no output ---")
+    if not sections:
+        raise KubeError("; ".join(errors) or "no logs")
+    return "\n".join(sections)
+
+
+def _windows(lines):
+    """Merged (start, end) line ranges around every error line"""
+    windows = []
+    for i, line in enumerate(lines):
+        if not ERROR_PATTERN.search(line):
+            continue
+        start, end = max(0, i - LINES_BEFORE), min(len(lines), i + LINES_AFTER + 1)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
+
+
+def excerpt(logs, budget=EXCERPT_BYTES):
+    """The parts of a log that explain a failure, within budget bytes.
+
+    Windows around error lines are kept, latest first, until the budget is
+    spent; the end of the log is always included because that is where a
+    crash ends up, and whatever budget is left extends it backwards.
+    Skipped stretches are marked. Logs without error lines are cut to their
+    tail.
+    """
+    if not logs or len(logs.encode("utf-8")) <= budget:
+        return logs
+    lines = logs.splitlines()
+    tail = max(0, len(lines) - LINES_AFTER)
+    windows = _windows(lines) + [(tail, len(lines))]
+
+    chosen = []
+    used = 0
+    for start, end in sorted(windows, key=lambda w: w[1], reverse=True):
+        # Clip a window that overlaps one already taken
+        for taken_start, taken_end in chosen:
+            if start < taken_end and end > taken_start:
+                start, end = (taken_end, end) if end > taken_end else (start, taken_start)
+        if start >= end:
+            continue
+        size = sum(len(line.encode("utf-8")) + 1 for line in lines[start:end])
+        if used + size > budget:
+            if chosen:
+                continue
+            # Not even the last window fits: keep its end
+            while start < end and size > budget:
+                size -= len(lines[start].encode("utf-8")) + 1
+                start += 1
+        chosen.append((start, end))
+        used += size
+
+    if chosen:
+        # Spend what is left on more of the tail, up to the window before it
+        start, end = chosen[0]
+        floor = max((e for s, e in chosen[1:] if e <= start), default=0)
+        while start > floor:
+            size = len(lines[start - 1].encode("utf-8")) + 1
+            if used + size > budget:
+                break
+            start -= 1
+            used += size
+        chosen[0] = (start, end)
+
+    if not any(end > start for start, end in chosen):
+        return logs[-budget:]
+    parts = []
+    previous_end = 0
+    for start, end in sorted(chosen):
+        if start > previous_end:
+            # Keep container headers so it stays clear whose log a window is from
+            headers = [line for line in lines[previous_end:start] if SECTION_PATTERN.match(line)]
+            parts.extend(headers)
+            parts.append(f"[... {start - previous_end - len(headers)} lines skipped ...]")
+        parts.extend(lines[start:end])
+        previous_end = end
+    return "\n".join(parts)
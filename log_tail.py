@@ -0,0 +1,153 @@
+import re
+import threading
+from collections import deque
+from datetime import datetime
+
+# Configuration
+RING_LINES = 1000          # lines kept per container
+MAX_LINE_BYTES = 2048      # longer lines are cut, so a tracked container's memory is bounded
+FIRST_TAIL_LINES = 500     # lines fetched the first time a container is seen
+LIMIT_BYTES = 256 * 1024   # cap on bytes per fetch
+OVERFLOW_BYTES = LIMIT_BYTES - MAX_LINE_BYTES  # a resumed fetch this large was cut short
+
+_TIMESTAMP = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d{1,9}))?(Z|[+-]\d\d:\d\d) ?")
+
+
+def _parse_line(line):
+    """Split a `--timestamps` line into ((seconds, nanoseconds), timestamp text, line)"""
+    match = _TIMESTAMP.match(line)
+    if not match:
+        return None, None, line
+    seconds = datetime.fromisoformat(match.group(1) + match.group(3).replace("Z", "+00:00")).timestamp()
+    nanos = int((match.group(2) or "0").ljust(9, "0"))
+    return (int(seconds), nanos), line[:match.end()].strip(), line[match.end():]
+
+
+class LogCursor:
+    """The lines seen so far of one container instance, and where to resume.
+
+    sinceTime only has one-second resolution, so a resumed fetch repeats
+    the last second; lines at the cursor's exact timestamp that were
+    already seen are skipped.
+    """
+
+    def __init__(self, ring_lines=RING_LINES):
+        self.lines = deque(maxlen=ring_lines)
+        self.position = None        # (seconds, nanoseconds) of the newest line
+        self.since = None           # its timestamp as kubelet wrote it
+        self.at_position = set()    # lines already seen at that exact timestamp
+        self.fetched_bytes = 0
+
+    def feed(self, text):
+        """Append the new lines of a --timestamps log; returns how many were new"""
+        added = 0
+        self.fetched_bytes += len(text.encode("utf-8"))
+        for raw in text.splitlines():
+            position, stamp, line = _parse_line(raw)
+            if position is not None and self.position is not None:
+                if position < self.position or (position == self.position and line in self.at_position):
+                    continue
+            if position is not None:
+                if position != self.position:
+                    self.at_position = set()
+                self.position, self.since = position, stamp
+                self.at_position.add(line)
+            self.lines.append(line[:MAX_LINE_BYTES])
+            added += 1
+        return added
+
+    def text(self):
+        return "\n".join(self.lines)
+
+
+class LogTailManager:
+    """Incremental container logs for the pods a monitor keeps flagging.
+
+    Each container instance has a LogCursor: the first fetch takes a
+    bounded tail, later ones only what was written after the cursor
+    (--since-time). --limit-bytes keeps the oldest bytes, so when more was
+    written since than one fetch returns, the cursor is dropped and a fresh
+    tail taken instead. A restarted container starts a new cursor, and the
+    crashed instance's --previous log is fetched once per restart.
+    retain() drops every pod that is no longer tracked.
+    """
+
+    def __init__(self, ring_lines=RING_LINES):
+        self.ring_lines = ring_lines
+        self.cursors = {}     # (namespace, pod, uid, container, restart count) -> LogCursor
+        self.previous = {}    # same key -> text of the instance that crashed before it
+        self._lock = threading.Lock()
+
+    def _restarts(self, pod, container):
+        status = (pod or {}).get("status") or {}
+        statuses = (status.get("initContainerStatuses") or []) + (status.get("containerStatuses") or [])
+        for cs in statuses:
+            if container is None or cs.get("name") == container:
+                return cs.get("restartCount", 0)
+        return 0
+
+    def _key(self, namespace, name, pod, container):
+        uid = ((pod or {}).get("metadata") or {}).get("uid")
+        return (namespace, name, uid, container, self._restarts(pod, container))
+
+    def logs(self, backend, namespace, name, pod=None, container=None, previous=False, timeout=None):
+        """Log text of a container (or of its previous instance), fetching only what is new"""
+        key = self._key(namespace, name, pod, container)
+        if previous:
+            with self._lock:
+                if key in self.previous:
+                    return self.previous[key]
+            # A crashed instance's log never changes, so fetch it once per restart
+            text = backend.pod_logs(namespace, name, timeout=timeout, container=container, previous=True,
+                                    tail_lines=FIRST_TAIL_LINES, limit_bytes=LIMIT_BYTES)
+            with self._lock:
+                for old in [k for k in self.previous if k[:4] == key[:4] and k != key]:
+                    del self.previous[old]
+                self.previous[key] = text
+            return text
+
+        with self._lock:
+            cursor = self.cursors.get(key)
+            if cursor is None:
+                cursor = self.cursors[key] = LogCursor(self.ring_lines)
+                # Older instances of this container are of no further use
+                for old in [k for k in self.cursors if k[:4] == key[:4] and k != key]:
+                    del self.cursors[old]
+            since = cursor.since
+        text = backend.pod_logs(
+            namespace, name, timeout=timeout, container=container, timestamps=True, limit_bytes=LIMIT_BYTES,
+            since_time=since, tail_lines=None if since else FIRST_TAIL_LINES,
+        )
+        if since and len(text.encode("utf-8")) >= OVERFLOW_BYTES:
+            with self._lock:
+                cursor = self.cursors[key] = LogCursor(self.ring_lines)
+            text = backend.pod_logs(namespace, name, timeout=timeout, container=container, timestamps=True,
+                                    limit_bytes=LIMIT_BYTES, tail_lines=FIRST_TAIL_LINES)
+        with self._lock:
+            cursor.feed(text)
+            return cursor.text()
+
+    def retain(self, pods):
+        """Forget every pod not in pods (pod dicts), e.g. the ones that recovered or are gone"""
+        keep = {(p["metadata"]["namespace"], p["metadata"]["name"], p["metadata"].get("uid")) for p in pods}
+        with self._lock:
+            for store in (self.cursors, self.previous):
+                for key in [k for k in store if k[:3] not in keep]:
+                    del store[key]
+
+    def forget(self, pod):
+        """Drop everything kept for one pod, e.g. when a watch reports it deleted"""
+        metadata = pod.get("metadata", {})
+        gone = (metadata.get("namespace"), metadata.get("name"), metadata.get("uid"))
+        with self._lock:
+            for store in (self.cursors, self.previous):
+                for key in [k for k in store if k[:3] == gone]:
+                    del store[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "containers": len(self.cursors),
+                "lines": sum(len(c.lines) for c in self.cursors.values()),
+                "fetched_bytes": sum(c.fetched_bytes for c in self.cursors.values()),
+            }
@@ -1,67 +1,33 @@
-import subprocess
 import json
-import requests
-import re
-
-def is_pod_unhealthy(pod):
-    status = pod.get("status", {})
-    phase = status.get("phase", "")
-
-    if phase in ["Failed", "Unknown"]:
-        return True
-
-    conditions = status.get("conditions", [])
-    if phase == "Pending" and conditions:
-        for condition in conditions:
-            if condition.get("type") == "PodScheduled" and condition.get("status") == "False":
-                return True
-
-    for cs in status.get("containerStatuses", []) or []:
-        if not cs.get("ready", True):
-            state = cs.get("state", {})
-            waiting = state.get("waiting")
-            if waiting and waiting.get("reason") in [
-                "CrashLoopBackOff", "ErrImagePull", "ImagePullBackOff", "RunContainerError"
-            ]:
-                return True
-            if state.get("terminated"):
-                return True
-
-    return False
-
-def get_failed_pods():
-    result = subprocess.run(
-        ["kubectl", "get", "pods", "--all-namespaces", "-o", "json"],
-        capture_output=True, text=True
-    )
-    pods = json.loads(result.stdout)
-    failed_pods = []
-
-    for item in pods['items']:
-        namespace = item['metadata']['namespace']
-        pod_name = item['metadata']['name']
-
-        if is_pod_unhealthy(item):
-            failed_pods.append({
-                'name': pod_name,
-                'namespace': namespace
-            })
-
-    return failed_pods
-
-def collect_info(pod_name, namespace):
-    logs = subprocess.getoutput(f"kubectl logs {pod_name} -n {namespace}")
-    desc = subprocess.getoutput(f"kubectl describe pod {pod_name} -n {namespace}")
-    return f"LOGS:\n{logs}\n\nPOD DESCRIPTION:\n{desc}"
-
-def query_gemma(info, pod_name, namespace):
-    url = "http://localhost:11434/api/generate"
-
-    prompt = f"""
-You are an expert Kubernetes troubleshooter. Below are the logs and pod description for a failed pod:
-
-Logs:
-{info}
+import sys
+from collector import collect_scan_evidence, fetch_logs, fetch_description
+from ollama_client import get_client
+from triage import TriageEngine
+from pod_health import is_pod_unhealthy
+from pod_snapshot import scan_unhealthy
+from k8s_backend import get_backend
+from metrics import ACTIONS_TAKEN, LLM_DECISIONS
+from workloads import describe_group, group_failures
+from remediation import RemediationExecutor, describe_outcome
+from incident_index import IncidentIndex
+from analysis_cache import normalize_log
+from log_excerpt import excerpt
+from prompt_builder import PromptTemplate
+from decisions import DecisionError, request_decision, validate_decision
+
+# Stream the generation and stop as soon as the JSON answer is complete
+STREAM_RESPONSES = True
+# Filter pods on the server and only fetch the fields the classifier reads
+PROJECTED_SCAN = True
+# Report what remediation would do without touching the cluster
+DRY_RUN = "--dry-run" in sys.argv
+
+_executor = None
+_decisions = None
+
+# Identical for every pod so Ollama can reuse the cached prefix; the pod comes last
+DECISION_PROMPT = PromptTemplate("decision", """
+You are an expert Kubernetes troubleshooter. You will be given the logs and pod description of a failed pod.
 
 Analyze the information and answer the following:
 
@@ -74,83 +40,169 @@ Analyze the information and answer the following:
 
 Answer ONLY in the following JSON format:
 
-{{
+{
   "cause": "<brief cause>",
   "action": "<one of: restart | revert_image | increase_resources | check_config>",
-  "pod": "{pod_name}",
-  "namespace": "{namespace}",
   "details": "<optional: detailed notes>"
-}}
-"""
+}
+""", "gemma:2b")
 
-    payload = {
-        "model": "gemma:2b",
-        "prompt": prompt.strip(),
-        "stream": False
-    }
+def get_failed_pods():
+    if PROJECTED_SCAN:
+        return [
+            {'name': snapshot.name, 'namespace': snapshot.namespace, 'pod': snapshot.to_pod()}
+            for snapshot, _ in scan_unhealthy()
+        ]
+
+    failed_pods = []
 
-    response = requests.post(url, json=payload)
-    res_json = response.json()
+    for item in get_backend().iter_pods():
+        namespace = item['metadata']['namespace']
+        pod_name = item['metadata']['name']
 
-    raw_response = res_json.get("response", "").strip()
-    match = re.search(r'{.*}', raw_response, re.DOTALL)
-    if match:
+        if is_pod_unhealthy(item):
+            failed_pods.append({
+                'name': pod_name,
+                'namespace': namespace,
+                'pod': item
+            })
+
+    return failed_pods
+
+def format_info(logs, desc):
+    # Only the lines around errors, so the prompt stays small
+    return f"LOGS:\n{excerpt(logs)}\n\nPOD DESCRIPTION:\n{desc}"
+
+def collect_info(pod_name, namespace, desc=None, pod=None):
+    _, logs = fetch_logs(namespace, pod_name, pod=pod)
+    if desc is None:
+        _, desc = fetch_description(namespace, pod_name)
+    return format_info(logs, desc)
+
+def collect_all_info(failed_pods):
+    # One event list for the whole scan instead of a describe per pod
+    evidence = collect_scan_evidence([pod['pod'] for pod in failed_pods])
+    return [format_info(e['logs'][1], e['description'][1]) for e in evidence]
+
+def get_decision_index():
+    global _decisions
+    if _decisions is None:
+        _decisions = IncidentIndex("decision_index")
+    return _decisions
+
+def query_gemma(info, pod_name, namespace):
+    # A past decision for a near-identical failure elsewhere is reused as is
+    decisions = get_decision_index()
+    text = normalize_log(info, max_lines=200)
+    similar = decisions.lookup(text)
+    if similar:
         try:
-            return json.loads(match.group())
-        except json.JSONDecodeError as e:
-            raise Exception(f"❌ Failed to parse JSON: {e}")
-    else:
-        raise Exception("❌ No valid JSON object found in model response.")
+            decision = validate_decision(json.loads(similar['analysis']))
+            print(f"♻️ Reusing the decision for a similar incident ({similar['similarity']:.0%} match)")
+            return dict(decision, pod=pod_name, namespace=namespace)
+        except ValueError:
+            # Stored before decisions were validated; ask the model again
+            pass
+
+    action_json = generate_decision(info, pod_name, namespace)
+    decisions.add(text, json.dumps(action_json))
+    return action_json
+
+def generate_decision(info, pod_name, namespace):
+    client = get_client()
+    prompt = DECISION_PROMPT.render([
+        ("Pod", f"{namespace}/{pod_name}"),
+        ("Evidence", info),
+    ])
+    try:
+        decision, timings = request_decision(
+            client, prompt, DECISION_PROMPT.model, STREAM_RESPONSES, **DECISION_PROMPT.options()
+        )
+    except DecisionError as e:
+        raise Exception(f"❌ No usable decision after a repair attempt: {e}")
+    if timings:
+        print(
+            f"⏱️ First token after {timings['time_to_first_token']:.2f}s, "
+            f"answer after {timings['time_to_answer']:.2f}s ({timings['chunks']} chunks)"
+        )
+    return dict(decision, pod=pod_name, namespace=namespace)
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = RemediationExecutor(dry_run=DRY_RUN)
+    return _executor
 
-def take_action(action_json):
+def take_action(action_json, pod=None, members=()):
     action = action_json["action"]
-    pod = action_json["pod"]
-    ns = action_json["namespace"]
     details = action_json.get("details", "")
 
     print(f"📌 Cause: {action_json.get('cause')}")
     print(f"📋 Recommended Action: {action}")
+    ACTIONS_TAKEN.inc(1 + len(members), action=action)
     if details:
         print(f"📓 Details: {details}")
+    if members:
+        print(f"👥 Also applies to: {', '.join(m['metadata']['name'] for m in members)}")
 
-    if action == "restart":
-        result = subprocess.run(
-            ["kubectl", "get", "pod", pod, "-n", ns, "-o", "json"],
-            capture_output=True, text=True
-        )
-        pod_info = json.loads(result.stdout)
-        owners = pod_info['metadata'].get('ownerReferences', [])
-
-        for owner in owners:
-            if owner['kind'] == 'ReplicaSet':
-                rs_name = owner['name']
-                deploy_name = "-".join(rs_name.split("-")[:-1])
-                print(f"🔁 Restarting deployment: {deploy_name}")
-                subprocess.run(["kubectl", "rollout", "restart", "deployment", deploy_name, "-n", ns])
-                return
-
-        print("❌ Could not find deployment. Deleting pod instead.")
-        subprocess.run(["kubectl", "delete", "pod", pod, "-n", ns])
-
-    elif action == "revert_image":
-        print("🔙 Action 'revert_image' not automated. Consider using 'kubectl rollout undo'.")
-    elif action == "increase_resources":
-        print("📈 Action 'increase_resources': Adjust resources in deployment YAML.")
-    elif action == "check_config":
-        print("🔍 Action 'check_config': Check config maps, environment vars, or secrets.")
-    else:
-        print(f"⚠️ Unknown action '{action}'. No operation performed.")
+    # Actions are coalesced per owning workload and applied by flush_actions
+    executor = get_executor()
+    executor.submit(action_json, pod)
+    for member in members:
+        executor.submit(action_json, member)
+
+def flush_actions(force=False):
+    for outcome in get_executor().flush(force):
+        print(describe_outcome(outcome))
 
 def main():
+    triage = TriageEngine.load()
     failed_pods = get_failed_pods()
+
+    # Well-known failures get a rule-based diagnosis; only the rest go to gemma
+    escalated = []
     for pod in failed_pods:
+        action_json = triage.evaluate(pod['pod'])
+        if action_json is None:
+            escalated.append(pod)
+            continue
         print(f"\n⚠️ Detected failed pod: {pod['name']} in namespace: {pod['namespace']}")
-        info = collect_info(pod['name'], pod['namespace'])
+        print(f"⚡ Matched triage rule: {action_json['rule']}")
+        try:
+            take_action(action_json, pod['pod'])
+        except Exception as e:
+            print(f"🚫 Error processing pod {pod['name']}: {e}")
+
+    # Replicas of one workload failing the same way get one diagnosis
+    groups = group_failures(escalated, pod_of=lambda pod: pod['pod'])
+    representatives = [members[0] for _, members in groups]
+    infos = collect_all_info(representatives)
+    for (key, members), info in zip(groups, infos):
+        pod = members[0]
+        print(f"\n⚠️ Detected failed pod: {pod['name']} in namespace: {pod['namespace']}")
+        if len(members) > 1:
+            print(f"🧩 Group {describe_group(key, members)}; analyzing {pod['name']} for all of them")
         try:
             action_json = query_gemma(info, pod['name'], pod['namespace'])
-            take_action(action_json)
+            take_action(action_json, pod['pod'], [member['pod'] for member in members[1:]])
         except Exception as e:
             print(f"🚫 Error processing pod {pod['name']}: {e}")
 
+    print("\n🛠️ Remediation:")
+    flush_actions(force=True)
+
+    print(f"\n📊 Triage: {len(failed_pods) - len(escalated)} of {len(failed_pods)} failed pods handled by rules")
+    print(f"📊 Grouping: {len(escalated)} escalated pods in {len(groups)} groups, "
+          f"{len(escalated) - len(groups)} LLM calls avoided")
+    for key, members in groups:
+        if len(members) > 1:
+            print(f"   {describe_group(key, members)}")
+    for name, hits in triage.hit_counts():
+        print(f"   {name}: {hits}")
+    outcomes = {outcome: LLM_DECISIONS.value(outcome=outcome) for outcome in ("valid", "repaired", "invalid")}
+    if any(outcomes.values()):
+        print(f"📊 Decisions: {outcomes['valid']} valid, {outcomes['repaired']} repaired, "
+              f"{outcomes['invalid']} unusable")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,238 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configuration
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9108"))   # 0 disables the endpoint
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        """Sum over every label set"""
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the with-block took, even if it raised"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - start, **labels)
+
+    def snapshot(self, **labels):
+        """Return (count, sum) for one label set"""
+        state = self._values.get(self._key(labels))
+        return (state["count"], state["sum"]) if state else (0, 0.0)
+
+    def totals(self):
+        """Return (count, sum) over every label set"""
+        with self._lock:
+            states = list(self._values.values())
+        return sum(s["count"] for s in states), sum(s["sum"] for s in states)
+
+    def _render_value(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            labels = _label_text(self.labels + ("le",), key + (_number(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _label_text(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {_number(state['sum'])}")
+        lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+POD_LIST_SECONDS = REGISTRY.register(Histogram(
+    "podmon_pod_list_seconds", "Time to list and parse the cluster's pods", ("backend",)))
+POD_COLLECT_SECONDS = REGISTRY.register(Histogram(
+    "podmon_pod_collect_seconds", "Time to fetch one piece of pod evidence", ("kind",)))
+LLM_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "podmon_llm_request_seconds", "Wall time of one Ollama generate request", ("model", "mode")))
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.register(Histogram(
+    "podmon_llm_first_token_seconds", "Time until the first streamed token", ("model",)))
+LLM_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "podmon_llm_prompt_tokens", "Estimated size of the prompts sent", ("model", "template"),
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384)))
+UNHEALTHY_PODS = REGISTRY.register(Counter(
+    "podmon_unhealthy_pods_total", "Unhealthy pods found by scans", ("reason",)))
+ACTIONS_TAKEN = REGISTRY.register(Counter(
+    "podmon_actions_total", "Remediation actions handled", ("action",)))
+LLM_DECISIONS = REGISTRY.register(Counter(
+    "podmon_llm_decisions_total", "Model remediation decisions by outcome: valid, repaired or invalid", ("outcome",)))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "podmon_llm_tokens_total", "Tokens reported by Ollama", ("model", "phase")))
+LLM_TOKEN_SECONDS = REGISTRY.register(Counter(
+    "podmon_llm_token_seconds_total", "Ollama-reported time spent on those tokens", ("model", "phase")))
+LLM_TOKENS_PER_SECOND = REGISTRY.register(Gauge(
+    "podmon_llm_tokens_per_second", "Token throughput of the last Ollama response", ("model", "phase")))
+
+
+def record_ollama_stats(model, response):
+    """Export the eval/prompt_eval counters Ollama returns with a finished generation"""
+    for phase, count_key, duration_key in (
+        ("eval", "eval_count", "eval_duration"),
+        ("prompt_eval", "prompt_eval_count", "prompt_eval_duration"),
+    ):
+        count = response.get(count_key)
+        duration = response.get(duration_key)
+        if not count or not duration:
+            continue
+        seconds = duration / 1e9  # Ollama reports durations in nanoseconds
+        LLM_TOKENS.inc(count, model=model, phase=phase)
+        LLM_TOKEN_SECONDS.inc(seconds, model=model, phase=phase)
+        LLM_TOKENS_PER_SECOND.set(count / seconds, model=model, phase=phase)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+
+
+def start_http_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve /metrics on a daemon thread; a no-op when port is 0 or already serving"""
+    global _server
+    if not port or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _Handler)
+    except OSError as e:
+        logging.warning(f"Metrics endpoint disabled, cannot bind {host}:{port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{_server.server_port}/metrics")
+    return _server
@@ -0,0 +1,175 @@
+"""Monitor several clusters from one process.
+
+    python multicluster.py --contexts prod-eu,prod-us,staging
+    python multicluster.py --all-contexts
+
+Every kubeconfig context gets its own scanner thread and Kubernetes backend,
+so a cluster that is slow or unreachable only delays itself. Unhealthy pods
+from all clusters feed one bounded analysis queue served by a few workers
+that share claude_code's Ollama client, health monitor and analysis cache.
+Reports are tagged with the context they came from.
+"""
+import argparse
+import logging
+import queue
+import signal
+import threading
+
+import claude_code
+from collector import collect_scan_evidence
+from k8s_backend import get_backend, load_kubeconfig
+from metrics import start_http_server
+from pod_health import is_pod_unhealthy
+from pod_snapshot import scan_unhealthy
+from workloads import describe_group, group_failures
+
+# Configuration
+SCAN_INTERVAL = claude_code.SCAN_INTERVAL
+ANALYZE_WORKERS = 2        # concurrent analyses across all clusters
+QUEUE_SIZE = 32            # pending analyses before scanners wait
+MAX_BACKOFF = 600          # seconds between retries of a failing cluster
+
+
+class ClusterScanner:
+    """Scan one kubeconfig context on its own thread and queue what it finds"""
+
+    def __init__(self, context, work, in_flight, stop, interval=SCAN_INTERVAL):
+        self.context = context
+        self.work = work
+        self.in_flight = in_flight
+        self.stop = stop
+        self.interval = interval
+        self.failures = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self.run, name=f"scan-{context}", daemon=True)
+
+    def scan(self):
+        backend = get_backend(context=self.context)
+        if claude_code.PROJECTED_SCAN:
+            unhealthy = [snapshot.to_pod() for snapshot, _ in scan_unhealthy(backend=backend)]
+        else:
+            unhealthy = [pod for pod in backend.iter_pods() if is_pod_unhealthy(pod)]
+
+        groups = []
+        for key, members in group_failures(unhealthy):
+            # Skip groups from the previous scan that are still waiting for analysis
+            if self.in_flight.add((self.context, key)):
+                groups.append((key, members))
+        representatives = [members[0] for _, members in groups]
+        evidence = collect_scan_evidence(representatives, backend=backend)
+
+        for (key, members), e in zip(groups, evidence):
+            if len(members) > 1:
+                logging.info(f"[{self.context}] Grouped {describe_group(key, members)}")
+            found = (
+                e["logs"][1] if e["logs"][0] else None,
+                e["description"][1] if e["description"][0] else None,
+            )
+            # Blocks while the analysis queue is full
+            self.work.put((self.context, key, members, found))
+        logging.info(f"[{self.context}] {len(unhealthy)} unhealthy pods, {len(groups)} groups queued")
+
+    def run(self):
+        while not self.stop.is_set():
+            try:
+                self.scan()
+                self.failures = 0
+                self.last_error = None
+                delay = self.interval
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                delay = min(self.interval * 2 ** self.failures, MAX_BACKOFF)
+                logging.error(f"[{self.context}] Scan failed ({self.failures} in a row), retrying in {delay}s: {e}")
+            self.stop.wait(delay)
+
+
+class InFlight:
+    """Thread-safe set of (context, group key) pairs waiting for analysis"""
+
+    def __init__(self):
+        self.keys = set()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        with self._lock:
+            if key in self.keys:
+                return False
+            self.keys.add(key)
+            return True
+
+    def discard(self, key):
+        with self._lock:
+            self.keys.discard(key)
+
+
+def analyze_worker(work, in_flight):
+    while True:
+        job = work.get()
+        if job is None:
+            return
+        context, key, members, found = job
+        try:
+            claude_code.handle_unhealthy_pod(members[0], found, members[1:], cluster=context)
+        except Exception as e:
+            logging.error(f"[{context}] Error handling {describe_group(key, members)}: {e}")
+        finally:
+            in_flight.discard((context, key))
+
+
+def kubeconfig_contexts():
+    return sorted(load_kubeconfig()["contexts"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor pods across several kubeconfig contexts")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--contexts", help="comma-separated kubeconfig contexts")
+    group.add_argument("--all-contexts", action="store_true", help="every context in the kubeconfig")
+    parser.add_argument("--interval", type=int, default=SCAN_INTERVAL, help="seconds between scans of each cluster")
+    parser.add_argument("--workers", type=int, default=ANALYZE_WORKERS, help="concurrent analyses")
+    parser.add_argument("--offline", action="store_true", help="skip AI analysis (same as claude_code.py --offline)")
+    args = parser.parse_args()
+
+    contexts = kubeconfig_contexts() if args.all_contexts else [c for c in args.contexts.split(",") if c]
+    if not contexts:
+        parser.error("no kubeconfig contexts to monitor")
+
+    claude_code.OFFLINE_MODE = args.offline
+    claude_code.init_ollama()
+    start_http_server()
+    logging.info(f"Monitoring {len(contexts)} clusters: {', '.join(contexts)}")
+
+    stop = threading.Event()
+    work = queue.Queue(maxsize=QUEUE_SIZE)
+    in_flight = InFlight()
+    workers = [
+        threading.Thread(target=analyze_worker, args=(work, in_flight), name=f"analyze-{i}", daemon=True)
+        for i in range(args.workers)
+    ]
+    scanners = [ClusterScanner(context, work, in_flight, stop, args.interval) for context in contexts]
+    for thread in workers + [scanner.thread for scanner in scanners]:
+        thread.start()
+
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(60):
+            claude_code.ANALYSIS_CACHE.save()
+            claude_code.log_cache_stats()
+            failing = [f"{s.context} ({s.failures}x: {s.last_error})" for s in scanners if s.failures]
+            if failing:
+                logging.warning(f"Clusters failing: {'; '.join(failing)}")
+    except KeyboardInterrupt:
+        logging.info("Monitoring stopped by user.")
+        stop.set()
+
+    for _ in workers:
+        work.put(None)
+    for thread in workers:
+        thread.join(timeout=claude_code.OLLAMA_TIMEOUT)
+    claude_code.ANALYSIS_CACHE.save()
+    claude_code.log_cache_stats()
+
+
+if __name__ == "__main__":
+    main()
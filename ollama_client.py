@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import LLM_FIRST_TOKEN_SECONDS, LLM_REQUEST_SECONDS, record_ollama_stats
+
+# Configuration
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+CONNECT_TIMEOUT = 5     # seconds to establish a connection
+READ_TIMEOUT = 120      # seconds to wait for the next bytes of a response
+KEEP_ALIVE = "30m"      # how long Ollama keeps the model loaded after a request
+MAX_RETRIES = 2         # retries on connection errors and 502/503/504
+RETRY_BACKOFF = 0.5     # seconds, doubled on every retry
+POOL_SIZE = 16          # pooled connections kept open to Ollama
+
+
+class OllamaError(Exception):
+    """Ollama answered with an error status or an error payload"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NoJsonError(OllamaError):
+    """A streamed generation finished without a complete JSON object"""
+
+    def __init__(self, message, text=""):
+        super().__init__(message)
+        self.text = text
+
+
+class JsonObjectScanner:
+    """Find the first balanced, valid JSON object in text fed chunk by chunk"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text):
+        """Consume text and return the parsed object once one is complete"""
+        for ch in text:
+            if self.depth == 0:
+                if ch == "{":
+                    self.buffer = ["{"]
+                    self.depth = 1
+                continue
+
+            self.buffer.append(ch)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    candidate = "".join(self.buffer)
+                    self.reset()
+                    try:
+                        return json.loads(candidate)
+                    except json.JSONDecodeError:
+                        continue
+        return None
+
+
+class OllamaClient:
+    """Connection-pooled client shared by every Ollama call site.
+
+    One requests.Session keeps TCP connections to Ollama open between
+    calls. Connection failures and 502/503/504 answers are retried with
+    exponential backoff; read timeouts are not, so a slow generation is
+    never started twice. Every generate request carries keep_alive so the
+    model stays resident between pods.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 keep_alive=KEEP_ALIVE, retries=MAX_RETRIES, backoff=RETRY_BACKOFF, pool_size=POOL_SIZE):
+        if "://" not in host:
+            host = f"http://{host}"
+        self.host = host.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=False,  # re-raise read timeouts as is, so they surface as requests ReadTimeout
+            status=retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            backoff_factor=backoff,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path):
+        return f"{self.host}{path}"
+
+    def _timeout(self, read_timeout):
+        if read_timeout is None:
+            return self.timeout
+        return (self.timeout[0], read_timeout)
+
+    def tags(self, timeout=None):
+        """Return the models Ollama has pulled"""
+        response = self.session.get(self.url("/api/tags"), timeout=self._timeout(timeout))
+        if response.status_code != 200:
+            raise OllamaError(f"/api/tags returned {response.status_code}", response.status_code)
+        return response.json().get("models", [])
+
+    def _payload(self, prompt, model, stream, options):
+        payload = {"model": model, "prompt": prompt, "stream": stream, "keep_alive": self.keep_alive}
+        payload.update(options)
+        return payload
+
+    def generate(self, prompt, model, timeout=None, **options):
+        """Run a non-streaming generation and return Ollama's response JSON"""
+        with LLM_REQUEST_SECONDS.time(model=model, mode="generate"):
+            response = self.session.post(
+                self.url("/api/generate"),
+                json=self._payload(prompt, model, False, options),
+                timeout=self._timeout(timeout)
+            )
+        if response.status_code != 200:
+            raise OllamaError(f"{response.status_code} - {response.text}", response.status_code)
+        result = response.json()
+        record_ollama_stats(model, result)
+        return result
+
+    def embeddings(self, prompt, model, timeout=None):
+        """Return Ollama's embedding vector for prompt"""
+        with LLM_REQUEST_SECONDS.time(model=model, mode="embeddings"):
+            response = self.session.post(
+                self.url("/api/embeddings"),
+                json={"model": model, "prompt": prompt, "keep_alive": self.keep_alive},
+                timeout=self._timeout(timeout)
+            )
+        if response.status_code != 200:
+            raise OllamaError(f"{response.status_code} - {response.text}", response.status_code)
+        return response.json().get("embedding", [])
+
+    def generate_json_stream(self, prompt, model, timeout=None, **options):
+        """Stream a generation and stop as soon as a complete JSON object arrives.
+
+        Returns (obj, timings) where timings holds time_to_first_token and
+        time_to_answer in seconds plus the number of chunks read. Closing the
+        response early makes Ollama cancel the rest of the generation.
+        """
+        start = time.monotonic()
+        timings = {"time_to_first_token": None, "time_to_answer": None, "chunks": 0}
+        scanner = JsonObjectScanner()
+        text = []
+
+        response = self.session.post(
+            self.url("/api/generate"),
+            json=self._payload(prompt, model, True, options),
+            stream=True,
+            timeout=self._timeout(timeout)
+        )
+        try:
+            if response.status_code != 200:
+                raise OllamaError(f"{response.status_code} - {response.text}", response.status_code)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(f"❌ Ollama error: {chunk['error']}")
+                piece = chunk.get("response", "")
+                timings["chunks"] += 1
+                if piece and timings["time_to_first_token"] is None:
+                    timings["time_to_first_token"] = time.monotonic() - start
+                    LLM_FIRST_TOKEN_SECONDS.observe(timings["time_to_first_token"], model=model)
+                text.append(piece)
+                obj = scanner.feed(piece)
+                if obj is not None:
+                    timings["time_to_answer"] = time.monotonic() - start
+                    LLM_REQUEST_SECONDS.observe(timings["time_to_answer"], model=model, mode="stream")
+                    # Stopping early means Ollama never sends its final stats
+                    if chunk.get("done"):
+                        record_ollama_stats(model, chunk)
+                    return obj, timings
+                if chunk.get("done"):
+                    record_ollama_stats(model, chunk)
+                    break
+        finally:
+            response.close()
+
+        text = "".join(text)
+        raise NoJsonError(f"❌ No valid JSON object found in model response: {text[:200]!r}", text)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide OllamaClient, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
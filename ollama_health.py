@@ -0,0 +1,153 @@
+import logging
+import random
+import threading
+import time
+import requests
+from ollama_client import OllamaError, get_client
+
+# Configuration
+PROBE_INTERVAL = 30      # seconds between background health probes
+PROBE_TIMEOUT = 5
+FAILURE_THRESHOLD = 3    # consecutive failures before the circuit opens
+RESET_TIMEOUT = 60       # seconds the circuit stays open before a trial call
+MAX_RESET_TIMEOUT = 900  # ceiling as the open period doubles after failed trials
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop calling a failing dependency and let a single trial call through later.
+
+    Every failed trial doubles how long the circuit stays open (with jitter,
+    up to max_reset_timeout); a success resets it.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.open_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may be made right now"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+                logging.info("Ollama circuit half-open, allowing a trial request")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info("Ollama circuit closed, AI analysis resumed")
+            self.state = CLOSED
+            self.failures = 0
+            self.trips = 0
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back a trial granted by allow() that never reached the dependency"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.open_timeout = min(self.reset_timeout * 2 ** self.trips, self.max_reset_timeout)
+                self.open_timeout *= random.uniform(0.8, 1.2)
+                self.trips += 1
+                logging.warning(
+                    f"Ollama circuit open after {self.failures} failures, "
+                    f"using offline analysis for {self.open_timeout:.0f}s"
+                )
+
+
+class OllamaHealthMonitor:
+    """Probe Ollama in the background and cache the result.
+
+    Scans ask available() instead of probing per pod; the answer comes from
+    the circuit breaker, which is fed by both the background probe and the
+    outcome of real analysis calls.
+    """
+
+    def __init__(self, model, client=None, interval=PROBE_INTERVAL, breaker=None):
+        self.model = model
+        self.client = client or get_client()
+        self.interval = interval
+        self.breaker = breaker or CircuitBreaker()
+        self.healthy = None
+        self.last_error = None
+        self.last_checked = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def probe(self):
+        """Check that Ollama answers and has the model pulled"""
+        try:
+            models = self.client.tags(timeout=PROBE_TIMEOUT)
+            if not any(m.get("name") == self.model for m in models):
+                raise OllamaError(f"Model {self.model} not loaded. Run 'ollama run {self.model}'")
+        except (requests.exceptions.RequestException, OllamaError, ValueError) as e:
+            if self.healthy is not False:
+                logging.warning(f"Ollama health probe failed: {e}")
+            self.healthy = False
+            self.last_error = str(e)
+            self.breaker.record_failure()
+        else:
+            if self.healthy is not True:
+                logging.info(f"Ollama is healthy ({self.model} available)")
+            self.healthy = True
+            self.last_error = None
+            self.breaker.record_success()
+        self.last_checked = time.time()
+        return self.healthy
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.probe()
+
+    def start(self):
+        """Probe once now, then every interval on a daemon thread"""
+        if self._thread is None:
+            self.probe()
+            self._thread = threading.Thread(target=self._run, name="ollama-health", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def available(self):
+        return self.breaker.allow()
+
+    def circuit_open(self):
+        """True while calls are being refused; unlike available(), never takes the half-open trial"""
+        return self.breaker.state == OPEN
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.breaker.record_failure()
+
+    def release(self):
+        self.breaker.release()
@@ -0,0 +1,261 @@
+import argparse
+import queue
+import signal
+import logging
+import threading
+import time
+
+from event_index import load_event_index
+from k8s_backend import get_backend
+from pod_snapshot import scan_unhealthy
+from pod_watch import pod_key
+from workloads import failure_group_key
+from triage import TriageEngine
+from metrics import start_http_server
+from remediation import describe_outcome
+from sharding import ShardCoordinator, make_lease_backend
+import main as steps
+
+# Configuration
+SCAN_INTERVAL = 30        # seconds between cluster scans
+COLLECT_WORKERS = 8       # concurrent log/describe fetches
+ANALYZE_WORKERS = 2       # concurrent Ollama generations
+ACT_WORKERS = 1           # remediation is applied one pod at a time
+QUEUE_SIZE = 64           # bound on every inter-stage queue
+DRAIN_TIMEOUT = 120       # seconds to finish in-flight work on shutdown
+SCOPED_SCAN_MAX = 25      # owned namespaces listed one by one; above this, list everything and filter
+
+_STOP = object()  # sentinel that tells a stage worker to exit
+
+
+class Stage:
+    """A pool of worker threads reading from one bounded queue.
+
+    handler(item) returns the item to pass downstream, or None to drop it.
+    put() blocks while the queue is full, so a slow stage pushes back on the
+    stage in front of it instead of letting work pile up in memory.
+    """
+
+    def __init__(self, name, handler, workers, maxsize=QUEUE_SIZE, downstream=None, on_done=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.downstream = downstream
+        self.on_done = on_done
+        self.processed = 0
+        self.failed = 0
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+            result = None
+            try:
+                result = self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logging.error(f"{self.name} failed for {item['namespace']}/{item['name']}: {e}")
+            if result is not None and self.downstream is not None:
+                self.downstream.put(result)
+            elif self.on_done is not None:
+                self.on_done(item)
+
+    def close(self, deadline):
+        """Let queued items finish, then stop the workers; False if the deadline passed"""
+        try:
+            for _ in self._threads:
+                self.queue.put(_STOP, timeout=max(0.1, deadline - time.monotonic()))
+        except queue.Full:
+            return False
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self._threads)
+
+
+class Pipeline:
+    """scan -> collect -> analyze -> act, each stage with its own workers.
+
+    Unhealthy pods are grouped by owning workload and failure reason; only
+    the first pod of a group is collected and analyzed, and pods of the same
+    group found while it is in flight join it as members that the act stage
+    fans the diagnosis out to. Pods matched by a triage rule skip collection
+    and analysis.
+
+    With a ShardCoordinator the pipeline only scans the namespaces it owns
+    and claims each workload before remediating it (see sharding.py).
+    With dry_run remediation is only reported, never applied.
+    """
+
+    def __init__(self, scan_interval=SCAN_INTERVAL, collect_workers=COLLECT_WORKERS,
+                 analyze_workers=ANALYZE_WORKERS, act_workers=ACT_WORKERS, queue_size=QUEUE_SIZE, shard=None, dry_run=False):
+        self.scan_interval = scan_interval
+        self.shard = shard
+        # Set explicitly rather than left to main.DRY_RUN, which only looks at sys.argv
+        steps.get_executor().dry_run = dry_run
+        if shard is not None:
+            steps.get_executor().guard = shard.claim_workload
+        self.triage = TriageEngine.load()
+        self._in_flight = {}
+        self.grouped = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.act = Stage("act", self._act, act_workers, queue_size, on_done=self._finish)
+        self.analyze = Stage("analyze", self._analyze, analyze_workers, queue_size,
+                             downstream=self.act, on_done=self._finish)
+        self.collect = Stage("collect", self._collect, collect_workers, queue_size,
+                             downstream=self.analyze, on_done=self._finish)
+        self.stages = (self.collect, self.analyze, self.act)
+
+    def _finish(self, item):
+        with self._lock:
+            self._in_flight.pop(item["key"], None)
+
+    def _collect(self, item):
+        item["info"] = steps.collect_info(item["name"], item["namespace"], item.get("description"), item["pod"])
+        return item
+
+    def _analyze(self, item):
+        item["action"] = steps.query_gemma(item["info"], item["name"], item["namespace"])
+        return item
+
+    def _act(self, item):
+        with self._lock:
+            members = list(item["members"].values())
+        logging.info(
+            f"Acting on {item['namespace']}/{item['name']} and {len(members)} group members: "
+            f"{item['action'].get('action')}"
+        )
+        steps.take_action(item["action"], item["pod"], members)
+        return None
+
+    def _flush_actions(self, force=False):
+        """Apply coalesced remediation whose window has passed"""
+        try:
+            for outcome in steps.get_executor().flush(force):
+                logging.info(describe_outcome(outcome))
+        except Exception as e:
+            logging.error(f"Remediation flush failed: {e}")
+
+    def _scan_unhealthy(self):
+        if self.shard is None:
+            yield from scan_unhealthy()
+            return
+        owned = self.shard.owned_namespaces(get_backend().list_namespaces())
+        if len(owned) > SCOPED_SCAN_MAX:
+            owned = set(owned)
+            yield from (found for found in scan_unhealthy() if found[0].namespace in owned)
+            return
+        for namespace in owned:
+            yield from scan_unhealthy(namespace=namespace)
+
+    def scan_once(self):
+        """Queue one item per unhealthy workload group that is not already being handled"""
+        queued = 0
+        events = None  # listed once per scan, the first time a pod needs describing
+        for snapshot, verdict in self._scan_unhealthy():
+            if self._stop.is_set():
+                break
+            pod = snapshot.to_pod()
+            key = failure_group_key(pod, verdict.reason)
+            with self._lock:
+                item = self._in_flight.get(key)
+                if item is not None:
+                    if pod_key(pod) != pod_key(item["pod"]) and pod_key(pod) not in item["members"]:
+                        item["members"][pod_key(pod)] = pod
+                        self.grouped += 1
+                    continue
+                item = {"key": key, "name": snapshot.name, "namespace": snapshot.namespace, "pod": pod, "members": {}}
+                self._in_flight[key] = item
+
+            action_json = self.triage.evaluate(pod)
+            if action_json is not None:
+                item["action"] = action_json
+                self.act.put(item)
+            else:
+                if events is None:
+                    events = load_event_index() or False
+                if events:
+                    item["description"] = events.describe(pod)
+                self.collect.put(item)
+            queued += 1
+        return queued
+
+    def _scan_loop(self):
+        while not self._stop.is_set():
+            try:
+                queued = self.scan_once()
+                logging.info(
+                    f"Scan queued {queued} pods ("
+                    + ", ".join(f"{s.name}: {s.queue.qsize()} waiting" for s in self.stages) + ")"
+                )
+            except Exception as e:
+                logging.error(f"Scan failed: {e}")
+            self._stop.wait(self.scan_interval)
+
+    def stop(self, *_):
+        if not self._stop.is_set():
+            logging.info("Shutdown requested, draining in-flight work...")
+        self._stop.set()
+
+    def run(self, drain_timeout=DRAIN_TIMEOUT):
+        """Run until SIGTERM/SIGINT, then drain every stage in order"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        start_http_server()
+
+        for stage in self.stages:
+            stage.start()
+        scanner = threading.Thread(target=self._scan_loop, name="scan", daemon=True)
+        scanner.start()
+
+        # Signal handlers only run on the main thread, so wait here rather than in join()
+        while not self._stop.is_set():
+            self._stop.wait(1)
+            self._flush_actions()
+
+        deadline = time.monotonic() + drain_timeout
+        scanner.join(max(0, deadline - time.monotonic()))
+        for stage in self.stages:
+            if not stage.close(deadline):
+                logging.warning(f"Drain timed out in {stage.name}, abandoning {len(self._in_flight)} groups")
+                break
+
+        self._flush_actions(force=True)
+        if self.shard is not None:
+            self.shard.stop()
+        for stage in self.stages:
+            logging.info(f"{stage.name}: {stage.processed} done, {stage.failed} failed")
+        logging.info(f"{self.grouped} pods joined an in-flight group instead of being analyzed separately")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously scan, diagnose and remediate unhealthy pods")
+    parser.add_argument("--leases", help="shard namespaces across replicas: memory, file:<path> or kubernetes[:<namespace>]")
+    parser.add_argument("--replica-id", help="this replica's name in the shard ring (default $POD_NAME or host-pid)")
+    parser.add_argument("--dry-run", action="store_true", help="report remediation without applying it")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    shard = None
+    if args.leases:
+        shard = ShardCoordinator(make_lease_backend(args.leases), args.replica_id).start()
+        logging.info(f"Running as shard replica {shard.replica_id}")
+    Pipeline(shard=shard, dry_run=args.dry_run).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from collections import namedtuple
+
+# Severities, from least to most urgent
+OK = "ok"
+WARNING = "warning"
+CRITICAL = "critical"
+
+# Waiting reasons that never resolve on their own
+FAILING_WAIT_REASONS = frozenset([
+    "CrashLoopBackOff", "ErrImagePull", "ImagePullBackOff", "InvalidImageName",
+    "RunContainerError", "CreateContainerConfigError", "CreateContainerError",
+])
+FAILED_PHASES = frozenset(["Failed", "Unknown"])
+
+Verdict = namedtuple("Verdict", ["severity", "reason", "container", "message"])
+HEALTHY = Verdict(OK, "", None, "")
+
+
+def _container_verdict(statuses, phase, init):
+    """Return the first failing container verdict in a list of container statuses"""
+    warning = None
+    for cs in statuses:
+        if cs.get("ready", True):
+            continue
+        state = cs.get("state")
+        if not state:
+            continue
+        waiting = state.get("waiting")
+        if waiting is not None:
+            reason = waiting.get("reason", "")
+            if reason in FAILING_WAIT_REASONS:
+                return Verdict(CRITICAL, reason, cs.get("name"), waiting.get("message", ""))
+            if phase == "Running" and warning is None and not init:
+                warning = Verdict(WARNING, reason or "Waiting", cs.get("name"), waiting.get("message", ""))
+            continue
+        terminated = state.get("terminated")
+        if terminated is not None:
+            exit_code = terminated.get("exitCode", 0)
+            if exit_code != 0:
+                return Verdict(CRITICAL, terminated.get("reason") or f"ExitCode{exit_code}", cs.get("name"),
+                               terminated.get("message", f"exit code {exit_code}"))
+            if phase == "Running" and warning is None and not init:
+                warning = Verdict(WARNING, terminated.get("reason") or "Terminated", cs.get("name"), "")
+    return warning
+
+
+def classify_status(status):
+    """Classify a pod status dict into a Verdict"""
+    phase = status.get("phase", "")
+    if phase == "Succeeded":
+        return HEALTHY
+    if phase in FAILED_PHASES:
+        return Verdict(CRITICAL, status.get("reason") or phase, None, status.get("message", ""))
+
+    init_statuses = status.get("initContainerStatuses")
+    if init_statuses:
+        verdict = _container_verdict(init_statuses, phase, True)
+        if verdict is not None and verdict.severity == CRITICAL:
+            return verdict
+
+    statuses = status.get("containerStatuses")
+    warning = None
+    if statuses:
+        verdict = _container_verdict(statuses, phase, False)
+        if verdict is not None:
+            if verdict.severity == CRITICAL:
+                return verdict
+            warning = verdict
+
+    if phase == "Pending":
+        for condition in status.get("conditions") or ():
+            if condition.get("type") == "PodScheduled" and condition.get("status") == "False":
+                return Verdict(WARNING, condition.get("reason") or "Unschedulable", None, condition.get("message", ""))
+
+    return warning or HEALTHY
+
+
+def classify(pod):
+    """Classify a pod (as returned by the API) into a Verdict"""
+    status = pod.get("status")
+    if not status:
+        return HEALTHY
+    return classify_status(status)
+
+
+def is_pod_unhealthy(pod):
+    return classify(pod).severity != OK
@@ -0,0 +1,191 @@
+import json
+import subprocess
+import time
+
+from k8s_backend import KubeError, KubectlBackend, get_backend
+from pod_health import classify_status, OK
+from metrics import POD_LIST_SECONDS, UNHEALTHY_PODS
+
+# Configuration
+# Completed pods can never be unhealthy, so the API server drops them for us
+FIELD_SELECTOR = "status.phase!=Succeeded"
+SCAN_TIMEOUT = 120  # seconds for a full projected scan
+
+# One tab-separated line per pod with only the fields the classifier and the
+# fingerprint need. kubectl prints nested objects in jsonpath output as JSON;
+# free-text fields such as status.message are left out since they may contain
+# newlines.
+PROJECTION_FIELDS = (
+    ".metadata.namespace",
+    ".metadata.name",
+    ".metadata.uid",
+    ".metadata.creationTimestamp",
+    ".metadata.ownerReferences",
+    ".metadata.labels.pod-template-hash",
+    ".status.phase",
+    ".status.reason",
+    ".status.conditions",
+    ".status.initContainerStatuses",
+    ".status.containerStatuses",
+)
+PROJECTION_TEMPLATE = (
+    "{range .items[*]}"
+    + '{"\\t"}'.join("{" + field + "}" for field in PROJECTION_FIELDS)
+    + '{"\\n"}{end}'
+)
+
+# Container status keys kept in a snapshot; image ids, container ids etc. are dropped
+CONTAINER_KEYS = ("name", "ready", "restartCount", "state", "lastState")
+# Condition keys kept; the transition time tells the scheduler how long a pod has been stuck
+CONDITION_KEYS = ("type", "status", "reason", "message", "lastTransitionTime")
+
+
+def _json_field(text):
+    return json.loads(text) if text else None
+
+
+def _compact_conditions(conditions):
+    if not conditions:
+        return None
+    return [{key: c[key] for key in CONDITION_KEYS if key in c} for c in conditions]
+
+
+def _compact_containers(statuses):
+    if not statuses:
+        return None
+    return [{key: cs[key] for key in CONTAINER_KEYS if key in cs} for cs in statuses]
+
+
+class PodSnapshot:
+    """The few pod fields a scan needs, without the rest of the pod object"""
+
+    __slots__ = ("namespace", "name", "uid", "created", "owner_kind", "owner_name", "template_hash", "status")
+
+    def __init__(self, namespace, name, uid, created, owner_kind, owner_name, template_hash, status):
+        self.namespace = namespace
+        self.name = name
+        self.uid = uid
+        self.created = created
+        self.owner_kind = owner_kind
+        self.owner_name = owner_name
+        self.template_hash = template_hash
+        self.status = status
+
+    @classmethod
+    def from_line(cls, line):
+        """Parse one line of PROJECTION_TEMPLATE output"""
+        (namespace, name, uid, created, owners, template_hash, phase, reason,
+         conditions, init_statuses, statuses) = line.rstrip("\n").split("\t")
+
+        owner_kind = owner_name = None
+        owners = _json_field(owners)
+        if owners:
+            owner = next((o for o in owners if o.get("controller")), owners[0])
+            owner_kind, owner_name = owner.get("kind"), owner.get("name")
+
+        status = {"phase": phase}
+        if reason:
+            status["reason"] = reason
+        conditions = _compact_conditions(_json_field(conditions))
+        if conditions:
+            status["conditions"] = conditions
+        init_statuses = _compact_containers(_json_field(init_statuses))
+        if init_statuses:
+            status["initContainerStatuses"] = init_statuses
+        statuses = _compact_containers(_json_field(statuses))
+        if statuses:
+            status["containerStatuses"] = statuses
+
+        return cls(namespace, name, uid, created or None, owner_kind, owner_name, template_hash or None, status)
+
+    @classmethod
+    def from_pod(cls, pod):
+        """Build a snapshot from a full API pod object"""
+        metadata = pod.get("metadata", {})
+        source = pod.get("status", {})
+        owner_kind = owner_name = None
+        owners = metadata.get("ownerReferences")
+        if owners:
+            owner = next((o for o in owners if o.get("controller")), owners[0])
+            owner_kind, owner_name = owner.get("kind"), owner.get("name")
+
+        status = {"phase": source.get("phase", "")}
+        if source.get("reason"):
+            status["reason"] = source["reason"]
+        conditions = _compact_conditions(source.get("conditions"))
+        if conditions:
+            status["conditions"] = conditions
+        for key in ("initContainerStatuses", "containerStatuses"):
+            statuses = _compact_containers(source.get(key))
+            if statuses:
+                status[key] = statuses
+
+        template_hash = (metadata.get("labels") or {}).get("pod-template-hash")
+        return cls(metadata.get("namespace"), metadata.get("name"), metadata.get("uid"),
+                   metadata.get("creationTimestamp"), owner_kind, owner_name, template_hash, status)
+
+    def to_pod(self):
+        """Rebuild a minimal pod dict for code that expects API objects"""
+        metadata = {"namespace": self.namespace, "name": self.name, "uid": self.uid}
+        if self.created:
+            metadata["creationTimestamp"] = self.created
+        if self.owner_kind:
+            metadata["ownerReferences"] = [{"kind": self.owner_kind, "name": self.owner_name, "controller": True}]
+        if self.template_hash:
+            metadata["labels"] = {"pod-template-hash": self.template_hash}
+        return {"metadata": metadata, "status": self.status}
+
+
+def parse_projected(lines):
+    """Yield a PodSnapshot for every non-empty projected line"""
+    for line in lines:
+        if line.strip():
+            yield PodSnapshot.from_line(line)
+
+
+def scan_pods(field_selector=FIELD_SELECTOR, timeout=SCAN_TIMEOUT, backend=None, namespace=None):
+    """Stream PodSnapshots for every pod in the cluster (or namespace) matching field_selector.
+
+    With the API backend pods are listed page by page; with kubectl its
+    jsonpath output is read line by line. Either way the full pod list is
+    never held in memory at once.
+    """
+    backend = backend or get_backend()
+    if not isinstance(backend, KubectlBackend):
+        for pod in backend.iter_pods(field_selector, timeout=timeout, namespace=namespace):
+            yield PodSnapshot.from_pod(pod)
+        return
+
+    scope = ["--namespace", namespace] if namespace else ["--all-namespaces"]
+    command = backend.command("get", "pods", *scope, "-o", f"jsonpath={PROJECTION_TEMPLATE}")
+    if field_selector:
+        command += ["--field-selector", field_selector]
+    command += ["--request-timeout", f"{timeout}s"]
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    # Time kubectl and parsing, not the caller's work between snapshots
+    elapsed = 0.0
+    try:
+        start = time.monotonic()
+        for snapshot in parse_projected(process.stdout):
+            elapsed += time.monotonic() - start
+            yield snapshot
+            start = time.monotonic()
+        elapsed += time.monotonic() - start
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+    if returncode != 0:
+        raise KubeError(f"kubectl get pods failed: {stderr.strip()}")
+    POD_LIST_SECONDS.observe(elapsed, backend=backend.name)
+
+
+def scan_unhealthy(field_selector=FIELD_SELECTOR, timeout=SCAN_TIMEOUT, backend=None, namespace=None):
+    """Yield (snapshot, verdict) for every unhealthy pod"""
+    for snapshot in scan_pods(field_selector, timeout, backend, namespace):
+        verdict = classify_status(snapshot.status)
+        if verdict.severity != OK:
+            UNHEALTHY_PODS.inc(reason=verdict.reason)
+            yield snapshot, verdict
@@ -0,0 +1,138 @@
+import json
+import time
+import logging
+from urllib.parse import quote
+
+from k8s_backend import KubeError, get_backend
+
+# Configuration
+LIST_CHUNK_SIZE = 500      # pods per page when (re)listing
+WATCH_TIMEOUT = 300        # seconds before the API server closes a watch
+RETRY_DELAY = 5            # seconds to wait after a failed list/watch
+
+PODS_PATH = "/api/v1/pods"
+
+
+class WatchExpired(Exception):
+    """The resourceVersion we were watching from is too old (410 Gone)"""
+
+
+def pod_key(pod):
+    """Stable cache key for a pod"""
+    metadata = pod.get("metadata", {})
+    return metadata.get("uid") or f"{metadata.get('namespace')}/{metadata.get('name')}"
+
+
+class PodWatcher:
+    """Keep a local pod cache in sync with the cluster using list + watch.
+
+    The cluster is listed once, then changes are streamed from the list's
+    resourceVersion. Only pods that actually changed are handed back to the
+    caller. When the watch expires the cache is rebuilt with a fresh list.
+    on_delete(pod), if given, is called for every pod that disappears,
+    whether seen as a DELETED event or missing from a relist.
+    """
+
+    def __init__(self, chunk_size=LIST_CHUNK_SIZE, watch_timeout=WATCH_TIMEOUT, backend=None, on_delete=None):
+        self.chunk_size = chunk_size
+        self.watch_timeout = watch_timeout
+        self.backend = backend or get_backend()
+        self.on_delete = on_delete
+        self.pods = {}
+        self.resource_version = None
+
+    def relist(self):
+        """List every pod, replace the cache and return the pods that changed"""
+        items = []
+        continue_token = ""
+        resource_version = None
+        while True:
+            path = f"{PODS_PATH}?limit={self.chunk_size}"
+            if continue_token:
+                path += f"&continue={quote(continue_token)}"
+            page = self.backend.raw_get(path)
+            items.extend(page.get("items", []))
+            metadata = page.get("metadata", {})
+            if resource_version is None:
+                resource_version = metadata.get("resourceVersion")
+            continue_token = metadata.get("continue")
+            if not continue_token:
+                break
+
+        fresh = {}
+        changed = []
+        for pod in items:
+            key = pod_key(pod)
+            fresh[key] = pod
+            cached = self.pods.get(key)
+            if cached is None or cached["metadata"].get("resourceVersion") != pod["metadata"].get("resourceVersion"):
+                changed.append(pod)
+
+        removed = [self.pods[key] for key in self.pods.keys() - fresh.keys()]
+        self.pods = fresh
+        if self.on_delete is not None:
+            for pod in removed:
+                self.on_delete(pod)
+        self.resource_version = resource_version
+        logging.info(
+            f"Listed {len(items)} pods at resourceVersion {resource_version} "
+            f"({len(changed)} changed, {len(removed)} removed)"
+        )
+        return changed
+
+    def _apply(self, event):
+        """Apply one watch event to the cache and return the pod if it changed"""
+        event_type = event.get("type")
+        obj = event.get("object", {})
+
+        if event_type == "ERROR":
+            if obj.get("code") == 410:
+                raise WatchExpired(obj.get("message", "resourceVersion expired"))
+            raise KubeError(f"Watch error: {obj.get('message', obj)}")
+
+        rv = obj.get("metadata", {}).get("resourceVersion")
+        if rv:
+            self.resource_version = rv
+
+        if event_type == "BOOKMARK":
+            return None
+        if event_type == "DELETED":
+            self.pods.pop(pod_key(obj), None)
+            if self.on_delete is not None:
+                self.on_delete(obj)
+            return None
+
+        self.pods[pod_key(obj)] = obj
+        return obj
+
+    def watch(self):
+        """Stream changed pods from the last seen resourceVersion until the watch closes"""
+        path = (
+            f"{PODS_PATH}?watch=1&allowWatchBookmarks=true"
+            f"&resourceVersion={self.resource_version}"
+            f"&timeoutSeconds={self.watch_timeout}"
+        )
+        # The server ends the watch after watch_timeout; allow some slack on our side
+        for line in self.backend.raw_stream(path, timeout=self.watch_timeout + 30):
+            line = line.strip()
+            if not line:
+                continue
+            pod = self._apply(json.loads(line))
+            if pod is not None:
+                yield pod
+
+    def stream(self):
+        """Yield every pod that is new or changed, forever"""
+        while True:
+            try:
+                if self.resource_version is None:
+                    yield from self.relist()
+                yield from self.watch()
+                logging.debug(f"Watch closed at resourceVersion {self.resource_version}, resuming")
+            except WatchExpired as e:
+                logging.info(f"Watch expired ({e}), relisting pods")
+                self.resource_version = None
+            except (KubeError, json.JSONDecodeError) as e:
+                logging.error(f"Pod watch failed: {e}")
+                self.resource_version = None
+                time.sleep(RETRY_DELAY)
@@ -0,0 +1,109 @@
+"""Prompts that fit the model's context and keep Ollama's prompt cache warm.
+
+Ollama keeps the KV cache of the previous prompt and only evaluates what
+differs from it, so every template here starts with the same instructions
+and puts everything specific to a pod (name, status, logs, description)
+last. Sections are cut to a token budget derived from the model's context
+window, and every request carries the same num_ctx: a different num_ctx
+makes Ollama reload the model, which throws the cache away.
+"""
+import logging
+import os
+
+from metrics import LLM_PROMPT_TOKENS
+
+# Configuration
+CONTEXT_WINDOWS = {         # tokens the models we run were trained for
+    "gemma:2b": 8192,
+    "gemma:7b": 8192,
+    "gemma2:2b": 8192,
+    "llama3": 8192,
+}
+DEFAULT_CONTEXT = 2048      # Ollama's own default, for models not listed above
+NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", "0"))   # overrides the table when set
+CHARS_PER_TOKEN = 3         # conservative estimate; logs tokenize worse than prose
+RESPONSE_TOKENS = 1024      # kept free for the answer
+MAX_PROMPT_TOKENS = 4096    # prompts are capped here even when the window is larger
+MARKER_BYTES = 32           # kept free for the "[... N more lines ...]" note head() adds
+
+
+def context_window(model):
+    if NUM_CTX:
+        return NUM_CTX
+    return CONTEXT_WINDOWS.get(model, CONTEXT_WINDOWS.get(model.split(":")[0], DEFAULT_CONTEXT))
+
+
+def estimate_tokens(text):
+    return -(-len(text.encode("utf-8")) // CHARS_PER_TOKEN)
+
+
+def head(text, budget):
+    """The start of text within budget bytes, cut at a line boundary where possible"""
+    data = text.encode("utf-8")
+    if len(data) <= budget:
+        return text
+    kept = data[:max(0, budget - MARKER_BYTES)].decode("utf-8", "ignore")
+    if "\n" in kept:
+        kept = kept[:kept.rindex("\n")]
+    return f"{kept}\n[... {text.count(chr(10)) - kept.count(chr(10))} more lines ...]"
+
+
+def _allocate(sizes, budget):
+    """Split budget over sections: ones within an equal share keep all they need, the rest split what is left"""
+    allocation = [0] * len(sizes)
+    pending = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    while pending:
+        share = budget // len(pending)
+        if sizes[pending[0]] > share:
+            for i in pending:
+                allocation[i] = share
+            break
+        i = pending.pop(0)
+        allocation[i] = sizes[i]
+        budget -= sizes[i]
+    return allocation
+
+
+class PromptTemplate:
+    """A fixed instruction prefix followed by per-pod sections cut to fit.
+
+    render() takes (title, text[, limit[, cut]]) sections and an optional
+    closing line that does not vary between pods. limit is an optional cap
+    in bytes; cut(text, budget) shortens a section that does not fit. It
+    defaults to head(), which keeps the start (a description's status comes
+    first); pass log_excerpt.excerpt for logs, which keeps the lines around
+    errors and the end.
+    """
+
+    def __init__(self, name, instructions, model, num_ctx=None, response_tokens=RESPONSE_TOKENS,
+                 max_prompt_tokens=MAX_PROMPT_TOKENS):
+        self.name = name
+        self.prefix = instructions.strip() + "\n"
+        self.model = model
+        self.num_ctx = num_ctx or context_window(model)
+        self.budget = min(max_prompt_tokens, self.num_ctx - response_tokens)
+
+    def options(self):
+        """Ollama options to send with every request built from this template"""
+        return {"options": {"num_ctx": self.num_ctx}}
+
+    def render(self, sections, closing=""):
+        sections = [(s[0], s[1] or "", s[2] if len(s) > 2 else None, s[3] if len(s) > 3 else head)
+                    for s in sections]
+        texts = [text if limit is None else cut(text, limit) for _, text, limit, cut in sections]
+        headers = [f"\n--- {title} ---\n" for title, _, _, _ in sections]
+        closing = f"\n{closing.strip()}\n" if closing else ""
+
+        fixed = estimate_tokens(self.prefix + "".join(headers) + closing)
+        sizes = [estimate_tokens(text) for text in texts]
+        allocation = _allocate(sizes, max(0, self.budget - fixed))
+        for i, (size, tokens) in enumerate(zip(sizes, allocation)):
+            if size > tokens:
+                texts[i] = sections[i][3](texts[i], tokens * CHARS_PER_TOKEN) if tokens else "[omitted]"
+                logging.debug(f"{self.name}: cut {sections[i][0]} from ~{size} to ~{tokens} tokens")
+
+        prompt = self.prefix + "".join(h + t.rstrip() + "\n" for h, t in zip(headers, texts)) + closing
+        tokens = estimate_tokens(prompt)
+        LLM_PROMPT_TOKENS.observe(tokens, model=self.model, template=self.name)
+        logging.debug(f"{self.name}: ~{tokens} prompt tokens, num_ctx {self.num_ctx}")
+        return prompt
@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from k8s_backend import KubeError, get_backend
+from workloads import owning_workload
+
+# Configuration
+OWNER_MAP_TTL = 300          # seconds before the ReplicaSet -> Deployment map is rebuilt
+COALESCE_WINDOW = 30         # seconds to gather actions for one workload before acting
+WORKLOAD_COOLDOWN = 15 * 60  # seconds between two actions on the same workload
+RATE_LIMIT = 10              # actions per RATE_PERIOD across the whole cluster
+RATE_PERIOD = 60             # seconds
+STATE_FILE = "remediation_state.json"
+
+# Workloads `rollout restart` understands; anything else restarts by deleting pods
+RESTARTABLE_KINDS = ("Deployment", "StatefulSet", "DaemonSet")
+
+ADVICE = {
+    "revert_image": "🔙 Action 'revert_image' not automated. Consider using 'kubectl rollout undo'.",
+    "increase_resources": "📈 Action 'increase_resources': Adjust resources in deployment YAML.",
+    "check_config": "🔍 Action 'check_config': Check config maps, environment vars, or secrets.",
+}
+
+
+class OwnerResolver:
+    """Resolve pods to their owning workload from one bulk ReplicaSet list.
+
+    The (namespace, ReplicaSet) -> (kind, name) map is rebuilt at most every
+    ttl seconds, or sooner when a pod names a ReplicaSet the map has not
+    seen yet. When the list fails the pod-template-hash heuristic is used.
+    """
+
+    def __init__(self, backend=None, ttl=OWNER_MAP_TTL):
+        self.backend = backend or get_backend()
+        self.ttl = ttl
+        self.owners = {}
+        self.loaded_at = 0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        owners = {}
+        for rs in self.backend.list_replicasets():
+            metadata = rs.get("metadata", {})
+            refs = metadata.get("ownerReferences") or []
+            owner = next((o for o in refs if o.get("controller")), refs[0] if refs else None)
+            key = (metadata.get("namespace"), metadata.get("name"))
+            owners[key] = (owner["kind"], owner["name"]) if owner else ("ReplicaSet", metadata.get("name"))
+        self.owners = owners
+        self.loaded_at = time.monotonic()
+        logging.info(f"Loaded owners of {len(owners)} ReplicaSets")
+
+    def _lookup(self, key):
+        with self._lock:
+            stale = time.monotonic() - self.loaded_at > self.ttl
+            # A brand new ReplicaSet is only worth one early refresh per 10 seconds
+            missing = key not in self.owners and time.monotonic() - self.loaded_at > 10
+            if stale or missing:
+                try:
+                    self.refresh()
+                except KubeError as e:
+                    logging.warning(f"Could not list ReplicaSets: {e}")
+                    self.loaded_at = time.monotonic()
+            return self.owners.get(key)
+
+    def resolve(self, pod):
+        """Return (kind, name) of the workload to act on for a pod dict"""
+        metadata = pod.get("metadata", {})
+        refs = metadata.get("ownerReferences") or []
+        owner = next((o for o in refs if o.get("controller")), refs[0] if refs else None)
+        if owner and owner.get("kind") == "ReplicaSet":
+            resolved = self._lookup((metadata.get("namespace"), owner.get("name")))
+            if resolved:
+                return resolved
+        return owning_workload(pod)
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` actions per `period` seconds"""
+
+    def __init__(self, rate=RATE_LIMIT, period=RATE_PERIOD):
+        self.rate = rate
+        self.period = period
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.period)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def release(self):
+        """Give back a token whose action was not taken after all"""
+        with self._lock:
+            self.tokens = min(self.rate, self.tokens + 1)
+
+
+class RemediationExecutor:
+    """Coalesce remediation per owning workload, with cooldowns and a global rate limit.
+
+    submit() only records the request. flush() acts once per workload whose
+    coalescing window has passed: one rollout restart for ten failing
+    replicas, not ten. Last-action times are kept in STATE_FILE so cooldowns
+    survive between runs.
+
+    guard(namespace, kind, name, ttl), when set, must return True before a
+    restart is applied; sharded replicas use it to claim the workload.
+    """
+
+    def __init__(self, backend=None, dry_run=False, window=COALESCE_WINDOW, cooldown=WORKLOAD_COOLDOWN,
+                 limiter=None, state_file=STATE_FILE, guard=None):
+        self.backend = backend or get_backend()
+        self.resolver = OwnerResolver(self.backend)
+        self.dry_run = dry_run
+        self.window = window
+        self.cooldown = cooldown
+        self.limiter = limiter or RateLimiter()
+        self.state_file = state_file
+        self.guard = guard
+        self.pending = {}
+        self.last_action = self._load_state()
+        self._lock = threading.Lock()
+
+    def _load_state(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable remediation state {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self):
+        if not self.state_file or self.dry_run:
+            return
+        cutoff = time.time() - self.cooldown
+        state = {key: ts for key, ts in self.last_action.items() if ts >= cutoff}
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_file)
+
+    def submit(self, action_json, pod=None):
+        """Queue an action for the pod's workload and return the workload key"""
+        if pod is None:
+            pod = self.backend.get_pod(action_json["namespace"], action_json["pod"])
+        # The pod object is authoritative; the model only echoes these back
+        namespace = pod["metadata"]["namespace"]
+        pod_name = pod["metadata"]["name"]
+        kind, name = self.resolver.resolve(pod)
+        key = f"{namespace}/{kind}/{name}/{action_json['action']}"
+        with self._lock:
+            group = self.pending.setdefault(key, {
+                "namespace": namespace, "kind": kind, "name": name,
+                "action": action_json["action"], "pods": [], "since": time.monotonic(),
+            })
+            if pod_name not in group["pods"]:
+                group["pods"].append(pod_name)
+        return key
+
+    def flush(self, force=False):
+        """Act on every group whose window has passed (all of them if force).
+
+        Returns one outcome dict per group with a "result" of done, dry_run,
+        cooldown, not_owner, rate_limited, dropped, advice or failed.
+        Rate-limited groups are retried on the next flush; on a forced flush
+        there is no next one, so they are reported as dropped.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = [key for key, group in self.pending.items() if force or now - group["since"] >= self.window]
+            groups = [(key, self.pending.pop(key)) for key in due]
+
+        outcomes = []
+        for key, group in groups:
+            outcome = dict(group, pods=list(group["pods"]))
+            outcome.pop("since")
+            outcome["result"] = self._execute(key, group)
+            if outcome["result"] == "rate_limited":
+                if force:
+                    outcome["result"] = "dropped"
+                else:
+                    # Try again on the next flush instead of dropping the action
+                    with self._lock:
+                        self.pending.setdefault(key, group)
+            outcomes.append(outcome)
+        if outcomes:
+            self._save_state()
+        return outcomes
+
+    def _execute(self, key, group):
+        action = group["action"]
+        if action != "restart":
+            return "advice" if action in ADVICE else "unknown"
+
+        last = self.last_action.get(key)
+        if last is not None and time.time() - last < self.cooldown:
+            return "cooldown"
+        # Rate limit first, so a deferred group does not hold the workload's lease
+        if not self.limiter.acquire():
+            return "rate_limited"
+        if self.guard is not None and not self.guard(group["namespace"], group["kind"], group["name"], self.cooldown):
+            self.limiter.release()
+            return "not_owner"
+        if self.dry_run:
+            return "dry_run"
+
+        try:
+            if group["kind"] in RESTARTABLE_KINDS:
+                self.backend.rollout_restart(group["namespace"], group["kind"], group["name"])
+            else:
+                for pod_name in group["pods"]:
+                    self.backend.delete_pod(group["namespace"], pod_name)
+        except KubeError as e:
+            logging.error(f"Remediation of {key} failed: {e}")
+            return "failed"
+        self.last_action[key] = time.time()
+        return "done"
+
+
+def describe_outcome(outcome):
+    """One line for a flush() outcome, in the same voice as main.take_action"""
+    workload = f"{outcome['kind']}/{outcome['name']}"
+    target = f"{workload} in {outcome['namespace']} ({len(outcome['pods'])} pods)"
+    result = outcome["result"]
+    restart = outcome["kind"] in RESTARTABLE_KINDS
+    if result == "advice":
+        return f"{ADVICE[outcome['action']]} [{target}]"
+    if result == "unknown":
+        return f"⚠️ Unknown action '{outcome['action']}' for {target}. No operation performed."
+    if result == "cooldown":
+        return f"⏳ Skipping {outcome['action']} of {target}: acted on it less than {WORKLOAD_COOLDOWN // 60} min ago"
+    if result == "not_owner":
+        return f"🤝 Skipping {outcome['action']} of {target}: another replica is handling it"
+    if result == "rate_limited":
+        return f"🚦 Deferring {outcome['action']} of {target}: remediation rate limit reached"
+    if result == "dropped":
+        return f"🚦 Dropping {outcome['action']} of {target}: remediation rate limit reached before exit"
+    if result == "failed":
+        return f"🚫 Could not {outcome['action']} {target}"
+    verb = "rollout restart" if restart else "delete pods of"
+    if result == "dry_run":
+        return f"🧪 Dry run: would {verb} {target}"
+    return f"🔁 Restarted {target}" if restart else f"🗑️ Deleted {', '.join(outcome['pods'])} ({workload})"
@@ -0,0 +1,211 @@
+import heapq
+import logging
+import random
+import time
+from datetime import datetime
+
+from k8s_backend import KubeError
+from pod_health import classify
+from pod_watch import pod_key
+
+# Configuration
+SCAN_INTERVAL = 60       # seconds between full scans to start from
+MIN_INTERVAL = 10        # fastest full scans get while new failures keep appearing
+MAX_INTERVAL = 300       # slowest full scans get while the cluster is quiet
+BACKOFF_FACTOR = 1.5     # interval growth per quiet scan
+JITTER = 0.2             # +/- fraction applied to every delay
+MAX_BACKOFF = 600        # ceiling for retries after failed scans
+MIN_RECHECK = 5          # re-checks never come sooner than this
+MAX_RECHECK = 300        # nor later than this
+RECHECK_SLACK = 5        # seconds after the expected restart to look again
+
+# kubelet's CrashLoopBackOff: 10s, doubling per restart, capped at 5 minutes
+CRASHLOOP_BASE = 10
+CRASHLOOP_MAX = 300
+
+
+def _jitter(delay, fraction=JITTER):
+    return delay * random.uniform(1 - fraction, 1 + fraction)
+
+
+def _timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _clamp(delay):
+    return max(MIN_RECHECK, min(MAX_RECHECK, delay))
+
+
+def failure_signature(pod):
+    """What has to change about a failing pod for it to be worth looking at again"""
+    status = pod.get("status") or {}
+    restarts = sum(cs.get("restartCount", 0) for cs in status.get("containerStatuses") or ())
+    return classify(pod).reason, status.get("phase"), restarts
+
+
+def recheck_delay(pod, now=None):
+    """Seconds until a failing pod is likely to look different, or None.
+
+    CrashLoopBackOff pods are due just after kubelet's next restart attempt,
+    computed from the restart count and when the container last exited.
+    Pending pods are checked sooner while young and less often as they age;
+    without any timestamp to tell their age they are left to the full scan.
+    """
+    now = now or time.time()
+    status = pod.get("status") or {}
+
+    for cs in status.get("containerStatuses") or ():
+        waiting = (cs.get("state") or {}).get("waiting") or {}
+        if waiting.get("reason") != "CrashLoopBackOff":
+            continue
+        backoff = min(CRASHLOOP_BASE * 2 ** max(cs.get("restartCount", 1) - 1, 0), CRASHLOOP_MAX)
+        finished = _timestamp(((cs.get("lastState") or {}).get("terminated") or {}).get("finishedAt"))
+        if finished is None:
+            return _clamp(backoff)
+        return _clamp(finished + backoff + RECHECK_SLACK - now)
+
+    if status.get("phase") == "Pending":
+        times = [_timestamp(pod.get("metadata", {}).get("creationTimestamp"))]
+        times += [_timestamp(c.get("lastTransitionTime")) for c in status.get("conditions") or ()]
+        times = [t for t in times if t is not None]
+        if not times:
+            return None
+        return _clamp((now - min(times)) / 2)
+
+    return None
+
+
+class ScanScheduler:
+    """Decide when to scan the cluster next and which pods to re-check before then.
+
+    Full scans speed up (down to MIN_INTERVAL) when a scan finds pods that
+    were not failing before, and back off (up to MAX_INTERVAL) while the set
+    of failures is stable. Failed scans retry with exponential backoff.
+    Failing pods are kept in a priority queue ordered by recheck_delay, so
+    a crash-looping pod is looked at right after its next restart instead
+    of on the next full scan.
+    """
+
+    def __init__(self, interval=SCAN_INTERVAL, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.base_interval = interval
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.failures = 0
+        self.next_scan = time.monotonic()
+        self.known = {}       # pod key -> failure_signature
+        self.pods = {}        # pod key -> (due, pod) for scheduled re-checks
+        self._queue = []      # (due, seq, pod key); stale entries are skipped
+        self._seq = 0
+
+    def scan_due(self):
+        return time.monotonic() >= self.next_scan
+
+    def scan_finished(self, unhealthy):
+        """Record a successful scan; returns the pods that were not failing before"""
+        current = {pod_key(pod): pod for pod in unhealthy}
+        new = [pod for key, pod in current.items() if key not in self.known]
+
+        if new:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * BACKOFF_FACTOR)
+        self.failures = 0
+        self.next_scan = time.monotonic() + _jitter(self.interval)
+
+        for key in set(self.known) - set(current):
+            self.forget(key)
+        for key, pod in current.items():
+            self.known[key] = failure_signature(pod)
+            self.schedule(pod)
+        return new
+
+    def scan_failed(self):
+        """Record a failed scan and return the seconds to wait before retrying"""
+        self.failures += 1
+        delay = _jitter(min(self.min_interval * 2 ** self.failures, MAX_BACKOFF))
+        self.next_scan = time.monotonic() + delay
+        return delay
+
+    def schedule(self, pod):
+        delay = recheck_delay(pod)
+        key = pod_key(pod)
+        if delay is None or delay >= self.next_scan - time.monotonic():
+            # The next full scan will see it first
+            self.pods.pop(key, None)
+            return
+        due = time.monotonic() + delay
+        self.pods[key] = (due, pod)
+        self._seq += 1
+        heapq.heappush(self._queue, (due, self._seq, key))
+
+    def forget(self, key):
+        self.known.pop(key, None)
+        self.pods.pop(key, None)
+
+    def due_rechecks(self):
+        """Pop and return the pods whose re-check time has come"""
+        now = time.monotonic()
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            when, _, key = heapq.heappop(self._queue)
+            entry = self.pods.get(key)
+            if entry is not None and entry[0] == when:
+                due.append(self.pods.pop(key)[1])
+        return due
+
+    def recheck_finished(self, old_pod, pod):
+        """Record a re-check; returns True if the failure changed since it was last seen.
+
+        pod is the pod as fetched now, or None if it is gone or healthy.
+        """
+        key = pod_key(old_pod)
+        if pod is None:
+            self.forget(key)
+            return False
+        signature = failure_signature(pod)
+        changed = self.known.get(key) != signature
+        self.known[key] = signature
+        self.schedule(pod)
+        return changed
+
+    def recheck_failed(self, pod):
+        """Record a re-check that could not fetch the pod; it is tried again later"""
+        self.schedule(pod)
+
+    def wait(self):
+        """Seconds until the next scan or re-check is due"""
+        due = self.next_scan
+        while self._queue and self.pods.get(self._queue[0][2], (None,))[0] != self._queue[0][0]:
+            heapq.heappop(self._queue)
+        if self._queue:
+            due = min(due, self._queue[0][0])
+        return max(0, due - time.monotonic())
+
+    def describe(self):
+        return f"next scan in {max(0, self.next_scan - time.monotonic()):.0f}s, {len(self.pods)} re-checks queued"
+
+
+def recheck(scheduler, pod, get_pod, is_unhealthy, handle):
+    """Fetch one queued pod again and hand it to handle() if its failure changed.
+
+    Only a 404 from get_pod means the pod is gone; any other KubeError
+    keeps the pod and its last known failure for another try.
+    """
+    metadata = pod.get("metadata", {})
+    try:
+        current = get_pod(metadata.get("namespace", "default"), metadata.get("name", "unknown"))
+    except KubeError as e:
+        if e.status_code != 404:
+            logging.warning(f"Re-check of {pod_key(pod)} failed: {e}")
+            scheduler.recheck_failed(pod)
+            return
+        current = None
+    if current is not None and not is_unhealthy(current):
+        logging.info(f"Pod {pod_key(pod)} recovered")
+        current = None
+    if scheduler.recheck_finished(pod, current):
+        handle(current)
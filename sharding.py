@@ -0,0 +1,342 @@
+"""Split the cluster's namespaces between several monitor replicas.
+
+    python pipeline.py --leases kubernetes:podmon --replica-id "$POD_NAME"
+    python pipeline.py --leases file:/shared/podmon-leases.json
+
+Every replica keeps a membership lease alive. The live members form a
+consistent-hash ring, and a replica only scans the namespaces the ring maps
+to it, so adding or losing a replica only moves about 1/N of the
+namespaces. While members disagree about the ring (a replica just joined,
+or died and its lease has not expired yet) two replicas may briefly scan
+the same namespace; remediation is therefore also guarded by a lease per
+workload, held for the executor's cooldown, so only one replica ever acts
+on a workload. Expired workload leases are deleted, so there is no
+leftover lease for every workload that was ever remediated.
+
+Lease backends share one small interface (acquire, release, holders):
+
+- InMemoryLeaseBackend: replicas in one process, for tests and demos
+- FileLeaseBackend: one JSON file guarded by flock, for replicas on one
+  host or a shared volume
+- KubernetesLeaseBackend: coordination.k8s.io/v1 Lease objects
+"""
+import bisect
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from k8s_backend import KubeError, _query, get_backend
+
+# Configuration
+MEMBER_TTL = 30          # seconds a replica counts as alive after its last heartbeat
+VIRTUAL_NODES = 128      # ring points per replica; more points spread namespaces more evenly
+LEASE_NAMESPACE = os.environ.get("PODMON_LEASE_NAMESPACE", "default")
+LEASE_LABEL = "podmon.io/lease"
+LEASE_GC_GRACE = 60      # seconds a workload Lease stays expired before it is deleted
+
+MEMBER_PREFIX = "podmon-member-"
+WORKLOAD_PREFIX = "podmon-workload-"
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+
+
+def lease_safe(value):
+    """Lower-case DNS label characters only, as Lease names require"""
+    return re.sub(r"[^a-z0-9.-]+", "-", value.lower()).strip("-.")[:200] or "replica"
+
+
+def default_replica_id():
+    # POD_NAME is set through the downward API when running in the cluster
+    return os.environ.get("POD_NAME") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class HashRing:
+    """Consistent-hash ring mapping keys (namespaces) to members"""
+
+    def __init__(self, members=(), vnodes=VIRTUAL_NODES):
+        self.members = tuple(sorted(set(members)))
+        points = sorted((_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes))
+        self._hashes = [h for h, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key):
+        if not self._owners:
+            return None
+        i = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[i]
+
+
+class InMemoryLeaseBackend:
+    """Leases in a dict; share one instance between replicas of one process"""
+
+    def __init__(self):
+        self.leases = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, name, holder, ttl):
+        with self._lock:
+            current = self.leases.get(name)
+            now = time.time()
+            if current and current[0] != holder and current[1] > now:
+                return False
+            self.leases[name] = (holder, now + ttl)
+            return True
+
+    def release(self, name, holder):
+        with self._lock:
+            if self.leases.get(name, (None,))[0] == holder:
+                del self.leases[name]
+
+    def holders(self, prefix):
+        """{name: holder} of every unexpired lease whose name starts with prefix"""
+        now = time.time()
+        with self._lock:
+            self.leases = {name: lease for name, lease in self.leases.items() if lease[1] > now}
+            return {name: holder for name, (holder, _) in self.leases.items() if name.startswith(prefix)}
+
+
+class FileLeaseBackend:
+    """Leases in one JSON file, read-modify-written under an exclusive flock"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+
+    def _update(self, change):
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        leases = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    leases = {}
+                now = time.time()
+                leases = {name: lease for name, lease in leases.items() if lease["expires"] > now}
+                result = change(leases, now)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(leases, f)
+                os.replace(tmp_path, self.path)
+                return result
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def acquire(self, name, holder, ttl):
+        def change(leases, now):
+            current = leases.get(name)
+            if current and current["holder"] != holder:
+                return False
+            leases[name] = {"holder": holder, "expires": now + ttl}
+            return True
+        return self._update(change)
+
+    def release(self, name, holder):
+        def change(leases, now):
+            if leases.get(name, {}).get("holder") == holder:
+                del leases[name]
+        self._update(change)
+
+    def holders(self, prefix):
+        return self._update(lambda leases, now: {
+            name: lease["holder"] for name, lease in leases.items() if name.startswith(prefix)
+        })
+
+
+def _micro_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _parse_micro_time(value):
+    if not value:
+        return 0
+    value = value.replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return 0
+
+
+def _lease_expires(spec):
+    return _parse_micro_time(spec.get("renewTime")) + (spec.get("leaseDurationSeconds") or 0)
+
+
+class KubernetesLeaseBackend:
+    """coordination.k8s.io/v1 Leases; updates carry the resourceVersion read,
+    so two replicas racing for one Lease cannot both win"""
+
+    def __init__(self, namespace=LEASE_NAMESPACE, backend=None):
+        self.namespace = namespace
+        self.backend = backend or get_backend()
+
+    def _path(self, name=None):
+        path = f"/apis/coordination.k8s.io/v1/namespaces/{quote(self.namespace)}/leases"
+        return f"{path}/{quote(name)}" if name else path
+
+    def _get(self, name):
+        try:
+            return self.backend.raw_get(self._path(name))
+        except KubeError as e:
+            # The kubectl backend only has the message to go on
+            if e.status_code == 404 or "NotFound" in str(e):
+                return None
+            raise
+
+    def _write(self, method, path, lease):
+        try:
+            self.backend.request(method, path, lease)
+            return True
+        except KubeError as e:
+            if e.status_code == 409 or "Conflict" in str(e) or "AlreadyExists" in str(e):
+                return False
+            raise
+
+    def acquire(self, name, holder, ttl):
+        now = time.time()
+        renewal = {"holderIdentity": holder, "leaseDurationSeconds": int(ttl), "renewTime": _micro_time(now)}
+        lease = self._get(name)
+        if lease is None:
+            return self._write("POST", self._path(), {
+                "apiVersion": "coordination.k8s.io/v1",
+                "kind": "Lease",
+                "metadata": {"name": name, "namespace": self.namespace, "labels": {LEASE_LABEL: "true"}},
+                "spec": dict(renewal, acquireTime=_micro_time(now), leaseTransitions=0),
+            })
+
+        spec = lease.get("spec") or {}
+        current = spec.get("holderIdentity")
+        if current and current != holder and _lease_expires(spec) > now:
+            return False
+        if current != holder:
+            renewal["acquireTime"] = _micro_time(now)
+            renewal["leaseTransitions"] = (spec.get("leaseTransitions") or 0) + 1
+        lease["spec"] = dict(spec, **renewal)
+        return self._write("PUT", self._path(name), lease)
+
+    def release(self, name, holder):
+        lease = self._get(name)
+        if lease is None or (lease.get("spec") or {}).get("holderIdentity") != holder:
+            return
+        lease["spec"]["holderIdentity"] = None
+        lease["spec"]["leaseDurationSeconds"] = 1
+        self._write("PUT", self._path(name), lease)
+
+    def _delete(self, lease):
+        """Delete a lease unless it was renewed since it was read"""
+        metadata = lease["metadata"]
+        try:
+            self.backend.request("DELETE", self._path(metadata["name"]), {
+                "apiVersion": "v1",
+                "kind": "DeleteOptions",
+                "preconditions": {"resourceVersion": metadata.get("resourceVersion")},
+            })
+        except KubeError as e:
+            # Gone already, or renewed by another replica in between
+            if not (e.status_code in (404, 409) or "NotFound" in str(e) or "Conflict" in str(e)):
+                logging.warning(f"Could not delete expired lease {metadata['name']}: {e}")
+
+    def holders(self, prefix):
+        """Live holders of leases starting with prefix; also deletes long-expired workload leases"""
+        now = time.time()
+        page = self.backend.raw_get(self._path() + _query({"labelSelector": f"{LEASE_LABEL}=true"}))
+        holders = {}
+        for lease in page.get("items", []):
+            name = lease["metadata"]["name"]
+            spec = lease.get("spec") or {}
+            expires = _lease_expires(spec)
+            if name.startswith(prefix) and spec.get("holderIdentity") and expires > now:
+                holders[name] = spec["holderIdentity"]
+            elif name.startswith(WORKLOAD_PREFIX) and expires + LEASE_GC_GRACE < now:
+                self._delete(lease)
+        return holders
+
+
+def make_lease_backend(spec):
+    """memory, file:<path> or kubernetes[:<namespace>]"""
+    kind, _, arg = spec.partition(":")
+    if kind == "memory":
+        return InMemoryLeaseBackend()
+    if kind == "file":
+        return FileLeaseBackend(arg or "podmon-leases.json")
+    if kind in ("kubernetes", "k8s"):
+        return KubernetesLeaseBackend(arg or LEASE_NAMESPACE)
+    raise ValueError(f"Unknown lease backend {spec!r} (expected memory, file:<path> or kubernetes[:<namespace>])")
+
+
+class ShardCoordinator:
+    """Keep this replica's membership alive and answer which namespaces it owns"""
+
+    def __init__(self, leases, replica_id=None, ttl=MEMBER_TTL, vnodes=VIRTUAL_NODES):
+        self.leases = leases
+        self.replica_id = lease_safe(replica_id or default_replica_id())
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.ring = HashRing([self.replica_id], vnodes)
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def member_lease(self):
+        return MEMBER_PREFIX + self.replica_id
+
+    def heartbeat(self):
+        """Renew membership and rebuild the ring if the set of live replicas changed"""
+        if not self.leases.acquire(self.member_lease, self.replica_id, self.ttl):
+            logging.warning(f"Membership lease {self.member_lease} is held by another replica with the same id")
+        members = set(self.leases.holders(MEMBER_PREFIX).values()) | {self.replica_id}
+        if set(self.ring.members) != members:
+            joined = members - set(self.ring.members)
+            left = set(self.ring.members) - members
+            self.ring = HashRing(members, self.vnodes)
+            logging.info(
+                f"Rebalanced shards across {len(members)} replicas"
+                + (f", joined: {', '.join(sorted(joined))}" if joined else "")
+                + (f", left: {', '.join(sorted(left))}" if left else "")
+            )
+        return self.ring
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logging.error(f"Shard heartbeat failed: {e}")
+
+    def start(self):
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Leave the ring right away so the other replicas take over our namespaces"""
+        self._stop.set()
+        try:
+            self.leases.release(self.member_lease, self.replica_id)
+        except Exception as e:
+            logging.warning(f"Could not release {self.member_lease}: {e}")
+
+    def owns(self, namespace):
+        return self.ring.owner(namespace) == self.replica_id
+
+    def owned_namespaces(self, namespaces):
+        return [namespace for namespace in namespaces if self.owns(namespace)]
+
+    def claim_workload(self, namespace, kind, name, ttl):
+        """Take (or renew) the lease that lets only this replica remediate a workload"""
+        digest = hashlib.sha1(f"{namespace}/{kind}/{name}".encode("utf-8")).hexdigest()[:16]
+        try:
+            return self.leases.acquire(WORKLOAD_PREFIX + digest, self.replica_id, ttl)
+        except KubeError as e:
+            logging.error(f"Could not claim {kind}/{name} in {namespace}: {e}")
+            return False
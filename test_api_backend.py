@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+import fake_kubectl
+from k8s_backend import ApiBackend, KubeError
+
+SPEC = fake_kubectl.make_spec(200, {"crashloop": 0.1, "imagepull": 0.05}, seed=3)
+
+
+@pytest.fixture
+def api(tmp_path):
+    server = fake_kubectl.make_api_server(SPEC, latency=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    kubeconfig = tmp_path / "kubeconfig"
+    fake_kubectl.write_kubeconfig(str(kubeconfig), f"http://127.0.0.1:{server.server_port}")
+    yield server, ApiBackend(kubeconfig=str(kubeconfig))
+    server.shutdown()
+    server.server_close()
+
+
+def failing_pod(kind):
+    i = next(i for i in range(SPEC["pods"]) if fake_kubectl.pod_kind(SPEC, i) == kind)
+    return fake_kubectl.synthetic_pod(SPEC, i)
+
+
+def test_list_pods_pages_through_the_cluster(api):
+    _, backend = api
+    pods = list(backend.iter_pods(chunk_size=30))
+    assert len(pods) == SPEC["pods"]
+    assert len({pod["metadata"]["uid"] for pod in pods}) == SPEC["pods"]
+
+
+def test_list_pods_of_one_namespace(api):
+    _, backend = api
+    pods = list(backend.iter_pods(namespace="team-1"))
+    assert pods and all(pod["metadata"]["namespace"] == "team-1" for pod in pods)
+
+
+def test_get_and_describe_pod(api):
+    _, backend = api
+    pod = failing_pod("crashloop")
+    metadata = pod["metadata"]
+    assert backend.get_pod(metadata["namespace"], metadata["name"])["metadata"]["uid"] == metadata["uid"]
+    description = backend.describe_pod(metadata["namespace"], metadata["name"])
+    assert "CrashLoopBackOff" in description
+    assert "BackOff" in description
+
+
+def test_missing_pod_raises_kube_error(api):
+    _, backend = api
+    with pytest.raises(KubeError) as excinfo:
+        backend.get_pod("team-1", "no-such-pod")
+    assert excinfo.value.status_code == 404
+
+
+def test_pod_logs_honour_tail_and_previous(api):
+    _, backend = api
+    metadata = failing_pod("crashloop")["metadata"]
+    previous = backend.pod_logs(metadata["namespace"], metadata["name"], previous=True, tail_lines=5)
+    assert len(previous.splitlines()) == 5
+    assert "panic" in previous
+    current = backend.pod_logs(metadata["namespace"], metadata["name"])
+    assert "panic" not in current
+
+
+def test_remediation_requests(api):
+    server, backend = api
+    metadata = failing_pod("crashloop")["metadata"]
+    backend.rollout_restart(metadata["namespace"], "Deployment", "app-0")
+    backend.delete_pod(metadata["namespace"], metadata["name"])
+    writes = [(method, path, body) for method, path, body in server.requests if method != "GET"]
+    assert writes[0][0] == "PATCH" and writes[0][1].endswith("/deployments/app-0")
+    assert "kubectl.kubernetes.io/restartedAt" in writes[0][2]["spec"]["template"]["metadata"]["annotations"]
+    assert writes[1][0] == "DELETE" and writes[1][1].endswith(f"/pods/{metadata['name']}")
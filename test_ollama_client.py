@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+import requests
+
+import fake_ollama
+from ollama_client import OllamaClient, OllamaError
+
+# JSON first, then prose the model keeps generating
+ANSWER = '{"cause": "boom", "action": "restart"} ' + " ".join(["more"] * 40)
+
+
+@pytest.fixture
+def ollama():
+    servers = []
+
+    def start(**kwargs):
+        server = fake_ollama.make_server(port=0, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, OllamaClient(f"127.0.0.1:{server.server_port}", retries=2, backoff=0)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_generate_returns_response(ollama):
+    server, client = ollama(answer=ANSWER)
+    result = client.generate("prompt", "gemma:2b")
+    assert result["response"] == ANSWER
+    assert result["done"]
+    assert server.requests_served == 1
+
+
+def test_generate_unknown_model_raises(ollama):
+    _, client = ollama()
+    with pytest.raises(OllamaError) as excinfo:
+        client.generate("prompt", "missing:1b")
+    assert excinfo.value.status_code == 404
+
+
+def test_read_timeout_is_not_retried(ollama):
+    server, client = ollama(latency=0.5)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.generate("prompt", "gemma:2b", timeout=0.1)
+    assert server.requests_served == 1
+
+
+def test_stream_stops_once_json_is_complete(ollama):
+    server, client = ollama(answer=ANSWER, token_delay=0.02)
+    obj, timings = client.generate_json_stream("prompt", "gemma:2b")
+    assert obj == {"cause": "boom", "action": "restart"}
+    # The JSON is the first 4 of 44 tokens; the prose after it is never read
+    assert timings["chunks"] < 10
+    assert timings["time_to_answer"] < 40 * 0.02
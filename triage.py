@@ -0,0 +1,123 @@
+import json
+import os
+from collections import Counter
+
+# Configuration
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "triage_rules.json")
+
+MATCH_FIELDS = ("waiting_reason", "terminated_reason", "exit_code", "phase", "pod_reason")
+VALID_ACTIONS = ("restart", "revert_image", "increase_resources", "check_config")
+
+
+class _SafeFormat(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def container_facts(pod):
+    """Yield one dict of matchable facts per container state of a pod.
+
+    Both the current state and lastState are considered, because a
+    crash-looping container shows the interesting terminated reason only in
+    lastState while it waits to be restarted.
+    """
+    status = pod.get("status", {})
+    phase = status.get("phase", "")
+    pod_reason = status.get("reason", "")
+    for key in ("initContainerStatuses", "containerStatuses"):
+        for cs in status.get(key) or []:
+            for state_key in ("state", "lastState"):
+                state = cs.get(state_key) or {}
+                waiting = state.get("waiting") or {}
+                terminated = state.get("terminated") or {}
+                if not waiting and not terminated:
+                    continue
+                yield {
+                    "container": cs.get("name", ""),
+                    "waiting_reason": waiting.get("reason", ""),
+                    "terminated_reason": terminated.get("reason", ""),
+                    "exit_code": terminated.get("exitCode"),
+                    "phase": phase,
+                    "pod_reason": pod_reason,
+                    "reason": waiting.get("reason") or terminated.get("reason", ""),
+                    "message": waiting.get("message") or terminated.get("message", ""),
+                }
+    yield {
+        "container": "",
+        "waiting_reason": "",
+        "terminated_reason": "",
+        "exit_code": None,
+        "phase": phase,
+        "pod_reason": pod_reason,
+        "reason": pod_reason or phase,
+        "message": status.get("message", ""),
+    }
+
+
+class TriageEngine:
+    """Deterministic diagnoses for well-known failure reasons.
+
+    Rules are compiled into an index from (field, value) to the rules that
+    test it, so each container state only looks at rules that can match.
+    The first matching rule in file order wins. Pods with no match are left
+    for the model.
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        self.index = {}
+        self.hits = Counter()
+        for order, rule in enumerate(rules):
+            self._compile(order, rule)
+
+    @classmethod
+    def load(cls, path=RULES_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("rules", []))
+
+    def _compile(self, order, rule):
+        name = rule.get("name") or f"rule-{order}"
+        match = rule.get("match") or {}
+        unknown = set(match) - set(MATCH_FIELDS)
+        if not match or unknown:
+            raise ValueError(f"Triage rule {name!r} has invalid match fields: {sorted(unknown) or 'none'}")
+        if rule.get("action") not in VALID_ACTIONS:
+            raise ValueError(f"Triage rule {name!r} has unsupported action {rule.get('action')!r}")
+
+        conditions = tuple((field, frozenset(values if isinstance(values, list) else [values])) for field, values in match.items())
+        compiled = (order, name, conditions, rule)
+        self.rules.append(compiled)
+        first_field, values = conditions[0]
+        for value in values:
+            self.index.setdefault((first_field, value), []).append(compiled)
+
+    def evaluate(self, pod):
+        """Return an action dict for take_action, or None to escalate to the model"""
+        best = None
+        best_facts = None
+        for facts in container_facts(pod):
+            for field in MATCH_FIELDS:
+                for compiled in self.index.get((field, facts[field]), ()):
+                    if best is not None and compiled[0] >= best[0]:
+                        continue
+                    if all(facts[f] in values for f, values in compiled[2]):
+                        best, best_facts = compiled, facts
+        if best is None:
+            return None
+
+        _, name, _, rule = best
+        self.hits[name] += 1
+        fields = _SafeFormat(best_facts)
+        metadata = pod.get("metadata", {})
+        return {
+            "cause": rule.get("cause", name).format_map(fields),
+            "action": rule["action"],
+            "pod": metadata.get("name", "unknown"),
+            "namespace": metadata.get("namespace", "default"),
+            "details": rule.get("details", "").format_map(fields),
+            "rule": name,
+        }
+
+    def hit_counts(self):
+        """Return (rule name, hits) for every rule in file order"""
+        return [(name, self.hits[name]) for _, name, _, _ in self.rules]
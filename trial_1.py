@@ -1,10 +1,23 @@
-import subprocess
-import json
 import time
-import requests
 import logging
 import os
-from datetime import datetime
+import sys
+from pod_watch import PodWatcher, pod_key
+from analysis_cache import AnalysisCache, fingerprint, format_cached
+from incident_index import IncidentIndex, format_similar, incident_text
+from analysis_store import AnalysisStore
+from collector import collect, fetch_logs
+from ollama_health import OllamaHealthMonitor
+from ollama_client import OllamaClient
+from pod_health import is_pod_unhealthy
+from pod_snapshot import scan_unhealthy
+from k8s_backend import KubeError, get_backend
+from metrics import start_http_server
+from workloads import describe_group, group_failures
+from scheduler import ScanScheduler, recheck
+from log_excerpt import excerpt, fetch_pod_logs
+from prompt_builder import PromptTemplate
+from log_tail import LogTailManager
 
 # Set up logging
 logging.basicConfig(
@@ -17,235 +30,293 @@ logging.basicConfig(
 )
 
 # Configuration
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_TIMEOUT = 30  # seconds to wait for an analysis
+OLLAMA_PROBE_INTERVAL = 30  # seconds between background health probes
 MODEL_NAME = "gemma:2b"
-SCAN_INTERVAL = 60  # seconds
-LOG_DIR = "pod_logs"
+SCAN_INTERVAL = 60  # seconds; the scheduler adapts it between 10s and 5 min
+KUBECTL_TIMEOUT = 30  # seconds per kubectl call
+PROJECTED_SCAN = True  # filter server-side and fetch only the fields we classify on
 
-# Create logs directory if it doesn't exist
-os.makedirs(LOG_DIR, exist_ok=True)
+# Diagnoses keyed by failure fingerprint, so repeat failures skip the LLM
+ANALYSIS_CACHE = AnalysisCache()
 
-def run_kubectl_command(command):
-    """Run a kubectl command and return the output"""
+# Past diagnoses by embedding, so the same failure in another workload skips the LLM too
+INCIDENT_INDEX = IncidentIndex()
+
+# Per-container log cursors, so pods that keep failing only transfer new lines
+LOG_TAILS = LogTailManager()
+
+# Incidents with their logs and analysis, one row per pod and failure fingerprint
+ANALYSIS_STORE = AnalysisStore()
+
+# Instructions first and identical for every pod, so Ollama reuses their cached prefix
+ANALYSIS_PROMPT = PromptTemplate("analysis", """
+You are a Kubernetes troubleshooting expert. Analyze the following logs from a problematic pod and identify the most likely cause of the issue.
+Also suggest possible solutions.
+""", MODEL_NAME)
+
+# Shared Ollama health state, probed in the background with a circuit breaker
+OLLAMA = OllamaClient(OLLAMA_BASE_URL, read_timeout=OLLAMA_TIMEOUT)
+OLLAMA_HEALTH = OllamaHealthMonitor(MODEL_NAME, OLLAMA, OLLAMA_PROBE_INTERVAL)
+# An Ollama embedder is not called while the circuit is open
+INCIDENT_INDEX.paused = OLLAMA_HEALTH.circuit_open
+
+def run_kube_call(method, *args, **kwargs):
+    """Call a Kubernetes backend method, logging failures and returning None"""
     try:
-        result = subprocess.run(
-            f"kubectl {command}", 
-            shell=True, 
-            capture_output=True, 
-            text=True
-        )
-        if result.returncode != 0:
-            logging.error(f"Command failed: {result.stderr}")
-            return None
-        return result.stdout
-    except Exception as e:
-        logging.error(f"Error executing kubectl command: {e}")
+        return getattr(get_backend(), method)(*args, timeout=KUBECTL_TIMEOUT, **kwargs)
+    except KubeError as e:
+        logging.error(f"Command failed: {e}")
         return None
 
 def get_pods():
     """Get all pods in the cluster"""
-    output = run_kubectl_command("get pods --all-namespaces -o json")
-    if not output:
-        return []
-    
-    try:
-        pods_data = json.loads(output)
-        return pods_data.get("items", [])
-    except json.JSONDecodeError:
-        logging.error("Failed to parse pod JSON data")
-        return []
-
-def is_pod_unhealthy(pod):
-    """Check if a pod is unhealthy"""
-    if "status" not in pod:
-        return False
-    
-    status = pod["status"]
-    phase = status.get("phase", "")
-    
-    # Check if pod is in failed or pending state
-    if phase in ["Failed", "Unknown"]:
-        return True
-    
-    # Check for pods stuck in pending state
-    if phase == "Pending" and "conditions" in status:
-        for condition in status["conditions"]:
-            if condition.get("type") == "PodScheduled" and condition.get("status") == "False":
-                return True
-    
-    # Check for containers that are not ready
-    if phase == "Running":
-        container_statuses = status.get("containerStatuses", [])
-        for container in container_statuses:
-            if not container.get("ready", True):
-                if "state" in container and "waiting" in container["state"]:
-                    return True
-                if "state" in container and "terminated" in container["state"]:
-                    terminated_info = container["state"]["terminated"]
-                    if terminated_info.get("exitCode", 0) != 0:
-                        return True
-    
-    return False
-
-def get_pod_logs(namespace, pod_name, container=None):
-    """Get logs for a specific pod"""
-    command = f"logs -n {namespace} {pod_name}"
-    if container:
-        command += f" -c {container}"
-    return run_kubectl_command(command)
-
-def analyze_with_ollama(logs, pod_info):
-    """Send logs to Ollama for analysis"""
-    try:
-        prompt = f"""
-You are a Kubernetes troubleshooting expert. Analyze the following logs from a problematic pod and identify the most likely cause of the issue.
-Also suggest possible solutions.
+    return run_kube_call("list_pods") or []
 
-Pod Name: {pod_info['name']}
-Namespace: {pod_info['namespace']}
-Pod Status: {pod_info['status']}
+def get_unhealthy_pods():
+    """Get unhealthy pods, using the projected scan unless disabled"""
+    if not PROJECTED_SCAN:
+        return [pod for pod in get_pods() if is_pod_unhealthy(pod)]
+    # Errors propagate so the main loop can back off
+    return [snapshot.to_pod() for snapshot, _ in scan_unhealthy()]
 
-Logs:
-{logs[:4000]}  # Limiting log size to prevent token overflow
+def get_pod(namespace, pod_name):
+    """Get one pod; raises KubeError (status_code 404 if it is gone)"""
+    return get_backend().get_pod(namespace, pod_name, timeout=KUBECTL_TIMEOUT)
 
-What is the likely error and how can it be fixed?
-"""
-        
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={
-                "model": MODEL_NAME,
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=30
-        )
+def get_pod_logs(namespace, pod_name, pod=None):
+    """Get bounded logs for a pod, including crashed containers' previous logs"""
+    try:
+        return fetch_pod_logs(get_backend(), namespace, pod_name, pod, timeout=KUBECTL_TIMEOUT, tails=LOG_TAILS)
+    except KubeError as e:
+        logging.error(f"Command failed: {e}")
+        return None
+
+def analyze_with_ollama(logs, pod_info, cache_key=None):
+    """Send logs to Ollama for analysis, reusing a cached diagnosis when possible"""
+    if cache_key:
+        cached = ANALYSIS_CACHE.get(cache_key)
+        if cached:
+            return format_cached(cached)
+    
+    text = incident_text(pod_info["status"], logs)
+    similar = INCIDENT_INDEX.lookup(text)
+    if similar:
+        logging.info(f"Reusing diagnosis of a similar incident ({similar['similarity']:.0%} match)")
+        return format_similar(similar)
+    
+    if not OLLAMA_HEALTH.available():
+        return "AI analysis skipped: Ollama is unavailable (retrying automatically). Review the logs manually."
+    
+    try:
+        prompt = ANALYSIS_PROMPT.render([
+            ("Pod", f"{pod_info['namespace']}/{pod_info['name']}"),
+            ("Pod Status", pod_info['status']),
+            ("Logs", logs, 4000, excerpt),
+        ], closing="What is the likely error and how can it be fixed?")
         
-        if response.status_code == 200:
-            return response.json().get("response", "No analysis provided")
-        else:
-            logging.error(f"Ollama API error: {response.status_code}, {response.text}")
-            return f"Failed to analyze logs: API returned status {response.status_code}"
+        result = OLLAMA.generate(prompt, MODEL_NAME, **ANALYSIS_PROMPT.options())
+        OLLAMA_HEALTH.record_success()
+        analysis = result.get("response", "No analysis provided")
+        if cache_key:
+            ANALYSIS_CACHE.put(cache_key, analysis)
+        INCIDENT_INDEX.add(text, analysis, cache_key)
+        return analysis
     
     except Exception as e:
+        OLLAMA_HEALTH.record_failure()
         logging.error(f"Error during Ollama analysis: {e}")
         return f"Failed to analyze logs: {str(e)}"
 
-def save_analysis(pod_info, logs, analysis):
-    """Save the logs and analysis to files"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename_base = f"{pod_info['namespace']}_{pod_info['name']}_{timestamp}"
+def save_analysis(pod, pod_info, logs, analysis, cache_key):
+    """Record the logs and analysis in the analysis store and return the incident id"""
+    return ANALYSIS_STORE.record(pod, logs, analysis, pod_info["status"], cache_key)
+
+def check_ollama_connection():
+    """Start the background Ollama health monitor"""
+    logging.info("Starting Kubernetes pod monitoring with Ollama integration")
+    logging.info(f"Using AI model: {MODEL_NAME}")
+    
+    OLLAMA_HEALTH.start()
+    if OLLAMA_HEALTH.healthy:
+        logging.info("Successfully connected to Ollama")
+    else:
+        logging.warning(f"Couldn't connect to Ollama: {OLLAMA_HEALTH.last_error}")
+
+def collect_logs(pods):
+    """Fetch logs for many pods in parallel, in the same order as pods.
+
+    A failed fetch yields "" rather than None, so handle_unhealthy_pod does
+    not try it again one pod at a time.
+    """
+    backend = get_backend()
+    results = collect(pods, lambda pod: fetch_logs(
+        pod["metadata"]["namespace"], pod["metadata"]["name"], KUBECTL_TIMEOUT, backend, pod, LOG_TAILS
+    ))
+    return [r[1] if r and r[0] else "" for r in results]
+
+def handle_unhealthy_pod(pod, logs=None, members=()):
+    """Analyze an unhealthy pod's logs and save the results for it and its group members"""
+    metadata = pod.get("metadata", {})
+    status = pod.get("status", {})
+    
+    pod_name = metadata.get("name", "unknown")
+    namespace = metadata.get("namespace", "default")
+    
+    logging.info(f"Found unhealthy pod: {namespace}/{pod_name}")
+    
+    # Get pod logs
+    if logs is None:
+        logs = get_pod_logs(namespace, pod_name, pod)
+    if not logs:
+        logging.warning(f"No logs available for pod {namespace}/{pod_name}")
+        return
+    
+    # Get container status for more context
+    container_statuses = status.get("containerStatuses", [])
+    status_details = "Unknown"
+    for container in container_statuses:
+        if "state" in container:
+            if "waiting" in container["state"]:
+                reason = container["state"]["waiting"].get("reason", "")
+                message = container["state"]["waiting"].get("message", "")
+                status_details = f"Waiting: {reason} - {message}"
+            elif "terminated" in container["state"]:
+                reason = container["state"]["terminated"].get("reason", "")
+                exit_code = container["state"]["terminated"].get("exitCode", "")
+                status_details = f"Terminated: {reason} (Exit code: {exit_code})"
     
-    # Save logs
-    logs_path = os.path.join(LOG_DIR, f"{filename_base}_logs.txt")
-    with open(logs_path, "w", encoding="utf-8") as f:
-        f.write(logs)
+    pod_info = {
+        "name": pod_name,
+        "namespace": namespace,
+        "status": status_details
+    }
     
-    # Save analysis
-    analysis_path = os.path.join(LOG_DIR, f"{filename_base}_analysis.txt")
-    with open(analysis_path, "w", encoding="utf-8") as f:
-        f.write(f"Pod Name: {pod_info['name']}\n")
-        f.write(f"Namespace: {pod_info['namespace']}\n")
-        f.write(f"Status: {pod_info['status']}\n\n")
-        f.write("ANALYSIS:\n")
-        f.write(analysis)
+    # Analyze logs with Ollama
+    logging.info(f"Analyzing logs with Ollama for pod {namespace}/{pod_name}")
+    cache_key = fingerprint(pod, logs)
+    analysis = analyze_with_ollama(logs, pod_info, cache_key)
     
-    return logs_path, analysis_path
+    # Save results
+    incident_id = save_analysis(pod, pod_info, logs, analysis, cache_key)
+    logging.info(f"Analysis complete. Saved as incident #{incident_id} in {ANALYSIS_STORE.path}")
+    for member in members:
+        save_analysis(member, dict(pod_info, name=member.get("metadata", {}).get("name", "unknown")), logs, analysis, cache_key)
+    
+    # Print analysis summary
+    print("\n" + "="*80)
+    print(f"ISSUE DETECTED: Pod {namespace}/{pod_name}")
+    print(f"Status: {status_details}")
+    if members:
+        names = ", ".join(m.get("metadata", {}).get("name", "unknown") for m in members)
+        print(f"Also affected ({len(members)} more pods of the same workload): {names}")
+    print("-"*80)
+    print("AI ANALYSIS:")
+    print(analysis[:500] + "..." if len(analysis) > 500 else analysis)
+    print("="*80 + "\n")
 
-def main_loop():
-    """Main monitoring loop"""
-    logging.info("Starting Kubernetes pod monitoring with Ollama integration")
-    logging.info(f"Using AI model: {MODEL_NAME}")
+def log_cache_stats():
+    """Log how many LLM calls the analysis cache has saved"""
+    stats = ANALYSIS_CACHE.stats()
+    logging.info(
+        f"Analysis cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} of LLM calls saved), {stats['entries']} entries"
+    )
+    stats = INCIDENT_INDEX.stats()
+    logging.info(
+        f"Incident index: {stats['hits']} similar-incident reuses, {stats['misses']} misses, "
+        f"{stats['incidents']} incidents"
+    )
+    stats = LOG_TAILS.stats()
+    logging.info(
+        f"Log tails: {stats['lines']} lines buffered for {stats['containers']} containers, "
+        f"{stats['fetched_bytes']} bytes fetched"
+    )
+
+def scan_once():
+    """Scan the cluster once and analyze every unhealthy pod"""
+    logging.info("Scanning for unhealthy pods...")
+    unhealthy_pods = get_unhealthy_pods()
     
-    # Test Ollama connection
-    try:
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={"model": MODEL_NAME, "prompt": "Test", "stream": False},
-            timeout=10
+    # Replicas of one workload failing the same way share one analysis
+    groups = group_failures(unhealthy_pods)
+    representatives = [members[0] for _, members in groups]
+    for (key, members), logs in zip(groups, collect_logs(representatives)):
+        if len(members) > 1:
+            logging.info(f"Grouped {describe_group(key, members)}")
+        handle_unhealthy_pod(members[0], logs, members[1:])
+    
+    if len(unhealthy_pods) > len(groups):
+        logging.info(
+            f"{len(unhealthy_pods)} unhealthy pods in {len(groups)} groups, "
+            f"{len(unhealthy_pods) - len(groups)} analyses avoided"
         )
-        if response.status_code == 200:
-            logging.info("Successfully connected to Ollama")
-        else:
-            logging.warning(f"Ollama connection test failed: {response.status_code}")
-    except Exception as e:
-        logging.warning(f"Couldn't connect to Ollama: {e}")
     
-    # Main monitoring loop
+    if not unhealthy_pods:
+        logging.info("No unhealthy pods found in this scan")
+    
+    # Pods that recovered or were deleted take their log buffers with them
+    LOG_TAILS.retain(unhealthy_pods)
+    ANALYSIS_CACHE.save()
+    log_cache_stats()
+    return unhealthy_pods
+
+def main_loop():
+    """Main monitoring loop"""
+    check_ollama_connection()
+    start_http_server()
+    scheduler = ScanScheduler(SCAN_INTERVAL)
+    
+    # Main monitoring loop: full scans at an adaptive interval, re-checks of
+    # failing pods in between when they are due
     while True:
         try:
-            logging.info("Scanning for unhealthy pods...")
-            pods = get_pods()
-            unhealthy_pods_found = False
+            for pod in scheduler.due_rechecks():
+                recheck(scheduler, pod, get_pod, is_pod_unhealthy, handle_unhealthy_pod)
             
-            for pod in pods:
-                metadata = pod.get("metadata", {})
-                status = pod.get("status", {})
-                
-                pod_name = metadata.get("name", "unknown")
-                namespace = metadata.get("namespace", "default")
-                
-                if is_pod_unhealthy(pod):
-                    unhealthy_pods_found = True
-                    logging.info(f"Found unhealthy pod: {namespace}/{pod_name}")
-                    
-                    # Get pod logs
-                    logs = get_pod_logs(namespace, pod_name)
-                    if not logs:
-                        logging.warning(f"No logs available for pod {namespace}/{pod_name}")
-                        continue
-                    
-                    # Get container status for more context
-                    container_statuses = status.get("containerStatuses", [])
-                    status_details = "Unknown"
-                    for container in container_statuses:
-                        if "state" in container:
-                            if "waiting" in container["state"]:
-                                reason = container["state"]["waiting"].get("reason", "")
-                                message = container["state"]["waiting"].get("message", "")
-                                status_details = f"Waiting: {reason} - {message}"
-                            elif "terminated" in container["state"]:
-                                reason = container["state"]["terminated"].get("reason", "")
-                                exit_code = container["state"]["terminated"].get("exitCode", "")
-                                status_details = f"Terminated: {reason} (Exit code: {exit_code})"
-                    
-                    pod_info = {
-                        "name": pod_name,
-                        "namespace": namespace,
-                        "status": status_details
-                    }
-                    
-                    # Analyze logs with Ollama
-                    logging.info(f"Analyzing logs with Ollama for pod {namespace}/{pod_name}")
-                    analysis = analyze_with_ollama(logs, pod_info)
-                    
-                    # Save results
-                    logs_path, analysis_path = save_analysis(pod_info, logs, analysis)
-                    logging.info(f"Analysis complete. Logs saved to {logs_path}")
-                    logging.info(f"Analysis saved to {analysis_path}")
-                    
-                    # Print analysis summary
-                    print("\n" + "="*80)
-                    print(f"ISSUE DETECTED: Pod {namespace}/{pod_name}")
-                    print(f"Status: {status_details}")
-                    print("-"*80)
-                    print("AI ANALYSIS:")
-                    print(analysis[:500] + "..." if len(analysis) > 500 else analysis)
-                    print("="*80 + "\n")
-            
-            if not unhealthy_pods_found:
-                logging.info("No unhealthy pods found in this scan")
+            if scheduler.scan_due():
+                new = scheduler.scan_finished(scan_once())
+                if new:
+                    logging.info(f"{len(new)} newly unhealthy pods, scanning more often")
+                logging.info(f"Scan interval {scheduler.interval:.0f}s: {scheduler.describe()}")
             
-            logging.info(f"Sleeping for {SCAN_INTERVAL} seconds before next scan...")
-            time.sleep(SCAN_INTERVAL)
+            time.sleep(scheduler.wait())
             
         except KeyboardInterrupt:
             logging.info("Monitoring stopped by user")
             break
         except Exception as e:
+            delay = scheduler.scan_failed()
             logging.error(f"Error in main loop: {e}")
-            logging.info("Will retry in 60 seconds...")
-            time.sleep(60)
+            logging.info(f"Will retry in {delay:.0f} seconds...")
+            time.sleep(delay)
+
+def watch_loop():
+    """Watch pods and only examine the ones that changed"""
+    check_ollama_connection()
+    start_http_server()
+    logging.info("Watching pods for changes...")
+    # Deleted pods take their log buffers with them
+    watcher = PodWatcher(on_delete=LOG_TAILS.forget)
+    
+    try:
+        for pod in watcher.stream():
+            try:
+                if is_pod_unhealthy(pod):
+                    handle_unhealthy_pod(pod)
+                    ANALYSIS_CACHE.save()
+                else:
+                    # So do pods that recovered
+                    LOG_TAILS.forget(pod)
+            except Exception as e:
+                logging.error(f"Error handling pod {pod_key(pod)}: {e}")
+    except KeyboardInterrupt:
+        logging.info("Monitoring stopped by user")
+    log_cache_stats()
 
 if __name__ == "__main__":
-    main_loop()
\ No newline at end of file
+    if "--watch" in sys.argv:
+        watch_loop()
+    else:
+        main_loop()
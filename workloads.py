@@ -0,0 +1,58 @@
+import re
+
+from pod_health import classify
+
+# ReplicaSets created by a Deployment are named "<deployment>-<pod-template-hash>"
+POD_TEMPLATE_HASH_LABEL = "pod-template-hash"
+# Jobs created by a CronJob are named "<cronjob>-<scheduled timestamp>"
+CRONJOB_SUFFIX = re.compile(r"-\d{8,}$")
+
+
+def owning_workload(pod):
+    """Return (kind, name) of the workload that owns a pod.
+
+    Deployments are resolved through the ReplicaSet name and the pod's
+    pod-template-hash label, without any extra API call. Bare pods are their
+    own workload.
+    """
+    metadata = pod.get("metadata", {})
+    owners = metadata.get("ownerReferences") or []
+    owner = next((o for o in owners if o.get("controller")), owners[0] if owners else None)
+    if owner is None:
+        return "Pod", metadata.get("name", "unknown")
+
+    kind = owner.get("kind", "")
+    name = owner.get("name", "")
+    if kind == "ReplicaSet":
+        pod_hash = (metadata.get("labels") or {}).get(POD_TEMPLATE_HASH_LABEL)
+        if pod_hash and name.endswith(f"-{pod_hash}"):
+            return "Deployment", name[:-len(pod_hash) - 1]
+    elif kind == "Job" and CRONJOB_SUFFIX.search(name):
+        return "CronJob", CRONJOB_SUFFIX.sub("", name)
+    return kind, name
+
+
+def failure_group_key(pod, reason):
+    """(namespace, workload kind, workload name, failure reason) for a pod"""
+    kind, name = owning_workload(pod)
+    return pod.get("metadata", {}).get("namespace", "default"), kind, name, reason
+
+
+def group_failures(items, pod_of=lambda item: item, reason_of=None):
+    """Group unhealthy items by owning workload and failure reason.
+
+    Returns (key, members) pairs in first-seen order; members[0] is the
+    representative to analyze. reason_of defaults to the classifier's reason.
+    """
+    if reason_of is None:
+        reason_of = lambda item: classify(pod_of(item)).reason
+    groups = {}
+    for item in items:
+        key = failure_group_key(pod_of(item), reason_of(item))
+        groups.setdefault(key, []).append(item)
+    return list(groups.items())
+
+
+def describe_group(key, members):
+    namespace, kind, name, reason = key
+    return f"{kind}/{name} in {namespace} ({reason or 'unhealthy'}): {len(members)} pod{'s' if len(members) != 1 else ''}"